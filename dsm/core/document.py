@@ -212,14 +212,13 @@ class DocsManager:
             xml_sps.scielo_pid_v2,
             pid_v2,
         )
+        docs = db.fetch_documents_by_ids(_ids)
         for _id in _ids:
-            if not _id:
-                continue
-            doc = db.fetch_document(_id)
-            if doc:
-                return doc
+            if docs.get(_id):
+                return docs[_id]
 
-    def register_document(self, doc_pkg, pid_v2, old_name, issue_id, is_new_document=False):
+    def register_document(self, doc_pkg, pid_v2, old_name, issue_id, is_new_document=False,
+                          build_package=False):
         """
         Register one package of XML documents + PDFs + images.
 
@@ -238,6 +237,10 @@ class DocsManager:
             (it is required for new documents)
         is_new_document: boolean
             é documento novo?
+        build_package: boolean
+            registra também o zip do documento (article_files), criado com
+            os arquivos de `doc_pkg`, em vez de `update_document_package`,
+            que obtém os arquivos do files storage
         Returns
         -------
         str
@@ -292,6 +295,14 @@ class DocsManager:
         # salva o documento
         db.save_data(document)
 
+        if build_package:
+            # cria o zip do documento com os arquivos do pacote recebido
+            data = docfiles.build_zip_package_from_doc_package(
+                self._files_storage, doc_pkg, xml_sps,
+                registered_xml, registered_renditions,
+            )
+            db.register_document_package(document._id, data)
+
         return document._id
 
 
@@ -1,12 +1,13 @@
 import os
+import logging
 import tempfile
+from copy import deepcopy
 from mimetypes import MimeTypes
-from zipfile import ZipFile
 
 from dsm.utils import (
     files,
     reqs,
-    async_download,
+    xml_utils,
 )
 from dsm.core.sps_package import (
     SPS_Package,
@@ -16,6 +17,12 @@ from dsm import exceptions
 from dsm import configuration
 
 
+logger = logging.getLogger(__name__)
+
+# tamanho das partes dos arquivos obtidos para criar o zip do documento
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
 def build_zip_package(files_storage, record):
     # download XML and instantiate a SPS_Package
     xml_sps = _get_xml_sps(record)
@@ -33,24 +40,19 @@ def build_zip_package(files_storage, record):
         [xml_uri_and_name] + assets + renditions
     )
 
-    # create zip file
-    zip_file_path = _zip_files(f"{xml_sps.package_name}.zip", uris_and_names)
-
     # get files storage folder (individual document package folder)
     files_storage_folder_document_package = configuration.get_files_storage_folder_for_document_packages(
         issn=xml_sps.issn,
         scielo_pid_v3=xml_sps.scielo_pid_v3,
     )
 
-    # publish zip file in the files storage
-    zip_uri_and_name = files_storage_register(
+    # create zip file and publish it in the files storage
+    zip_uri_and_name, download_failures = _register_zip_files(
         files_storage,
         files_storage_folder_document_package,
-        zip_file_path,
-        os.path.basename(zip_file_path))
-
-    # delete temp_dir
-    files.delete_folder(os.path.dirname(zip_file_path))
+        f"{xml_sps.package_name}.zip",
+        uris_and_names,
+    )
 
     data = {}
     data['xml'] = xml_uri_and_name
@@ -58,10 +60,132 @@ def build_zip_package(files_storage, record):
     data['assets'] = assets
     data['renditions'] = renditions
     data['file'] = zip_uri_and_name
+    # files which are not in the zip file
+    data['download_failures'] = download_failures
+
+    return data
+
+
+def build_zip_package_from_doc_package(files_storage, doc_package, xml_sps,
+                                       registered_xml, registered_renditions):
+    """
+    Create the zip file of the document with the files of the received
+    package (`doc_package`), which were just registered, instead of
+    downloading them (`build_zip_package`), and register it in the
+    files storage
+
+    Parameters
+    ----------
+    files_storage : dsm.storage.minio.MinioStorage
+    doc_package : dsm.utils.packages.Package
+    xml_sps : dsm.data.sps_package.SPS_Package
+        XML whose assets are registered in the files storage
+    registered_xml : dict
+        {"uri": "", "name": ""}
+    registered_renditions : list of dict
+        result of `register_renditions`
+
+    Returns
+    -------
+    dict
+        the same data as `build_zip_package`
+    """
+    package_name = xml_sps.package_name
+
+    xml_uri_and_name = {
+        "name": f"{package_name}.xml",
+        "uri": registered_xml["uri"],
+    }
+    xml_content = _get_xml_content_with_local_assets(xml_sps, package_name)
+    contents = [
+        (xml_uri_and_name["name"], [xml_content.encode("utf-8")]),
+    ]
+
+    assets = []
+    for asset in xml_sps.assets.items:
+        # `uri` is the registered asset, `filename` is the file in the package
+        uri = getattr(asset, "uri", None)
+        file_path = doc_package.get_asset(asset.filename)
+        if not uri or not uri.startswith("http") or not file_path:
+            continue
+        name = asset.get_name(package_name)
+        assets.append({"uri": uri, "name": name})
+        contents.append((name, _read_package_file(doc_package, file_path)))
+
+    renditions = []
+    for rendition in registered_renditions:
+        file_path = doc_package.get_rendition(rendition["lang"])
+        if not rendition.get("url") or not file_path:
+            continue
+        renditions.append(
+            {"uri": rendition["url"], "name": rendition["filename"]})
+        contents.append(
+            (rendition["filename"], _read_package_file(doc_package, file_path))
+        )
+
+    # get files storage folder (individual document package folder)
+    files_storage_folder_document_package = configuration.get_files_storage_folder_for_document_packages(
+        issn=xml_sps.issn,
+        scielo_pid_v3=xml_sps.scielo_pid_v3,
+    )
+
+    # create zip file and publish it in the files storage
+    zip_name = f"{package_name}.zip"
+    uri = files_storage.register_stream(
+        lambda fp: files.write_zip_file(fp, _unique_contents(contents)),
+        files_storage_folder_document_package,
+        zip_name,
+        "application/zip",
+    )
+
+    data = {}
+    data['xml'] = xml_uri_and_name
+    data['assets'] = assets
+    data['renditions'] = renditions
+    data['file'] = {"uri": uri, "name": zip_name}
 
     return data
 
 
+def _get_xml_content_with_local_assets(xml_sps, package_name):
+    """
+    Returns the XML of `xml_sps` whose assets are referred by their names
+    in the zip, as `xml_sps.remote_to_local(package_name)` does, but in
+    a copy of the XML, so that `xml_sps` keeps the registered assets URIs
+    """
+    xmltree = deepcopy(xml_sps.xmltree)
+    original = xml_sps.xmltree.getroottree()
+    for asset in xml_sps.assets.items:
+        node = xmltree.xpath(original.getpath(asset.asset_node))[0]
+        node.set(
+            "{http://www.w3.org/1999/xlink}href",
+            asset.get_name(package_name),
+        )
+    return xml_utils.tostring(xmltree)
+
+
+def _read_package_file(doc_package, file_path):
+    """
+    Returns the content (chunks) of `file_path`, a file of the folder or
+    a member of the zip file of `doc_package`
+    """
+    if doc_package.zip_file:
+        fp = doc_package.zip_file.open(file_path)
+    else:
+        fp = open(file_path, "rb")
+    with fp:
+        yield from iter(lambda: fp.read(DOWNLOAD_CHUNK_SIZE), b"")
+
+
+def _unique_contents(contents):
+    names = set()
+    for name, chunks in contents:
+        if name in names:
+            continue
+        names.add(name)
+        yield name, chunks
+
+
 def send_doc_package_to_site(files_storage, zip_file, issn, pid_v3, prefix, pdf_langs):
     """
     Envia para o file storage os dados descompactados de um zip
@@ -189,28 +313,71 @@ def _get_xml_to_zip(xml_sps, record):
     }
 
 
-def _zip_files(zip_name, uris_and_names):
+def _register_zip_files(files_storage, files_storage_folder, zip_name,
+                        uris_and_names):
     """
-    Create zip file
+    Create zip file and register it in the files storage.
+    The files are downloaded one by one and their content is written
+    straight into their entries of the zip, which is uploaded as it is
+    created (no files on disk)
 
     Parameters
     ----------
-    xml_sps : dsm.data.sps_package.SPS_Package
-    uri_and_file_items : list of tuples
+    files_storage : dsm.storage.minio.MinioStorage
+    files_storage_folder : str
+    zip_name : str
+    uris_and_names : list of dict
 
     Returns
     -------
-    zip file path
+    tuple
+        ({"uri": "", "name": ""}, list of {"uri": "", "name": "", "error": ""}
+        of the files which are not in the zip)
     """
+    failures = []
+    uri = files_storage.register_stream(
+        lambda fp: files.write_zip_file(
+            fp, _download_files_contents(uris_and_names, failures)),
+        files_storage_folder,
+        zip_name,
+        "application/zip",
+    )
+    return {"uri": uri, "name": zip_name}, failures
 
-    # create zip file
-    uris_and_names = [
-        item
-        for item in uris_and_names
-        if item["uri"].startswith("http")
-    ]
-    downloaded_files = async_download.download_files(uris_and_names)
-    return files.create_zip_file(downloaded_files, zip_name)
+
+def _download_files_contents(uris_and_names, failures):
+    """
+    Returns name and content (chunks) of the files of `uris_and_names`,
+    which are downloaded one by one, as they are consumed.
+    The files which are not downloaded are logged and added to `failures`.
+    If the download fails while the content is read, the error is raised,
+    because the zip entry of the file is already created
+    """
+    names = set()
+    for item in uris_and_names:
+        if not item["uri"].startswith("http") or item["name"] in names:
+            continue
+        try:
+            response = reqs.requests_get_stream(item["uri"])
+        except Exception as e:
+            _add_download_failure(failures, item, str(e))
+            continue
+        with response:
+            if response.status_code != 200:
+                _add_download_failure(
+                    failures, item, f"HTTP status {response.status_code}")
+                continue
+            names.add(item["name"])
+            yield item["name"], response.iter_content(DOWNLOAD_CHUNK_SIZE)
+
+
+def _add_download_failure(failures, item, error):
+    logger.error("Unable to download %s: %s", item["uri"], error)
+    failures.append({
+        "uri": item["uri"],
+        "name": item["name"],
+        "error": error,
+    })
 
 
 def register_document_files(files_storage, doc_package, xml_sps,
@@ -338,7 +505,7 @@ def register_renditions(files_storage, files_storage_folder,
                 files_storage,
                 files_storage_folder,
                 rendition_path,
-                doc_package.zip_file_path,
+                doc_package.zip_file,
             )
             _rendition["url"] = uri_and_name["uri"]
         except exceptions.FilesStorageRegisterError as e:
@@ -384,7 +551,7 @@ def register_assets(files_storage, files_storage_folder,
                 files_storage,
                 files_storage_folder,
                 asset_file_path,
-                doc_package.zip_file_path,
+                doc_package.zip_file,
             )
             asset_in_xml.xlink_href = uri_and_name["uri"]
         except exceptions.FilesStorageRegisterError as e:
@@ -392,17 +559,16 @@ def register_assets(files_storage, files_storage_folder,
     return errors
 
 
-def _register_file(files_storage, files_storage_folder, file_path, zip_file_path=None):
+def _register_file(files_storage, files_storage_folder, file_path, zip_file=None):
     basename = os.path.basename(file_path)
 
-    if zip_file_path:
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            with ZipFile(zip_file_path) as zf:
-                extracted_path = zf.extract(file_path, path=tmpdirname)
-                uri_and_name = files_storage_register(
-                    files_storage, files_storage_folder,
-                    extracted_path, basename)
-                files.delete_folder(tmpdirname)
+    if zip_file:
+        # envia o conteúdo do membro do zip, sem extraí-lo
+        info = zip_file.getinfo(file_path)
+        with zip_file.open(file_path) as fp:
+            uri = files_storage.register_fileobj(
+                fp, info.file_size, files_storage_folder, basename)
+        uri_and_name = {"uri": uri, "name": basename}
     else:
         # registra o arquivo no `files_storage`
         uri_and_name = files_storage_register(
@@ -58,6 +58,10 @@ class MissingI2IdCommandPathEnvVarError(Exception):
     ...
 
 
+class CisisCommandError(Exception):
+    ...
+
+
 class IsisDBNotFoundError(Exception):
     ...
 
@@ -70,3 +74,5 @@ class NotApplicableInfo(Exception):
     ...
 
 
+class IsisDBFormatError(Exception):
+    ...
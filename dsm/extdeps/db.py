@@ -1,5 +1,10 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from mongoengine import connect, Q
+from mongoengine import connect, disconnect, signals, Document, Q
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from opac_schema.v1 import models
 from opac_schema.v2 import models as v2_models
 from dsm import exceptions
@@ -7,6 +12,8 @@ from dsm.extdeps.isis_migration.migration_models import (
     ISISDocument,
     ISISJournal,
     ISISIssue,
+    ISISMigrationRun,
+    get_migration_status,
 )
 
 
@@ -80,35 +87,81 @@ def convert_date(date):
     raise ValueError("Could not transform date '%s' to ISO format" % date) from None    
 
 
-def mk_connection(host):
+def mk_connection(host, reconnect=False):
     try:
+        if reconnect:
+            # descarta a conexão herdada do processo pai, por exemplo,
+            # em processos criados por `multiprocessing`
+            disconnect()
         connect(host=host)
     except Exception as e:
         raise exceptions.DBConnectError(e)
 
 
-def fetch_document(any_doc_id, **kwargs):
+# campos que identificam um documento, em ordem de prioridade
+_DOCUMENT_ID_FIELDS = (
+    ("pk", lambda article: [article.pk]),
+    ("pid", lambda article: [article.pid]),
+    ("aop_pid", lambda article: [article.aop_pid]),
+    ("scielo_pids__other",
+        lambda article: (article.scielo_pids or {}).get("other") or []),
+    ("doi", lambda article: [article.doi]),
+)
+
+
+def fetch_documents_by_ids(any_doc_ids, **kwargs):
+    """
+    Obtém, com uma única consulta, os documentos identificados por
+    `any_doc_ids`, que podem ser qualquer um dos seus identificadores
+    (pid v3, pid v2, aop pid, outros pids ou doi)
+
+    Se mais de um documento corresponde a um identificador, prevalece
+    o identificador na ordem: pid v3, pid v2, aop pid, outros pids, doi
+
+    Parameters
+    ----------
+    any_doc_ids: list of str
+
+    Returns
+    -------
+    dict
+        identificador => documento (opac_schema.v1.models.Article),
+        somente dos identificadores encontrados
+    """
+    _ids = list(dict.fromkeys(_id for _id in any_doc_ids if _id))
+    if not _ids:
+        return {}
+    query = Q()
+    for field, get_values in _DOCUMENT_ID_FIELDS:
+        query |= Q(**{f"{field}__in": _ids})
     try:
-        articles = models.Article.objects(
-            pk=any_doc_id, **kwargs)
-        if not articles:
-            articles = models.Article.objects(
-                pid=any_doc_id, **kwargs)
-        if not articles:
-            articles = models.Article.objects(
-                aop_pid=any_doc_id, **kwargs)
-        if not articles:
-            articles = models.Article.objects(
-                scielo_pids__other=any_doc_id, **kwargs)
-        if not articles:
-            articles = models.Article.objects(
-                doi=any_doc_id, **kwargs)
-        return articles and articles[0]
+        articles = list(models.Article.objects(query, **kwargs))
     except Exception as e:
         raise exceptions.DBFetchDocumentError(e)
 
+    found = {}
+    for _id in _ids:
+        for field, get_values in _DOCUMENT_ID_FIELDS:
+            for article in articles:
+                if _id in get_values(article):
+                    found[_id] = article
+                    break
+            if _id in found:
+                break
+    return found
+
+
+def fetch_document(any_doc_id, **kwargs):
+    return fetch_documents_by_ids([any_doc_id], **kwargs).get(any_doc_id)
+
 
 def _fetch_record(_id, model, **kwargs):
+    bulk_writer = _bulk_writer.get()
+    if bulk_writer and not kwargs:
+        # registro ainda não gravado por `BulkWriter`
+        obj = bulk_writer.get(model, _id)
+        if obj is not None:
+            return obj
     try:
         obj = model.objects(_id=_id, **kwargs)[0]
     except IndexError:
@@ -119,6 +172,18 @@ def _fetch_record(_id, model, **kwargs):
         return obj
 
 
+def _fetch_record_fields(_id, model, *fields):
+    bulk_writer = _bulk_writer.get()
+    if bulk_writer:
+        obj = bulk_writer.get(model, _id)
+        if obj is not None:
+            return obj
+    try:
+        return model.objects(_id=_id).only(*fields).first()
+    except Exception as e:
+        raise exceptions.DBFetchMigratedDocError(e)
+
+
 def _fetch_records(model, **kwargs):
     try:
         objs = model.objects(**kwargs)
@@ -179,6 +244,14 @@ def fetch_isis_document(_id, **kwargs):
     return _fetch_record(_id, ISISDocument, **kwargs)
 
 
+def fetch_isis_document_migration_status(_id):
+    """
+    Obtém somente `isis_updated_date` e `status` do documento migrado
+    """
+    return _fetch_record_fields(
+        _id, ISISDocument, "isis_updated_date", "status")
+
+
 def create_isis_document():
     try:
         return ISISDocument()
@@ -186,10 +259,71 @@ def create_isis_document():
         raise exceptions.DBCreateDocumentError(e)
 
 
+def register_isis_documents_pending_migration(isis_updated_dates):
+    """
+    Registra em `isis_doc` os documentos cujo `isis_updated_date` mudou,
+    com status "pending_migration", usando uma única consulta e uma única
+    operação `bulk_write` (upsert)
+
+    Parameters
+    ----------
+    isis_updated_dates: dict
+        pid => isis_updated_date
+
+    Returns
+    -------
+    int
+        quantidade de documentos registrados
+    """
+    try:
+        registered_dates = {
+            item["_id"]: item.get("isis_updated_date")
+            for item in ISISDocument.objects(
+                _id__in=list(isis_updated_dates.keys())
+            ).only("isis_updated_date").as_pymongo()
+        }
+    except Exception as e:
+        raise exceptions.DBFetchMigratedDocError(e)
+
+    now = datetime.utcnow()
+    status = get_migration_status("PENDING_MIGRATION")
+    operations = [
+        UpdateOne(
+            {"_id": pid},
+            {
+                "$set": {
+                    "isis_updated_date": isis_updated_date,
+                    "status": status,
+                    "updated": now,
+                },
+                "$setOnInsert": {"created": now},
+            },
+            upsert=True,
+        )
+        for pid, isis_updated_date in isis_updated_dates.items()
+        if registered_dates.get(pid, False) != isis_updated_date
+    ]
+    if not operations:
+        return 0
+    try:
+        ISISDocument._get_collection().bulk_write(operations, ordered=False)
+    except Exception as e:
+        raise exceptions.DBSaveDataError(e)
+    return len(operations)
+
+
 def fetch_isis_journal(_id, **kwargs):
     return _fetch_record(_id, ISISJournal, **kwargs)
 
 
+def fetch_isis_journal_migration_status(_id):
+    """
+    Obtém somente `isis_updated_date` e `status` do periódico migrado
+    """
+    return _fetch_record_fields(
+        _id, ISISJournal, "isis_updated_date", "status")
+
+
 def create_isis_journal():
     try:
         return ISISJournal()
@@ -201,6 +335,14 @@ def fetch_isis_issue(_id, **kwargs):
     return _fetch_record(_id, ISISIssue, **kwargs)
 
 
+def fetch_isis_issue_migration_status(_id):
+    """
+    Obtém somente `isis_updated_date` e `status` do fascículo migrado
+    """
+    return _fetch_record_fields(
+        _id, ISISIssue, "isis_updated_date", "status")
+
+
 def create_isis_issue():
     try:
         return ISISIssue()
@@ -208,7 +350,21 @@ def create_isis_issue():
         raise exceptions.DBCreateDocumentError(e)
 
 
+def fetch_isis_migration_run(_id, **kwargs):
+    return _fetch_record(_id, ISISMigrationRun, **kwargs)
+
+
+def create_isis_migration_run():
+    try:
+        return ISISMigrationRun()
+    except Exception as e:
+        raise exceptions.DBCreateDocumentError(e)
+
+
 def save_data(data):
+    bulk_writer = _bulk_writer.get()
+    if bulk_writer and bulk_writer.accepts(data):
+        return bulk_writer.save(data)
     if not hasattr(data, 'created'):
         data.created = None
     try:
@@ -222,6 +378,195 @@ def save_data(data):
         # exceptions.DBSaveDataError(e)
 
 
+# `BulkWriter` ativo no contexto (thread) atual, usado por `save_data` e
+# pelas consultas por `_id`
+_bulk_writer = ContextVar("bulk_writer", default=None)
+
+
+class BulkWriter:
+    """
+    Acumula os registros salvos por `save_data` e os grava com
+    `bulk_write` (ReplaceOne com upsert, não ordenado), uma operação por
+    coleção, em vez de uma operação por registro
+
+    Somente enquanto ativo (`with writer.activate(item):`), `save_data`
+    acumula os registros dos modelos `models`, associando-os a `item`, e as
+    consultas por `_id` retornam os registros acumulados ainda não gravados.
+    Fora deste bloco, `save_data` grava os registros imediatamente.
+    Quem usa o `BulkWriter` decide quando gravar (`should_flush`, `flush`)
+    e recebe os erros de cada item cujos registros não foram gravados
+
+    Os registros não são gravados por `Document.save()`: `save` reproduz
+    `ISISDocument.save()`, `ISISJournal.save()` e `ISISIssue.save()`
+    (acompanhamento da migração e datas) e os sinais `pre_save`,
+    `pre_save_post_validation` e `post_save` do mongoengine são enviados.
+    Os modelos de `models` que sobrescrevem `save()` com outra lógica não
+    são acumulados, mas gravados imediatamente (`_has_save_hooks`).
+
+    O `Article` do website não é acumulado: cada etapa da migração de um
+    documento (metadados, pdfs, htmls, xmls) o obtém por `fetch_document`,
+    cuja consulta (`_id`, `pid`, `aop_pid`, outros pids, `doi`) não
+    encontraria os registros acumulados, e os documentos são migrados em
+    paralelo por processos (`--workers`), e não em lotes.
+
+    Parameters
+    ----------
+    max_size: int
+        quantidade de registros acumulados a partir da qual `should_flush`
+    max_seconds: int
+        tempo desde a última gravação a partir do qual `should_flush`
+    models: tuple
+        modelos cujos registros são acumulados
+    """
+
+    def __init__(self, max_size=500, max_seconds=5, models=None):
+        self.max_size = max_size
+        self.max_seconds = max_seconds
+        self.models = tuple(
+            model
+            for model in models or _BULK_WRITER_MODELS
+            if not _has_save_hooks(model)
+        )
+        # model => {_id: (obj, mongo document, item)}
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._item = None
+
+    @contextmanager
+    def activate(self, item=None):
+        """
+        Ativa o `BulkWriter` no contexto atual; os registros salvos são
+        associados a `item`
+        """
+        token = _bulk_writer.set(self)
+        self._item = item
+        try:
+            yield self
+        finally:
+            self._item = None
+            _bulk_writer.reset(token)
+
+    @property
+    def size(self):
+        return sum(len(items) for items in self._pending.values())
+
+    def accepts(self, data):
+        return isinstance(data, self.models)
+
+    def get(self, model, _id):
+        try:
+            return self._pending[model][_id][0]
+        except KeyError:
+            return None
+
+    def save(self, data):
+        """
+        Prepara `data` para ser gravado, assim como `data.save()`,
+        e o acumula
+
+        Raises
+        ------
+        mongoengine.errors.ValidationError
+        """
+        model = type(data)
+        signals.pre_save.send(model, document=data)
+        if hasattr(data, "update_migration_tracking"):
+            data.update_migration_tracking()
+        data.updated = datetime.utcnow()
+        if not getattr(data, "created", None):
+            data.created = data.updated
+        data.validate()
+        doc = data.to_mongo()
+        # assim como em `Document.save()`
+        created = "_id" not in doc or bool(data._created)
+        signals.pre_save_post_validation.send(
+            model, document=data, created=created)
+        self._pending.setdefault(model, {})[data.pk] = (
+            data, doc, self._item, created)
+        return data
+
+    def should_flush(self):
+        size = self.size
+        return size >= self.max_size or bool(
+            size and time.monotonic() - self._last_flush >= self.max_seconds
+        )
+
+    def flush(self):
+        """
+        Grava os registros acumulados
+
+        Returns
+        -------
+        list of dict
+            erros dos registros não gravados `{"pid": item, "error": ""}`
+        """
+        errors = []
+        pending, self._pending = self._pending, {}
+        self._last_flush = time.monotonic()
+        for model, items in pending.items():
+            items = list(items.items())
+            operations = [
+                ReplaceOne({"_id": _id}, doc, upsert=True)
+                for _id, (obj, doc, item, created) in items
+            ]
+            collection = model._get_collection()
+            failed = set()
+            try:
+                collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                failed = {
+                    error["index"]
+                    for error in e.details.get("writeErrors", [])
+                }
+                for error in e.details.get("writeErrors", []):
+                    _id, (obj, doc, item, created) = items[error["index"]]
+                    errors.append({
+                        "pid": item,
+                        "error": (
+                            f"{collection.name} {_id}: {error.get('errmsg')}"
+                        ),
+                    })
+            except Exception as e:
+                failed = set(range(len(items)))
+                errors.extend(
+                    {"pid": item, "error": f"{collection.name} {_id}: {e}"}
+                    for _id, (obj, doc, item, created) in items
+                )
+            for i, (_id, (obj, doc, item, created)) in enumerate(items):
+                if i not in failed:
+                    obj._created = False
+                    signals.post_save.send(
+                        model, document=obj, created=created)
+        return errors
+
+
+def _has_save_hooks(model):
+    """
+    Indica se `model` sobrescreve `Document.save()` com lógica que
+    `BulkWriter.save` não reproduz
+    """
+    return model.save not in _REPLAYED_SAVES
+
+
+# `save()` reproduzidos por `BulkWriter.save`: acompanhamento da migração
+# (`update_migration_tracking`) e datas
+_REPLAYED_SAVES = (
+    Document.save,
+    ISISDocument.save,
+    ISISJournal.save,
+    ISISIssue.save,
+)
+
+
+_BULK_WRITER_MODELS = (
+    ISISDocument,
+    ISISJournal,
+    ISISIssue,
+    models.Journal,
+    models.Issue,
+)
+
+
 def create_remote_and_local_file(remote, local, annotation=None):
     try:
         file = {}
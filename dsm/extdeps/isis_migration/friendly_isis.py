@@ -44,6 +44,27 @@ def _get_value(data, tag):
         return None
 
 
+def _get_isis_dates(record):
+    """
+    Returns the dates (YYYYMMDD) of creation and update (v091 and v093)
+    of an ISIS record
+    """
+    dates = (
+        _get_value(record, "v091"),
+        _get_value(record, "v093")
+    )
+    return [d[:8] for d in dates if d]
+
+
+def get_isis_updated_date(record):
+    """
+    Returns the date of the last update (v091 or v093) of an ISIS record
+    """
+    dates = _get_isis_dates(record)
+    if dates:
+        return max(dates)
+
+
 def _get_items(data, tag):
     """
     Returns first value of field `tag`
@@ -160,11 +181,7 @@ class FriendlyISISDocument:
 
     @property
     def isis_dates(self):
-        dates = (
-            _get_value(self._records[0], "v091"),
-            _get_value(self._records[0], "v093")
-        )
-        return [d[:8] for d in dates if d]
+        return _get_isis_dates(self._records[0])
 
     @property
     def isis_updated_date(self):
@@ -763,13 +780,18 @@ class FriendlyISISIssue:
         except KeyError:
             return None
 
+    @property
+    def isis_dates(self):
+        return _get_isis_dates(self._record)
+
     @property
     def isis_created_date(self):
-        return self._get_item_("NotAvailable")
+        if self.isis_dates:
+            return min(self.isis_dates)
 
     @property
     def isis_updated_date(self):
-        return self._get_item_("NotAvailable")
+        return get_isis_updated_date(self._record)
 
     @property
     def iid(self):
@@ -27,10 +27,34 @@ to JSON
 ```
 
 """
+import heapq
+import io
 import json
+import mmap
+import multiprocessing
 import os
+import re
+import tempfile
 
 from dsm.utils import files
+from dsm.utils.parallel import bounded_imap
+
+
+# tamanho aproximado (bytes) dos trechos do arquivo ID lidos em paralelo
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# quantidade aproximada de bytes de registros mantidos em memória
+# por `get_json_records` antes de gravá-los em disco
+JSON_RECORDS_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# caracteres válidos para identificar subcampos
+_SUBFIELD_CHARS = frozenset("_abcdefghijklmnopqrstuvwxyz123456789")
+
+# linha de campo: `!v010!conteúdo`
+_FIELD_ROW = re.compile(r"^[^\n]([^!\n]*)!([^\n]*)", re.M)
+
+# caracteres que `str.splitlines` também considera quebra de linha
+_OTHER_LINE_BOUNDARIES = re.compile("[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
 
 
 def _get_value(data, tag):
@@ -56,6 +80,32 @@ def _get_items(data, tag):
 
 
 def _parse_field_content(content):
+    """
+    Retorna os subcampos de `content` (`^lpt^tTítulo`) em um dict
+
+    Percorre os subcampos uma única vez; se há `\\^` ou subcampos
+    inválidos, usa `_parse_field_content_with_escapes`
+    """
+    if not content:
+        return
+    if "^" not in content:
+        return {"_": content}
+    if "\\^" in content:
+        return _parse_field_content_with_escapes(content)
+    subfields = content.split("^")
+    if subfields[0]:
+        subfields[0] = "_" + subfields[0]
+    d = {}
+    for subf in subfields:
+        if subf:
+            if subf[0] not in _SUBFIELD_CHARS:
+                return _parse_field_content_with_escapes(content)
+            if len(subf) > 1:
+                d[subf[0]] = subf[1:]
+    return d
+
+
+def _parse_field_content_with_escapes(content):
     if not content:
         return
     if "^" not in content:
@@ -88,7 +138,7 @@ def _parse_field_content(content):
 
 
 def _parse_field(data):
-    second_excl_char_pos = data[1:].find("!")+1
+    second_excl_char_pos = max(data.find("!", 1), 0)
     tag = data[1:second_excl_char_pos]
     subfields = _parse_field_content(data[second_excl_char_pos+1:])
     return (tag, subfields)
@@ -106,6 +156,32 @@ def _build_record(record):
     return data
 
 
+def _parse_record(content):
+    """
+    Converte um registro (str) de arquivo ID em JSON record,
+    o mesmo que `_build_record(_get_fields_and_their_content(content))`
+    """
+    if not content:
+        return
+    if _OTHER_LINE_BOUNDARIES.search(content):
+        return _build_record(_get_fields_and_their_content(content))
+    data = {}
+    for tag, field_content in _FIELD_ROW.findall(content):
+        if not tag or not field_content:
+            continue
+        if "^" in field_content:
+            value = _parse_field_content(field_content)
+            if not value:
+                continue
+        else:
+            value = {"_": field_content}
+        if tag in data:
+            data[tag].append(value)
+        else:
+            data[tag] = [value]
+    return data
+
+
 def journal_id(data):
     return _get_value(data, 'v400')
 
@@ -239,30 +315,150 @@ def join_id_file_rows_and_return_records(id_file_rows):
     yield "\n".join(record_rows)
 
 
-def get_id_and_json_records(records, get_id_function):
+def _read_id_file_records(rows, position):
     """
-    Given `records` e `get_id_function`, returns `_id` and `json_records`
+    Junta as linhas `rows` (bytes) de arquivo ID, lidas a partir de
+    `position`, que formam registros e retorna a posição e o registro (str)
+    """
+    record_offset = position
+    record_rows = []
+    for row in rows:
+        if row.startswith(b"!ID "):
+            if len(record_rows):
+                yield record_offset, "\n".join(record_rows)
+                record_rows = []
+            record_offset = position
+        else:
+            record_rows.append(row.decode("iso-8859-1").strip())
+        position += len(row)
+    yield record_offset, "\n".join(record_rows)
+
+
+class IdFileReader:
+    """
+    Lê os registros (str) do arquivo ID `id_file_path` a partir da posição
+    `offset` (bytes), que deve ser o início de uma linha `!ID `
+
+    Durante a leitura, `offset` é a posição do início do último registro
+    retornado e, ao final da leitura, é o tamanho do arquivo
+    """
+
+    def __init__(self, id_file_path, offset=0):
+        self.id_file_path = id_file_path
+        self.offset = offset or 0
+
+    def __iter__(self):
+        with open(self.id_file_path, "rb") as fp:
+            fp.seek(self.offset)
+            for self.offset, record in _read_id_file_records(fp, self.offset):
+                yield record
+            self.offset = fp.tell()
+
+
+def _parse_id_file_chunk(id_file_path, start, end):
+    """
+    Converte os registros do trecho [`start`, `end`) do arquivo ID em
+    JSON records
+
+    Returns
+    -------
+    list of tuples
+        (posição do registro, JSON record)
+    """
+    with open(id_file_path, "rb") as fp:
+        fp.seek(start)
+        rows = io.BytesIO(fp.read(end - start))
+    items = []
+    for position, record_content in _read_id_file_records(rows, start):
+        data = _parse_record(record_content)
+        if data:
+            items.append((position, data))
+    return items
+
+
+class ChunkedIdFileReader:
+    """
+    Lê os JSON records do arquivo ID `id_file_path` a partir da posição
+    `offset` (bytes), assim como `parse_id_records(IdFileReader(...))`,
+    mas os registros são convertidos em paralelo, por `workers` processos
+
+    O arquivo é dividido em trechos de aproximadamente `chunk_size` bytes,
+    que terminam no início de uma linha `!ID `, e os registros são
+    retornados na ordem do arquivo
+
+    Durante a leitura, `offset` é a posição do início do último registro
+    retornado e, ao final da leitura, é o tamanho do arquivo
+    """
+
+    def __init__(self, id_file_path, offset=0, workers=None,
+                 chunk_size=CHUNK_SIZE):
+        self.id_file_path = id_file_path
+        self.offset = offset or 0
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+
+    def _get_chunks(self):
+        with open(self.id_file_path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if self.offset >= size:
+                return
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = self.offset
+                while start < size:
+                    end = mm.find(b"\n!ID ", start + self.chunk_size)
+                    end = size if end == -1 else end + 1
+                    yield self.id_file_path, start, end
+                    start = end
+
+    def __iter__(self):
+        size = os.path.getsize(self.id_file_path)
+        with multiprocessing.Pool(self.workers) as pool:
+            for items in bounded_imap(pool, _parse_id_file_chunk,
+                                      self._get_chunks(), self.workers * 2):
+                for self.offset, data in items:
+                    yield data
+        self.offset = size
+
+
+def parse_id_records(records):
+    """
+    Converte os registros (str) de arquivo ID em JSON records
 
     Parameters
     ----------
     records: list of str
-        linhas do arquivo ID
+        registros do arquivo ID
+
+    Returns
+    -------
+    generator of dict
+    """
+    for record_content in records:
+        data = _parse_record(record_content)
+        if not data:
+            continue
+        yield data
+
+
+def group_json_records_by_id(json_records, get_id_function):
+    """
+    Agrupa JSON records consecutivos que têm o mesmo ID
+
+    Parameters
+    ----------
+    json_records: list of dict
+        registros de arquivo ID ou de base ISIS
     get_id_function: callable
         função que gera o ID do registro
 
     Returns
     -------
-    list of strings
+    generator of tuples
+        (_id, json_records)
     """
     _id = None
     _id_records = []
-    for record_content in records:
-        if not record_content:
-            continue
-        fields = _get_fields_and_their_content(record_content)
-        data = _build_record(fields)
-        if not data:
-            continue
+    for data in json_records:
         _next_id = get_id_function(data)
         if _next_id != _id and _id:
             # _id changed
@@ -277,8 +473,28 @@ def get_id_and_json_records(records, get_id_function):
         _id = _next_id
         # add `data` to `_id_records`
         _id_records.append(data)
-    # returns current _id, _id_records
-    yield (_id, _id_records)
+    if _id_records:
+        # returns current _id, _id_records
+        yield (_id, _id_records)
+
+
+def get_id_and_json_records(records, get_id_function):
+    """
+    Given `records` e `get_id_function`, returns `_id` and `json_records`
+
+    Parameters
+    ----------
+    records: list of str
+        linhas do arquivo ID
+    get_id_function: callable
+        função que gera o ID do registro
+
+    Returns
+    -------
+    list of strings
+    """
+    return group_json_records_by_id(
+        parse_id_records(records), get_id_function)
 
 
 def read_id_file(input_file_path):
@@ -294,14 +510,96 @@ def read_id_file(input_file_path):
         yield "\n".join(rows)
 
 
-def get_json_records(input_file_path, get_id_function):
+def _get_sort_key(item):
+    # registros sem ID (None) antes dos demais
+    _id = item[0]
+    return (_id is not None, _id or "")
+
+
+def _spill_to_disk(items):
+    """
+    Grava os itens (_id, records), ordenados por _id, em arquivo temporário
+    """
+    fp = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for item in sorted(items.items(), key=_get_sort_key):
+        fp.write(json.dumps(item))
+        fp.write("\n")
+    fp.seek(0)
+    return fp
+
+
+def _read_spilled_items(fp):
+    for row in fp:
+        _id, records = json.loads(row)
+        yield _id, records
+
+
+def _merge_spilled_items(spilled_files):
+    """
+    Intercala os itens gravados em `spilled_files`, ordenados por _id, e
+    junta os registros do mesmo _id, mantendo a ordem do arquivo ID
+    """
+    try:
+        merged = heapq.merge(
+            *[_read_spilled_items(fp) for fp in spilled_files],
+            key=_get_sort_key,
+        )
+        current = None
+        for _id, records in merged:
+            if current and current[0] == _id:
+                current[1].extend(records)
+                continue
+            if current:
+                yield current
+            current = (_id, records)
+        if current:
+            yield current
+    finally:
+        for fp in spilled_files:
+            fp.close()
+
+
+def get_json_records(input_file_path, get_id_function, grouped=False,
+                     memory_budget=None):
+    """
+    Retorna os registros do arquivo ID `input_file_path` agrupados por ID
+
+    Parameters
+    ----------
+    input_file_path: str
+        arquivo ID
+    get_id_function: callable
+        função que gera o ID do registro
+    grouped: bool
+        os registros de um mesmo ID são consecutivos no arquivo ID e são
+        retornados à medida que são lidos, como `get_id_and_json_records`
+    memory_budget: int
+        quantidade aproximada de bytes (dos registros no arquivo ID)
+        mantidos em memória; ao ser atingida, os registros lidos são
+        gravados em disco, ordenados por ID, e, ao final, intercalados.
+        Neste caso, os IDs são retornados em ordem crescente
+
+    Returns
+    -------
+    generator of tuples
+        (_id, json_records)
+    """
+    if grouped:
+        yield from group_json_records_by_id(
+            parse_id_records(read_id_file(input_file_path)),
+            get_id_function,
+        )
+        return
+
+    memory_budget = memory_budget or JSON_RECORDS_MEMORY_BUDGET
+    spilled_files = []
     items = {}
+    size = 0
     for record_content in read_id_file(input_file_path):
         if not record_content:
             continue
         try:
-            fields = _get_fields_and_their_content(record_content)
-            data = _build_record(fields)
+            data = _parse_record(record_content)
             if not data:
                 continue
 
@@ -311,7 +609,18 @@ def get_json_records(input_file_path, get_id_function):
 
         except:
             raise
-    return ((k, v) for k, v in items.items())
+        size += len(record_content)
+        if size >= memory_budget:
+            spilled_files.append(_spill_to_disk(items))
+            items = {}
+            size = 0
+
+    if not spilled_files:
+        yield from items.items()
+        return
+    if items:
+        spilled_files.append(_spill_to_disk(items))
+    yield from _merge_spilled_items(spilled_files)
 
 
 def save_json_files(records, output_file_path, get_file_path_function):
@@ -329,9 +638,13 @@ def save_json_files(records, output_file_path, get_file_path_function):
 
 
 def id2json_file(input_file_path, output_file_path, get_id_function,
-                 get_file_path_function):
-    for records in get_json_records(input_file_path, get_id_function):
-        save_json_files(records, output_file_path, get_file_path_function)
+                 get_file_path_function, grouped=False, memory_budget=None):
+    items = get_json_records(
+        input_file_path, get_id_function, grouped, memory_budget)
+    save_json_files(
+        ({"_id": _id, "records": records} for _id, records in items),
+        output_file_path, get_file_path_function,
+    )
 
 
 def get_paragraphs_records(paragraphs_id_file_path):
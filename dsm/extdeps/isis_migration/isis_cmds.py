@@ -2,39 +2,211 @@
 CISIS COMMANDS
 """
 import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from dsm import configuration
 from dsm.utils.files import (
-    create_temp_file, read_file, write_file,
+    create_temp_file, write_file,
     date_now_as_folder_name,
 )
 from dsm import exceptions
 
 
+def _get_cmd_error(args, returncode, stderr, timed_out, timeout):
+    cmd = " ".join(args)
+    if timed_out:
+        return exceptions.CisisCommandError(
+            f"Timeout ({timeout}s) expired: {cmd}"
+        )
+    if returncode != 0:
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode("iso-8859-1", errors="replace")
+        return exceptions.CisisCommandError(
+            f"{cmd} returned {returncode}: {(stderr or '').strip()}"
+        )
+
+
+def run_cisis_command(args, stdout=None, timeout=None):
+    """
+    Executa o utilitário CISIS `args` e aguarda o seu término, sem consumir
+    CPU durante a espera
+
+    Parameters
+    ----------
+    args: list of str
+        comando e seus parâmetros, por exemplo, `["mx", "artigo", "now"]`
+    stdout: file object
+        destino da saída do comando; se None, a saída é retornada
+    timeout: int
+        tempo máximo (segundos) de execução; o padrão é `CISIS_TIMEOUT`
+
+    Returns
+    -------
+    bytes
+        saída do comando (ou None se `stdout` foi informado)
+
+    Raises
+    ------
+    exceptions.CisisCommandError
+    """
+    timeout = timeout or configuration.CISIS_TIMEOUT
+    try:
+        result = subprocess.run(
+            args,
+            stdout=stdout or subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise _get_cmd_error(args, None, None, True, timeout)
+    except OSError as e:
+        raise exceptions.CisisCommandError(
+            f"Unable to execute {' '.join(args)}: {e}"
+        )
+    error = _get_cmd_error(args, result.returncode, result.stderr, False, timeout)
+    if error:
+        raise error
+    return result.stdout
+
+
+class _WaitTimer:
+    """
+    Mede o tempo em que se aguarda o processo, sem contar as pausas
+    (`pause`, `resume`), e executa `on_timeout` quando o tempo medido
+    excede `timeout`
+
+    Parameters
+    ----------
+    timeout: float
+        tempo máximo (segundos) de espera
+    on_timeout: callable
+    interval: float
+        intervalo (segundos) entre as verificações do tempo medido
+    """
+
+    def __init__(self, timeout, on_timeout, interval=1):
+        self.timeout = timeout
+        self.timed_out = threading.Event()
+        self._on_timeout = on_timeout
+        self._lock = threading.Lock()
+        self._waited = 0
+        self._started = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._watch, args=(min(interval, timeout), ), daemon=True)
+        self._thread.start()
+
+    @property
+    def waited(self):
+        with self._lock:
+            if self._started is None:
+                return self._waited
+            return self._waited + time.monotonic() - self._started
+
+    def pause(self):
+        with self._lock:
+            self._waited += time.monotonic() - self._started
+            self._started = None
+
+    def resume(self):
+        with self._lock:
+            self._started = time.monotonic()
+
+    def cancel(self):
+        self._stopped.set()
+
+    def _watch(self, interval):
+        while not self._stopped.wait(interval):
+            if self.waited >= self.timeout:
+                self.timed_out.set()
+                self._on_timeout()
+                return
+
+
+def stream_cisis_command(args, timeout=None):
+    """
+    Executa o utilitário CISIS `args` e retorna as linhas da sua saída à
+    medida que são produzidas
+
+    O tempo em que quem consome a saída processa cada linha não é contado
+    em `timeout`, somente o tempo de espera pelo processo
+
+    Parameters
+    ----------
+    args: list of str
+        comando e seus parâmetros
+    timeout: int
+        tempo máximo (segundos) de espera pela saída e pelo término do
+        comando; o padrão é `CISIS_TIMEOUT`
+
+    Returns
+    -------
+    generator of str
+        linhas da saída do comando
+
+    Raises
+    ------
+    exceptions.CisisCommandError
+    """
+    timeout = timeout or configuration.CISIS_TIMEOUT
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(
+                args, stdout=subprocess.PIPE, stderr=stderr)
+        except OSError as e:
+            raise exceptions.CisisCommandError(
+                f"Unable to execute {' '.join(args)}: {e}"
+            )
+        timer = _WaitTimer(timeout, process.kill)
+        try:
+            for row in process.stdout:
+                timer.pause()
+                yield row.decode("iso-8859-1")
+                timer.resume()
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                # interrompido por quem consome a saída
+                process.kill()
+            process.wait()
+            process.stdout.close()
+        stderr.seek(0)
+        error = _get_cmd_error(
+            args, returncode, stderr.read(), timer.timed_out.is_set(),
+            timeout)
+    if error:
+        raise error
+
+
 def get_document_isis_db(pid):
     """
-    Consulta a base de dados ISIS artigo e retorna os pids atualizados
-    em um intervalo de datas (data de processamento do converter)
+    Cria uma base de dados ISIS temporária somente com os registros
+    do documento `pid`, obtidos da base de dados ISIS artigo
 
+    Returns
+    -------
+    str
+        caminho da base de dados ISIS criada (sem extensão)
+
+    Raises
+    ------
+    exceptions.CisisCommandError
     """
     BASES_ARTIGO_PATH = configuration.get_bases_artigo_path()
     name = date_now_as_folder_name()
-    finished_file_path = create_temp_file(f"{name}_finished.out")
     output_file_path = create_temp_file(f"{name}_output")
 
     cisis_path = configuration.get_cisis_path()
-    cmds = []
-    cmds.append(
-        f'''{cisis_path}/mx {BASES_ARTIGO_PATH} btell=0 '''
-        f'''"bool=IV={pid}$" '''
-        f'''append={output_file_path} now -all'''
-    )
-    cmds.append(
-        f"echo finished > {finished_file_path}"
-    )
-    os.system(";".join(cmds))
-    while "finished" not in read_file(finished_file_path):
-        pass
+    run_cisis_command([
+        os.path.join(cisis_path, "mx"), BASES_ARTIGO_PATH, "btell=0",
+        f"bool=IV={pid}$",
+        f"append={output_file_path}", "now", "-all",
+    ])
     return output_file_path
 
 
@@ -60,6 +232,7 @@ def create_id_file(db_file_path, id_file_path=None):
     exceptions.CisisPathNotFoundMigrationError
     exceptions.MissingI2IdCommandPathEnvVarError
     exceptions.IsisDBNotFoundError
+    exceptions.CisisCommandError
     PermissionError
     FileNotFoundError
     """
@@ -90,15 +263,35 @@ def create_id_file(db_file_path, id_file_path=None):
         write_file(id_file_path, "")
 
     # execute i2id db > id_file_path
-    os.system(f"{i2id_cmd} {db_file_path} > {id_file_path}")
+    with open(id_file_path, "wb") as fp:
+        run_cisis_command([i2id_cmd, db_file_path], stdout=fp)
+    return id_file_path
 
-    # check if id_file_path is valid
-    try:
-        content = read_file(id_file_path, encoding="iso-8859-1")
-    except FileNotFoundError:
-        return None
-    else:
-        return id_file_path
+
+def create_id_files(db_and_id_file_paths, max_workers=None):
+    """
+    Generates the ID files of several ISIS databases concurrently
+
+    Parameters
+    ----------
+    db_and_id_file_paths: list of tuples
+        (db_file_path, id_file_path), `id_file_path` may be None
+    max_workers: int
+        maximum number of `i2id` executed at the same time
+
+    Returns
+    -------
+    list of str
+        id_file_path of each database, in the same order
+
+    Raises
+    ------
+    exceptions.CisisCommandError
+    exceptions.IsisDBNotFoundError
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda paths: create_id_file(*paths), db_and_id_file_paths))
 
 
 def get_id_file_path(source_file_path):
@@ -145,38 +338,30 @@ def get_document_pids_to_migrate(from_date=None, to_date=None):
     Consulta a base de dados ISIS artigo e retorna os pids atualizados
     em um intervalo de datas (data de processamento do converter)
 
+    Os pids são retornados à medida que `ifkeys` os produz
+
+    Raises
+    ------
+    exceptions.CisisCommandError
     """
     BASES_ARTIGO_PATH = configuration.get_bases_artigo_path()
-    name = date_now_as_folder_name()
-    finished_file_path = create_temp_file(f"{name}_finished.out")
-    output_file_path = create_temp_file(f"{name}_output.csv")
     from_date = from_date or '0'*8
     to_date = to_date or '9'*8
-    cmd = (
-        f'''{configuration.get_cisis_path()}/ifkeys {BASES_ARTIGO_PATH} '''
-        f'''from=OAITS={from_date} to=OAITS={to_date} > '''
-        f'''{output_file_path};'''
-        f'''echo finished> {finished_file_path}'''
-    )
-    os.system(cmd)
-    while "finished" not in read_file(finished_file_path):
-        pass
-
-    with open(output_file_path, "r") as fp:
-        """
-        output_file content
-
-         1|OAITS=20210917=2352-22912021005005225
-         1|OAITS=20210917=2352-22912021005005226
-         1|OAITS=20210917=2352-22912021005005227
-         1|OAITS=20210917=2352-22912021005005228
-         1|OAITS=20210917=2675-54752021000300400
-         1|OAITS=20210917=2675-54752021000300401
-         1|OAITS=20210917=2675-54752021000300402
-         1|OAITS=20210917=2675-54752021000300700
-
-        """
-        for row in fp:
-            # 1|OAITS=20210917=2675-54752021000300700
-            parts = row.strip().split("=")
-            yield {"updated": parts[1], "pid": "S" + parts[-1]}
+    rows = stream_cisis_command([
+        os.path.join(configuration.get_cisis_path(), "ifkeys"),
+        BASES_ARTIGO_PATH,
+        f"from=OAITS={from_date}", f"to=OAITS={to_date}",
+    ])
+    # ifkeys output
+    #
+    #  1|OAITS=20210917=2352-22912021005005225
+    #  1|OAITS=20210917=2352-22912021005005226
+    #  1|OAITS=20210917=2675-54752021000300400
+    #  1|OAITS=20210917=2675-54752021000300700
+    for row in rows:
+        row = row.strip()
+        if not row:
+            continue
+        # 1|OAITS=20210917=2675-54752021000300700
+        parts = row.split("=")
+        yield {"updated": parts[1], "pid": "S" + parts[-1]}
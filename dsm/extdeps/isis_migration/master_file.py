@@ -0,0 +1,231 @@
+"""
+Reads ISIS database records directly from its master file (`.mst`) and its
+cross-reference file (`.xrf`), without CISIS utilities (`i2id`) and without
+intermediate ID files
+
+The records are returned as the JSON records of `id2json`
+
+```
+{
+   "v002": [
+       {"_": "1414-431X-bjmbr-1414-431X20165409.xml"}
+   ],
+   "v049": [
+       {"c": "AA970", "l": "pt", "t": "Biodiversidade e Conservação"},
+   ]
+}
+```
+
+Estrutura dos arquivos (little-endian, blocos de 512 bytes)
+
+- `.xrf`: cada bloco tem o número do bloco (int32) e 127 ponteiros (int32),
+  um por MFN; ponteiro = bloco do `.mst` * 2048 + deslocamento no bloco;
+  ponteiro negativo: registro apagado; zero: registro inexistente
+- `.mst`: registro de controle (`nxtmfn` = próximo MFN) seguido dos registros,
+  cada um formado por líder, diretório (tag, pos, len) e campos
+"""
+import mmap
+import os
+import struct
+
+from dsm import exceptions
+from dsm.extdeps.isis_migration.id2json import (
+    _parse_field_content,
+    _build_record,
+)
+
+BLOCK_SIZE = 512
+XRF_POINTERS_PER_BLOCK = 127
+XRF_BLOCK_DIVISOR = 2048
+XRF_OFFSET_MASK = 511
+
+# ctlmfn, nxtmfn, nxtmfb, nxtmfp, mftype, reccnt, mfcxx1, mfcxx2, mfcxx3
+_CONTROL_RECORD = struct.Struct("<iiiHHiiii")
+
+# mfn, mfrl, mfbwb, mfbwp, base, nvf, status
+_LEADERS = (
+    # CISIS (Linux): campos alinhados em 4 bytes
+    struct.Struct("<ih2xiHHHH"),
+    # ISIS / WinISIS: campos compactados
+    struct.Struct("<ihiHHHH"),
+)
+
+# tag, pos, len
+_DIRECTORY_ENTRY = struct.Struct("<HHH")
+
+_XRF_POINTER = struct.Struct("<i")
+
+_DELETED = 1
+
+
+def _map_file(file_path):
+    with open(file_path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MasterFile:
+    """
+    Acessa os registros da base ISIS `db_file_path` (sem extensão) por MFN
+
+    Parameters
+    ----------
+    db_file_path: str
+        path of an ISIS database without extension
+
+    Raises
+    ------
+    exceptions.IsisDBNotFoundError
+    """
+
+    def __init__(self, db_file_path):
+        for ext in (".mst", ".xrf"):
+            if not os.path.isfile(db_file_path + ext):
+                raise exceptions.IsisDBNotFoundError(
+                    f"Not found {db_file_path}{ext}"
+                )
+        self.db_file_path = db_file_path
+        self._mst = _map_file(db_file_path + ".mst")
+        self._xrf = _map_file(db_file_path + ".xrf")
+        self._leader = None
+        try:
+            self.next_mfn = _CONTROL_RECORD.unpack_from(self._mst, 0)[1]
+        except struct.error:
+            self.close()
+            raise exceptions.IsisDBFormatError(
+                f"Invalid master file {db_file_path}.mst"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for mapped in (self._mst, self._xrf):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    @property
+    def max_mfn(self):
+        return self.next_mfn - 1
+
+    def _get_position(self, mfn):
+        """
+        Retorna a posição do registro `mfn` no `.mst` ou None se o registro
+        está apagado ou é inexistente
+        """
+        block, index = divmod(mfn - 1, XRF_POINTERS_PER_BLOCK)
+        xrf_pos = block * BLOCK_SIZE + 4 + index * _XRF_POINTER.size
+        if xrf_pos + _XRF_POINTER.size > len(self._xrf):
+            return None
+        pointer = _XRF_POINTER.unpack_from(self._xrf, xrf_pos)[0]
+        if pointer <= 0:
+            return None
+        mst_block, mst_offset = divmod(pointer, XRF_BLOCK_DIVISOR)
+        return (mst_block - 1) * BLOCK_SIZE + (mst_offset & XRF_OFFSET_MASK)
+
+    def _read_leader(self, mfn, position):
+        """
+        Retorna o formato do líder (alinhado ou compactado) e seus campos,
+        identificando o formato pela consistência entre `base` e `nvf`
+        """
+        leaders = _LEADERS
+        if self._leader:
+            leaders = (self._leader, ) + _LEADERS
+        for leader in leaders:
+            try:
+                values = leader.unpack_from(self._mst, position)
+            except struct.error:
+                break
+            _mfn, mfrl, mfbwb, mfbwp, base, nvf, status = values
+            if _mfn == mfn and base == leader.size + nvf * _DIRECTORY_ENTRY.size:
+                self._leader = leader
+                return leader, values
+        raise exceptions.IsisDBFormatError(
+            f"Unable to read MFN {mfn} from {self.db_file_path}.mst"
+        )
+
+    def get_fields(self, mfn):
+        """
+        Retorna os campos (tag, conteúdo) do registro `mfn`, na ordem do
+        diretório, ou None se o registro está apagado ou é inexistente
+
+        Returns
+        -------
+        list of tuples
+            `[("v002", "1414-431X-bjmbr-1414-431X20165409.xml"), ...]`
+
+        Raises
+        ------
+        exceptions.IsisDBFormatError
+        """
+        if mfn < 1 or mfn >= self.next_mfn:
+            return None
+        position = self._get_position(mfn)
+        if position is None:
+            return None
+        leader, values = self._read_leader(mfn, position)
+        _mfn, mfrl, mfbwb, mfbwp, base, nvf, status = values
+        if status == _DELETED:
+            return None
+
+        fields = []
+        directory_pos = position + leader.size
+        data_pos = position + base
+        for i in range(nvf):
+            tag, pos, length = _DIRECTORY_ENTRY.unpack_from(
+                self._mst, directory_pos + i * _DIRECTORY_ENTRY.size)
+            start = data_pos + pos
+            content = self._mst[start:start + length].decode("iso-8859-1")
+            # o mesmo conteúdo de uma linha do arquivo ID (`!v010!...`)
+            fields.append(("v%03d" % tag, content.rstrip()))
+        return fields
+
+    def get_record(self, mfn):
+        """
+        Retorna o registro `mfn` (JSON record de `id2json`) ou None se o
+        registro está apagado ou é inexistente
+
+        Raises
+        ------
+        exceptions.IsisDBFormatError
+        """
+        fields = self.get_fields(mfn)
+        if fields is None:
+            return None
+        return _build_record(
+            [(tag, _parse_field_content(content)) for tag, content in fields]
+        )
+
+    def records(self, from_mfn=1):
+        """
+        Retorna os MFN e os registros ativos a partir de `from_mfn`
+        """
+        for mfn in range(max(from_mfn, 1), self.next_mfn):
+            record = self.get_record(mfn)
+            if record:
+                yield mfn, record
+
+
+class MasterFileReader:
+    """
+    Lê os registros (JSON records) da base ISIS `db_file_path` a partir do
+    MFN `offset`
+
+    Durante a leitura, `offset` é o MFN do último registro retornado e,
+    ao final da leitura, é o próximo MFN da base
+    """
+
+    def __init__(self, db_file_path, offset=None):
+        self.db_file_path = db_file_path
+        self.offset = offset or 1
+
+    def __iter__(self):
+        with MasterFile(self.db_file_path) as master_file:
+            for mfn, record in master_file.records(self.offset):
+                self.offset = mfn
+                yield record
+            self.offset = master_file.next_mfn
@@ -0,0 +1,246 @@
+"""
+Progresso das execuções da migração de arquivos ID e bases ISIS
+"""
+import logging
+import os
+from collections import deque
+from datetime import datetime
+
+from dsm import configuration
+from dsm.extdeps import db
+from dsm.extdeps.isis_migration import id2json, master_file, records_cache
+from dsm.extdeps.isis_migration.isis_cmds import get_id_file_path
+from dsm.utils.files import date_now_as_folder_name
+
+
+logger = logging.getLogger(__name__)
+
+
+class MigrationJournal:
+    """
+    Registra em `ISISMigrationRun` o progresso da migração de um arquivo ID
+    ou de uma base ISIS: o último item (PID) cuja migração foi concluída,
+    em todas as etapas, e a posição no arquivo ID (bytes) ou na base ISIS
+    (MFN) dos registros seguintes a ele.
+    Assim, uma migração interrompida é retomada a partir desta posição.
+
+    Parameters
+    ----------
+    run : ISISMigrationRun
+    workers : int
+        number of processes which parse the ID file in parallel
+    get_id_function : callable
+        function which returns the ID (PID) of a JSON record
+    """
+
+    def __init__(self, run, workers=None, get_id_function=None):
+        self._run = run
+        self._pending = deque()
+        self.reader, self.json_records = get_source_reader(
+            run.source_file_path, run.offset, workers, get_id_function)
+
+    @property
+    def run_id(self):
+        return self._run._id
+
+    @classmethod
+    def start(cls, source_file_path, db_type, workers=None,
+              get_id_function=None):
+        run = db.create_isis_migration_run()
+        run._id = date_now_as_folder_name()
+        run.db_type = db_type
+        run.source_file_path = source_file_path
+        run.offset = 0
+        run.status = "running"
+        db.save_data(run)
+        logger.info("Started migration run %s (%s)", run._id, source_file_path)
+        return cls(run, workers, get_id_function)
+
+    @classmethod
+    def resume(cls, run_id, db_type, workers=None, get_id_function=None):
+        """
+        Raises
+        ------
+            ValueError
+        """
+        run = db.fetch_isis_migration_run(run_id)
+        if not run:
+            raise ValueError(f"Not found migration run: {run_id}")
+        if run.db_type != db_type:
+            raise ValueError(
+                f"Unable to resume migration run {run_id}. "
+                f"Expected `db_type`: {run.db_type}"
+            )
+        logger.info(
+            "Resuming migration run %s (offset: %s, last_pid: %s)",
+            run._id, run.offset, run.last_pid)
+        return cls(run, workers, get_id_function)
+
+    def track(self, items):
+        """
+        Retorna os itens (pid, records) de `items` a serem migrados,
+        registrando a posição dos registros seguintes a cada um
+        """
+        for pid, records in items:
+            if pid == self._run.last_pid:
+                # item já migrado
+                continue
+            self._pending.append((pid, self.reader.offset))
+            yield pid, records
+
+    def register(self, count=1):
+        """
+        Registra a conclusão da migração dos `count` itens mais antigos
+        em andamento
+        """
+        if not count:
+            return
+        for i in range(count):
+            pid, offset = self._pending.popleft()
+        self._run.last_pid = pid
+        self._run.offset = offset
+        db.save_data(self._run)
+
+    def finish(self):
+        self._run.status = "finished"
+        db.save_data(self._run)
+        logger.info("Finished migration run %s", self._run._id)
+
+
+def get_source_reader(source_file_path, offset=None, workers=None,
+                      get_id_function=None):
+    """
+    Returns the reader of `source_file_path`, which is ID file or
+    ISIS database, and its JSON records.
+    ISIS databases are read directly (`master_file`), without ID files,
+    or from the records cache (`records_cache`), if
+    `configuration.ISIS_RECORDS_CACHE_PATH` and `get_id_function` are set
+
+    Parameters
+    ----------
+    source_file_path: str
+        ISIS database or ID file path
+    offset: int
+        position (bytes) in the ID file or MFN in the ISIS database
+    workers: int
+        number of processes which parse the ID file in parallel,
+        if there is more than one CPU
+    get_id_function: callable
+        function which returns the ID (PID) of a JSON record
+
+    Returns
+    -------
+    tuple
+        (reader, generator of JSON records)
+
+    Raises
+    ------
+        exceptions.IdFileNotFoundError
+        exceptions.IsisDBNotFoundError
+    """
+    name, ext = os.path.splitext(source_file_path)
+    if ext == ".id":
+        id_file_path = get_id_file_path(source_file_path)
+        if workers and workers > 1 and (os.cpu_count() or 1) > 1:
+            # os registros são convertidos em paralelo; com uma única CPU,
+            # a transferência dos registros entre os processos torna a
+            # leitura mais lenta que a leitura sequencial
+            reader = id2json.ChunkedIdFileReader(id_file_path, offset, workers)
+            return reader, reader
+        reader = id2json.IdFileReader(id_file_path, offset)
+        return reader, id2json.parse_id_records(reader)
+    if configuration.ISIS_RECORDS_CACHE_PATH and get_id_function:
+        # os registros são convertidos somente se a base ISIS foi alterada
+        cache = records_cache.get_records_cache(
+            source_file_path,
+            configuration.ISIS_RECORDS_CACHE_PATH,
+            get_id_function,
+        )
+        reader = cache.reader(offset)
+        return reader, reader
+    reader = master_file.MasterFileReader(source_file_path, offset)
+    # verifica se a base ISIS existe
+    master_file.MasterFile(source_file_path).close()
+    return reader, reader
+
+
+def write_in_bulk(items, migrate_item, writer, journal=None):
+    """
+    Migra os itens `(pid, records)` com `migrate_item` e grava os seus
+    registros em lotes, com `writer` ativo somente durante a migração de
+    cada item
+
+    Os resultados dos itens são retornados após a gravação do seu lote,
+    com os erros de gravação do item, no formato dos erros das etapas da
+    migração. A conclusão dos itens é registrada em `journal` somente até
+    o primeiro item cujos registros não foram gravados; a migração
+    retomada (`--resume`) inicia por este item
+
+    Parameters
+    ----------
+    items: generator
+        (pid, records)
+    migrate_item: callable
+        migra um item e retorna `{"pid": "", "events": []}`
+    writer: db.BulkWriter
+    journal: MigrationJournal
+
+    Returns
+    -------
+    generator
+        resultados de `migrate_item`
+    """
+    batch = []
+    failed = False
+    try:
+        for pid, records in items:
+            with writer.activate(pid):
+                batch.append(migrate_item(pid, records))
+            if writer.should_flush():
+                done, batch = batch, []
+                failed = _flush(writer, done, journal, failed)
+                yield from done
+        done, batch = batch, []
+        failed = _flush(writer, done, journal, failed)
+        yield from done
+        if journal and not failed:
+            journal.finish()
+    finally:
+        if batch:
+            # interrompido por quem consome os resultados
+            _flush(writer, batch, journal, failed)
+
+
+def _flush(writer, batch, journal=None, failed=False):
+    """
+    Grava os registros dos itens de `batch`, acrescenta os erros de
+    gravação aos resultados dos itens e registra em `journal` a conclusão
+    dos itens anteriores ao primeiro que falhou
+
+    Returns
+    -------
+    bool
+        houve falha neste ou em um lote anterior
+    """
+    errors = {}
+    for error in writer.flush():
+        errors.setdefault(error["pid"], []).append(error["error"])
+    done = len(batch)
+    for i, item_result in enumerate(batch):
+        item_errors = errors.get(item_result["pid"])
+        if not item_errors:
+            continue
+        done = min(done, i)
+        item_result.setdefault("events", []).extend(
+            {
+                "op": "WRITE",
+                "error": error,
+                "timestamp": datetime.utcnow().isoformat(),
+            }
+            for error in item_errors
+        )
+        logger.error(
+            "Unable to write %s: %s", item_result["pid"], item_errors)
+    if journal and not failed:
+        journal.register(done)
+    return failed or done < len(batch)
@@ -1,5 +1,7 @@
 import os
 import glob
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from scielo_v3_manager.v3_gen import generates
@@ -11,6 +13,7 @@ from dsm.utils.html_utils import (
 )
 
 from dsm.utils.xml_utils import get_xml_tree, tostring
+from dsm.utils.cache import LRUCache
 
 from dsm.utils.async_download import download_files
 from dsm.utils.reqs import (
@@ -28,7 +31,7 @@ from dsm.configuration import (
     check_migration_sources,
     get_files_storage,
     get_db_url,
-    get_paragraphs_id_file_path,
+    get_paragraphs_path,
     DocumentFilesAtOldWebsite,
     get_files_storage_folder_for_published_htmls,
     get_files_storage_folder_for_published_xmls,
@@ -36,6 +39,8 @@ from dsm.configuration import (
     get_htdocs_path,
     get_cisis_path,
     get_bases_artigo_path,
+    MIGRATION_FILES_UPLOAD_WORKERS,
+    ISIS_RECORDS_CACHE_PATH,
 )
 from dsm.core.issue import get_bundle_id
 from dsm.core.document import (
@@ -53,10 +58,15 @@ from dsm.core.sps_package import SPS_Package
 from dsm.extdeps.isis_migration import friendly_isis
 from dsm.extdeps import db
 from dsm.extdeps.isis_migration import migration_models
-from dsm.extdeps.isis_migration.id2json import get_paragraphs_records
+from dsm.extdeps.isis_migration.records_cache import ParagraphsRecords
 from dsm import exceptions
 
 
+# quantidade máxima de periódicos e de fascículos mantidos em cache
+# durante a migração
+LOOKUP_CACHE_SIZE = 256
+
+
 class Tracker:
 
     def __init__(self, tracked_operation):
@@ -91,6 +101,22 @@ class Tracker:
         return {"status": "failed" if self.total_errors > 0 else "success"}
 
 
+def _discards_migrated_document_on_error(stage):
+    """
+    Descarta os dados do documento em migração (`MigratedDocument`) se a
+    etapa `stage` falha, pois podem ter sido parcialmente alterados;
+    a etapa seguinte os obtém novamente do banco de dados
+    """
+    @functools.wraps(stage)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return stage(self, *args, **kwargs)
+        except Exception:
+            self._migrated_document = None
+            raise
+    return wrapper
+
+
 class MigrationManager:
     """
     Obtém os dados das bases ISIS: artigo, title e issue.
@@ -117,28 +143,141 @@ class MigrationManager:
         self._db_url = get_db_url()
         self._files_storage = get_files_storage()
         check_migration_sources()
+        # dados do documento em migração, compartilhados pelas etapas
+        self._migrated_document = None
+        # dados consultados repetidamente durante uma execução da migração
+        # (`clear_caches`); cada processo (`--workers`) tem os seus, os
+        # quais não são invalidados pelos registros feitos nos demais
+        self._isis_journal_acronyms = LRUCache(LOOKUP_CACHE_SIZE)
+        self._isis_issues = LRUCache(LOOKUP_CACHE_SIZE)
+        self._issues = LRUCache(LOOKUP_CACHE_SIZE)
+        # registros de parágrafos externos à base artigo (artigo/p/)
+        self._paragraphs_records = ParagraphsRecords(
+            get_paragraphs_path(), ISIS_RECORDS_CACHE_PATH)
+
+    def db_connect(self, reconnect=False):
+        db.mk_connection(self._db_url, reconnect)
+
+    def clear_caches(self):
+        """
+        Descarta os periódicos, fascículos e o documento mantidos em
+        memória, no início de cada execução da migração, para que os
+        registros alterados por outras execuções ou processos sejam
+        obtidos novamente
+        """
+        self._isis_journal_acronyms.clear()
+        self._isis_issues.clear()
+        self._issues.clear()
+        self._migrated_document = None
 
-    def db_connect(self):
-        db.mk_connection(self._db_url)
+    def _get_migrated_document(self, _id):
+        """
+        Obtém os dados do documento `_id` em migração
 
-    def create_mininum_record_in_isis_doc(self, pid, isis_updated_date):
+        `MigratedDocument` é criado uma única vez por documento e é
+        compartilhado pelas etapas seguintes a `register_isis_document`,
+        evitando consultas ao banco de dados e ao sistema de arquivos
+        repetidas a cada etapa; é descartado por `register_isis_document`
+        e pelas etapas que falham
         """
-        Create a record in isis_doc only with pid, isis_updated_date and
-        status == "pending_migration"
+        if (self._migrated_document is None or
+                self._migrated_document._id != _id):
+            self._migrated_document = MigratedDocument(
+                _id, isis_issue=self._get_isis_issue(_id[1:18]))
+        return self._migrated_document
+
+    def _get_isis_journal_acronym(self, journal_pid):
+        def _get_acronym():
+            journal = db.fetch_isis_journal(journal_pid)
+            return friendly_isis.FriendlyISISJournal(
+                journal._id, journal.record).acronym
+        return self._isis_journal_acronyms.get_or_set(
+            journal_pid, _get_acronym)
+
+    def _get_isis_issue(self, issue_pid):
+        return self._isis_issues.get_or_set(
+            issue_pid, lambda: db.fetch_isis_issue(issue_pid))
+
+    def _get_issue(self, issue_id):
+        return self._issues.get_or_set(
+            issue_id, lambda: db.fetch_issue(issue_id))
+
+    def is_isis_document_up_to_date(self, _id, records):
         """
-        isis_document = (
-            db.fetch_isis_document(pid) or
-            db.create_isis_document()
+        Indica se o documento já foi migrado e publicado com a mesma
+        versão (`isis_updated_date`) de `records`
+
+        Parameters
+        ----------
+        _id: str
+        records : list of dict
+
+        Returns
+        -------
+        bool
+        """
+        isis_updated_date = friendly_isis.get_isis_updated_date(records[0])
+        if not isis_updated_date:
+            return False
+        registered = db.fetch_isis_document_migration_status(_id)
+        return bool(
+            registered and
+            registered.isis_updated_date == isis_updated_date and
+            registered.status in (
+                migration_models.get_migration_status("PUBLISHED_INCOMPLETE"),
+                migration_models.get_migration_status("PUBLISHED_COMPLETE"),
+            )
+        )
+
+    def is_isis_journal_up_to_date(self, _id, record):
+        """
+        Indica se o periódico já foi migrado e publicado com a mesma
+        versão (`isis_updated_date`) de `record`
+
+        Parameters
+        ----------
+        _id: str
+        record : dict
+
+        Returns
+        -------
+        bool
+        """
+        journal = friendly_isis.FriendlyISISJournal(_id, record)
+        if not journal.isis_updated_date:
+            return False
+        registered = db.fetch_isis_journal_migration_status(_id)
+        return bool(
+            registered and
+            registered.isis_updated_date == journal.isis_updated_date and
+            registered.status ==
+            migration_models.get_migration_status("PUBLISHED_COMPLETE")
+        )
+
+    def is_isis_issue_up_to_date(self, _id, record):
+        """
+        Indica se o fascículo já foi migrado e publicado com a mesma
+        versão (`isis_updated_date`) de `record`
+
+        Parameters
+        ----------
+        _id: str
+        record : dict
+
+        Returns
+        -------
+        bool
+        """
+        issue = friendly_isis.FriendlyISISIssue(_id, record)
+        if not issue.isis_updated_date:
+            return False
+        registered = db.fetch_isis_issue_migration_status(issue._id)
+        return bool(
+            registered and
+            registered.isis_updated_date == issue.isis_updated_date and
+            registered.status ==
+            migration_models.get_migration_status("PUBLISHED_COMPLETE")
         )
-        tracker = None
-        if isis_document.isis_updated_date != isis_updated_date:
-            tracker = Tracker("create_mininum_record_in_isis_doc")
-            tracker.info("created minimum record")
-            isis_document._id = pid
-            isis_document.isis_updated_date = isis_updated_date
-            isis_document.update_status("PENDING_MIGRATION")
-            db.save_data(isis_document)
-        return isis_document, tracker
 
     def register_isis_document(self, _id, records):
         """
@@ -159,14 +298,15 @@ class MigrationManager:
             dsm.storage.db.DBSaveDataError
             dsm.storage.db.DBCreateDocumentError
         """
+        # descarta os dados do documento migrado anteriormente
+        self._migrated_document = None
+
         # recupera `isis_document` ou cria se não existir
 
         # se existirem osregistros de parágrafos que estejam externos à
         # base artigo, ou seja, em artigo/p/ISSN/ANO/ISSUE_ORDER/...,
         # os recupera e os ingressa junto aos registros da base artigo
-        p_records = (
-            get_paragraphs_records(get_paragraphs_id_file_path(_id)) or []
-        )
+        p_records = self._paragraphs_records.get_records(_id)
         tracker = Tracker("register_isis_document")
         tracker.info(f"total of external p records: {len(p_records)}")
 
@@ -188,10 +328,7 @@ class MigrationManager:
         isis_document.file_type = doc.file_type
         isis_document.issue_folder = doc.issue_folder
 
-        journal = db.fetch_isis_journal(doc.journal_pid)
-        _journal = friendly_isis.FriendlyISISJournal(
-            journal._id, journal.record)
-        isis_document.acron = _journal.acronym
+        isis_document.acron = self._get_isis_journal_acronym(doc.journal_pid)
 
         # salva o documento
         db.save_data(isis_document)
@@ -227,9 +364,11 @@ class MigrationManager:
         isis_journal.isis_updated_date = journal.isis_updated_date
         isis_journal.isis_created_date = journal.isis_created_date
         isis_journal.record = journal.record
+        isis_journal.update_status("ISIS_METADATA_MIGRATED")
 
         # salva o journal
         db.save_data(isis_journal)
+        self._isis_journal_acronyms.invalidate(isis_journal._id)
         return isis_journal, None
 
     def register_isis_issue(self, _id, record):
@@ -262,9 +401,11 @@ class MigrationManager:
         isis_issue.isis_updated_date = issue.isis_updated_date
         isis_issue.isis_created_date = issue.isis_created_date
         isis_issue.record = issue.record
+        isis_issue.update_status("ISIS_METADATA_MIGRATED")
 
         # salva o issue
         db.save_data(isis_issue)
+        self._isis_issues.invalidate(isis_issue._id)
         return isis_issue, None
 
     def publish_journal_data(self, journal_id):
@@ -296,6 +437,10 @@ class MigrationManager:
 
         # salva os dados
         db.save_data(journal)
+
+        # indica que o periódico foi publicado com esta versão
+        i_journal.update_status("PUBLISHED_COMPLETE")
+        db.save_data(i_journal)
         return journal, None
 
     def publish_issue_data(self, issue_id):
@@ -325,8 +470,15 @@ class MigrationManager:
 
         # salva os dados
         db.save_data(issue)
+
+        # indica que o fascículo foi publicado com esta versão
+        i_issue.update_status("PUBLISHED_COMPLETE")
+        db.save_data(i_issue)
+        # o fascículo é consultado por `_id` ou por `bundle_id`
+        self._issues.clear()
         return issue, None
 
+    @_discards_migrated_document_on_error
     def publish_document_metadata(self, article_id):
         """
         Update the website document
@@ -340,7 +492,7 @@ class MigrationManager:
         dict
         """
         # obtém os dados de artigo migrado
-        migrated_document = MigratedDocument(article_id)
+        migrated_document = self._get_migrated_document(article_id)
 
         # cria ou recupera o registro de documento do website
         document = db.fetch_document(article_id) or db.create_document()
@@ -353,7 +505,7 @@ class MigrationManager:
             migrated_document.number,
             migrated_document.suppl,
         )
-        issue = db.fetch_issue(bundle_id) or db.create_issue()
+        issue = self._get_issue(bundle_id) or db.create_issue()
 
         # atualiza os dados
         _update_document_with_isis_data(document, migrated_document, issue)
@@ -370,6 +522,7 @@ class MigrationManager:
         db.save_data(migrated_document._isis_document)
         return document, None
 
+    @_discards_migrated_document_on_error
     def publish_document_pdfs(self, article_pid):
         """
         Update the website document pdfs
@@ -385,7 +538,7 @@ class MigrationManager:
         dict
         """
         # obtém os dados de artigo
-        migrated = MigratedDocument(article_pid)
+        migrated = self._get_migrated_document(article_pid)
 
         tracker = Tracker("publish_document_pdfs")
 
@@ -408,6 +561,7 @@ class MigrationManager:
 
         return document, tracker
 
+    @_discards_migrated_document_on_error
     def publish_document_htmls(self, article_pid):
         """
         Update the website document htmls
@@ -426,7 +580,7 @@ class MigrationManager:
         dict
         """
         # obtém os dados de artigo
-        migrated = MigratedDocument(article_pid)
+        migrated = self._get_migrated_document(article_pid)
 
         if migrated.isis_doc.file_type != "html":
             return
@@ -481,6 +635,7 @@ class MigrationManager:
             db.save_data(migrated._isis_document)
         return document, tracker
 
+    @_discards_migrated_document_on_error
     def publish_document_xmls(self, article_pid):
         """
         Update the website document xmls
@@ -499,7 +654,7 @@ class MigrationManager:
         dict
         """
         # obtém os dados de artigo
-        migrated = MigratedDocument(article_pid)
+        migrated = self._get_migrated_document(article_pid)
 
         if migrated.isis_doc.file_type != "xml":
             return
@@ -554,6 +709,7 @@ class MigrationManager:
 
         return document, tracker
 
+    @_discards_migrated_document_on_error
     def migrate_document_files(self, article_pid):
         """
         Migrate document files
@@ -575,7 +731,7 @@ class MigrationManager:
         -------
         dict
         """
-        migrated_document = MigratedDocument(article_pid)
+        migrated_document = self._get_migrated_document(article_pid)
 
         migrated_document.tracker = Tracker("migrate_document_files")
         migrated_document.files_to_zip = []
@@ -966,10 +1122,12 @@ def _update_journal_with_isis_data(journal, f_journal):
 
 class MigratedDocument:
 
-    def __init__(self, _id):
+    def __init__(self, _id, upload_workers=None, isis_issue=None):
         self._id = _id
+        # quantidade máxima de arquivos registrados simultaneamente
+        self._upload_workers = upload_workers or MIGRATION_FILES_UPLOAD_WORKERS
         self._isis_document = db.fetch_isis_document(_id)
-        self._isis_issue = db.fetch_isis_issue(_id[1:18])
+        self._isis_issue = isis_issue or db.fetch_isis_issue(_id[1:18])
 
         if not self.isis_doc:
             raise exceptions.DBFetchDocumentError("%s is not migrated" % _id)
@@ -1146,27 +1304,69 @@ class MigratedDocument:
                 "basename": os.path.basename(pdf_path)
             }
 
-    def _migrate_document_file(self, files_storage, file_path, basename, annotation=None):
-
-        self.tracker.info(f"migrate {file_path}")
-
-        # identificar para inserir no zip do pacote
-        self.files_to_zip.append(file_path)
-
+    def _register_file(self, files_storage, file_path, basename):
+        """
+        Registra o arquivo na nuvem e retorna (remote, error)
+        """
         try:
-            # registra o arquivo na nuvem
             remote = files_storage.register(
                 file_path, self._files_storage_folder,
                 basename, preserve_name=True)
-
-            self.tracker.info(f"migrated {remote}")
         except Exception as e:
-            self.tracker.error(
-                f"Unable to register {file_path} in files storage: {e}"
-            )
-        else:
-            return db.create_remote_and_local_file(
-                remote, basename, annotation)
+            return None, e
+        return remote, None
+
+    def _migrate_document_files(self, files_storage, files):
+        """
+        Registra os arquivos `files` na nuvem, até `upload_workers`
+        simultaneamente, e retorna os registros (RemoteAndLocalFile ou None)
+        na mesma ordem de `files`.
+        Os eventos de `tracker` são registrados na ordem de `files`,
+        independentemente da ordem em que os registros são concluídos
+
+        Parameters
+        ----------
+        files: list of tuples
+            (file_path, basename, annotation)
+
+        Returns
+        -------
+        list
+        """
+        files = list(files)
+        if not files:
+            return []
+        workers = min(self._upload_workers, len(files))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda item: self._register_file(
+                    files_storage, item[0], item[1]),
+                files,
+            ))
+
+        migrated = []
+        for (file_path, basename, annotation), (remote, error) in zip(
+                files, results):
+            self.tracker.info(f"migrate {file_path}")
+
+            # identificar para inserir no zip do pacote
+            self.files_to_zip.append(file_path)
+
+            if error:
+                self.tracker.error(
+                    f"Unable to register {file_path} in files storage: {error}"
+                )
+                migrated.append(None)
+            else:
+                self.tracker.info(f"migrated {remote}")
+                migrated.append(
+                    db.create_remote_and_local_file(
+                        remote, basename, annotation))
+        return migrated
+
+    def _migrate_document_file(self, files_storage, file_path, basename, annotation=None):
+        return self._migrate_document_files(
+            files_storage, [(file_path, basename, annotation)])[0]
 
     def migrate_pdfs(self, files_storage):
         """
@@ -1175,17 +1375,20 @@ class MigratedDocument:
         Atualiza os dados de PDF de `isis_document`
         """
         pdfs = {}
-        _uris_and_names = []
+        _files = []
 
         for pdf in self.original_pdf_paths:
             file_path = pdf["path"]
             lang = pdf["lang"]
 
             pdfs[lang] = pdf["basename"]
-            migrated = self._migrate_document_file(files_storage, file_path, pdf["basename"])
-            if migrated:
-                _uris_and_names.append(migrated)
+            _files.append((file_path, pdf["basename"], None))
 
+        _uris_and_names = [
+            migrated
+            for migrated in self._migrate_document_files(files_storage, _files)
+            if migrated
+        ]
         self.isis_doc.pdfs = pdfs
         self.isis_doc.pdf_files = _uris_and_names
 
@@ -1217,14 +1420,17 @@ class MigratedDocument:
         if self.isis_doc.file_type != "xml":
             return
         _files = []
-        _uris_and_names = []
+        _files_to_migrate = []
         for file_path in self._document_files.htdocs_img_revistas_files_paths:
             name = os.path.basename(file_path)
-            migrated = self._migrate_document_file(
-                files_storage, file_path, name)
-            if migrated:
-                _uris_and_names.append(migrated)
+            _files_to_migrate.append((file_path, name, None))
             _files.append(name)
+        _uris_and_names = [
+            migrated
+            for migrated in self._migrate_document_files(
+                files_storage, _files_to_migrate)
+            if migrated
+        ]
         self.isis_doc.assets = _files
         self.isis_doc.asset_files = _uris_and_names
 
@@ -1288,7 +1494,7 @@ class MigratedDocument:
             return
         htmls = []
         _files = []
-        _uris_and_names = []
+        _files_to_migrate = []
 
         for lang, assets in self.assets_location.items():
 
@@ -1310,11 +1516,14 @@ class MigratedDocument:
                     "attr": asset["attr"],
                     "lang": lang,
                 }
-                migrated = self._migrate_document_file(
-                    files_storage, file_path, basename, annotation)
-                if migrated:
-                    _uris_and_names.append(migrated)
-
+                _files_to_migrate.append((file_path, basename, annotation))
+
+        _uris_and_names = [
+            migrated
+            for migrated in self._migrate_document_files(
+                files_storage, _files_to_migrate)
+            if migrated
+        ]
         self.isis_doc.assets = _files
         self.isis_doc.asset_files = _uris_and_names
 
@@ -1354,18 +1563,22 @@ class MigratedDocument:
         else:
             # HTML Traduções
             _translations = {}
+            _files_to_migrate = []
             for lang, front_and_back in self.html_translations_files.items():
                 _translations[lang] = {}
                 for label, file_path in front_and_back.items():
                     # HTML front or back filename
                     _translations[lang][label] = os.path.basename(file_path)
-                    # upload to the cloud
-                    self.tracker.info(f"migrate {file_path}")
                     # armazena o original
-                    migrated = self._migrate_document_file(
-                        files_storage, file_path, _translations[lang][label])
-                    if migrated:
-                        _uris_and_names.append(migrated)
+                    _files_to_migrate.append(
+                        (file_path, _translations[lang][label], None))
+            # upload to the cloud
+            _uris_and_names = [
+                migrated
+                for migrated in self._migrate_document_files(
+                    files_storage, _files_to_migrate)
+                if migrated
+            ]
             self.isis_doc.html_files = _uris_and_names
             self.isis_doc.translations = _translations
 
@@ -11,6 +11,7 @@ from mongoengine import (
     ListField,
     Q,
     DecimalField,
+    LongField,
 )
 from opac_schema.v2.models import RemoteAndLocalFile
 
@@ -286,7 +287,10 @@ class ISISDocument(Document):
                     published_htmls[f"published html ({item['lang']})"] = 1
             self.tracked_files_to_publish.update(published_htmls)
 
-    def save(self, *args, **kwargs):
+    def update_migration_tracking(self):
+        """
+        Atualiza os dados de acompanhamento da migração, antes de salvar
+        """
         # update files migration status
         self.update_tracked_files_to_migrate()
 
@@ -301,6 +305,9 @@ class ISISDocument(Document):
                 self.tracked_files_publication_progress == 1.0):
             self.update_status("PUBLISHED_COMPLETE")
 
+    def save(self, *args, **kwargs):
+        self.update_migration_tracking()
+
         # dates
         self.updated = datetime.utcnow()
         if not self.created:
@@ -325,6 +332,9 @@ class ISISJournal(Document):
     # registro no formato json correspondente ao conteúdo da base isis
     record = DictField()
 
+    # status da migração: isis_metadata_migrated, published_complete
+    status = StringField()
+
     # data de criação e atualização da migração
     created = DateTimeField()
     updated = DateTimeField()
@@ -334,6 +344,7 @@ class ISISJournal(Document):
         'indexes': [
             'updated',
             'isis_updated_date',
+            'status',
         ],
     }
 
@@ -343,6 +354,9 @@ class ISISJournal(Document):
             self.created = self.updated
         return super(ISISJournal, self).save(*args, **kwargs)
 
+    def update_status(self, STATUS):
+        self.status = get_migration_status(STATUS)
+
     def __unicode__(self):
         return '%s' % self._id
 
@@ -361,6 +375,9 @@ class ISISIssue(Document):
     # registro no formato json correspondente ao conteúdo da base isis
     record = DictField()
 
+    # status da migração: isis_metadata_migrated, published_complete
+    status = StringField()
+
     # data de criação e atualização da migração
     created = DateTimeField()
     updated = DateTimeField()
@@ -370,6 +387,7 @@ class ISISIssue(Document):
         'indexes': [
             'updated',
             'isis_updated_date',
+            'status',
         ],
     }
 
@@ -379,6 +397,52 @@ class ISISIssue(Document):
             self.created = self.updated
         return super(ISISIssue, self).save(*args, **kwargs)
 
+    def update_status(self, STATUS):
+        self.status = get_migration_status(STATUS)
+
+    def __unicode__(self):
+        return '%s' % self._id
+
+
+class ISISMigrationRun(Document):
+    """
+    Armazena o progresso de uma execução da migração de uma base ISIS,
+    para que seja possível retomá-la em caso de interrupção
+    """
+    _id = StringField(max_length=32, primary_key=True, required=True)
+
+    # tipo de base: title, issue, artigo
+    db_type = StringField()
+
+    # arquivo ID migrado
+    source_file_path = StringField()
+
+    # posição (bytes) em `source_file_path` dos registros seguintes ao
+    # último item (`last_pid`) cuja migração foi concluída
+    offset = LongField()
+    last_pid = StringField()
+
+    # running | finished
+    status = StringField()
+
+    # data de criação e atualização
+    created = DateTimeField()
+    updated = DateTimeField()
+
+    meta = {
+        'collection': 'isis_migration_run',
+        'indexes': [
+            'updated',
+            'status',
+        ],
+    }
+
+    def save(self, *args, **kwargs):
+        self.updated = datetime.utcnow()
+        if not self.created:
+            self.created = self.updated
+        return super(ISISMigrationRun, self).save(*args, **kwargs)
+
     def __unicode__(self):
         return '%s' % self._id
 
@@ -0,0 +1,459 @@
+"""
+Cache, em disco, dos registros (JSON records) de bases ISIS,
+índice dos MFNs dos registros de cada PID (`PidIndex`) e
+registros de parágrafos externos à base artigo (`ParagraphsRecords`)
+
+Os registros da base ISIS são convertidos uma única vez e gravados em
+`<cache_dir>/<base>-<hash do caminho>.jsonl`, um JSON record por linha,
+na ordem dos MFNs. O índice (`.idx`) contém:
+
+- `source`: caminho, data de modificação e tamanho do `.mst`,
+  que identificam a versão da base ISIS em cache
+- `mfns` e `positions`: MFN e posição (bytes) de cada registro
+- `next_mfn`: próximo MFN da base ISIS
+- `ids`: trechos (bytes) do arquivo de registros de cada ID
+
+Enquanto o `.mst` não é alterado, as migrações leem os registros do cache,
+sem converter novamente a base ISIS, e os registros de um ID (PID) são
+obtidos diretamente da sua posição no arquivo de registros
+"""
+import bisect
+import hashlib
+import json
+import os
+import tempfile
+from itertools import islice
+
+from dsm.extdeps.isis_migration import id2json, master_file
+
+
+class RecordsCache:
+    """
+    Cache dos registros da base ISIS `db_file_path` em `cache_dir`
+
+    Parameters
+    ----------
+    db_file_path: str
+        base ISIS (sem extensão)
+    cache_dir: str
+        pasta dos arquivos de cache
+    get_id_function: callable
+        função que gera o ID do registro
+    """
+
+    def __init__(self, db_file_path, cache_dir, get_id_function):
+        self.db_file_path = db_file_path
+        self.cache_dir = cache_dir
+        self.get_id_function = get_id_function
+
+        self.records_file_path = _get_cache_file_path(
+            cache_dir, db_file_path, ".jsonl")
+        self.index_file_path = _get_cache_file_path(
+            cache_dir, db_file_path, ".idx")
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = _read_json_file(self.index_file_path)
+        return self._index
+
+    def is_valid(self):
+        """
+        Indica se o cache corresponde à versão atual do `.mst`
+        """
+        return _is_valid(self.index, self.db_file_path)
+
+    def build(self):
+        """
+        Converte os registros da base ISIS e grava o arquivo de registros e
+        o índice. Os arquivos são gravados em arquivos temporários e, somente
+        ao final, substituem os anteriores
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source = _get_source(self.db_file_path)
+        mfns = []
+        positions = []
+        ids = {}
+        position = 0
+        records_file_path = _create_temp_file(self.cache_dir)
+        try:
+            with open(records_file_path, "wb") as fp, \
+                    master_file.MasterFile(self.db_file_path) as mst:
+                for mfn, record in mst.records():
+                    row = json.dumps(record).encode("utf-8") + b"\n"
+                    fp.write(row)
+
+                    end = position + len(row)
+                    ranges = ids.setdefault(self.get_id_function(record), [])
+                    if ranges and ranges[-1][1] == position:
+                        # registro consecutivo do mesmo ID
+                        ranges[-1][1] = end
+                    else:
+                        ranges.append([position, end])
+                    mfns.append(mfn)
+                    positions.append(position)
+                    position = end
+                next_mfn = mst.next_mfn
+
+            index = {
+                "source": source,
+                "next_mfn": next_mfn,
+                "mfns": mfns,
+                "positions": positions,
+                "ids": ids,
+            }
+            os.replace(records_file_path, self.records_file_path)
+            _write_json_file(index, self.index_file_path)
+        except BaseException:
+            _remove(records_file_path)
+            raise
+        self._index = index
+        return self
+
+    def reader(self, offset=None):
+        return RecordsCacheReader(self, offset)
+
+    def get_records(self, _id):
+        """
+        Retorna os registros de `_id`
+
+        Returns
+        -------
+        list of dict
+        """
+        records = []
+        ranges = self.index.get("ids", {}).get(_id)
+        if not ranges:
+            return records
+        with open(self.records_file_path, "rb") as fp:
+            for start, end in ranges:
+                fp.seek(start)
+                records.extend(
+                    json.loads(row) for row in fp.read(end - start).splitlines()
+                )
+        return records
+
+
+class RecordsCacheReader:
+    """
+    Lê os registros (JSON records) de `cache` a partir do MFN `offset`,
+    assim como `master_file.MasterFileReader`
+
+    Durante a leitura, `offset` é o MFN do último registro retornado e,
+    ao final da leitura, é o próximo MFN da base
+    """
+
+    def __init__(self, cache, offset=None):
+        self.cache = cache
+        self.offset = offset or 1
+
+    def __iter__(self):
+        index = self.cache.index
+        mfns = index["mfns"]
+        start = bisect.bisect_left(mfns, self.offset)
+        if start < len(mfns):
+            with open(self.cache.records_file_path, "rb") as fp:
+                fp.seek(index["positions"][start])
+                for mfn, row in zip(islice(mfns, start, None), fp):
+                    self.offset = mfn
+                    yield json.loads(row)
+        self.offset = index["next_mfn"]
+
+
+def get_records_cache(db_file_path, cache_dir, get_id_function):
+    """
+    Retorna o cache dos registros da base ISIS `db_file_path`,
+    criando-o ou atualizando-o se a base ISIS foi alterada
+
+    Raises
+    ------
+        exceptions.IsisDBNotFoundError
+        exceptions.IsisDBFormatError
+    """
+    cache = RecordsCache(db_file_path, cache_dir, get_id_function)
+    if not cache.is_valid():
+        # verifica se a base ISIS existe
+        master_file.MasterFile(db_file_path).close()
+        cache.build()
+    return cache
+
+
+class PidIndex:
+    """
+    Índice persistente dos MFNs dos registros de cada ID (PID) da base ISIS
+    `db_file_path`, gravado em `cache_dir`.
+    Os registros de um PID são lidos diretamente da base ISIS
+    (`master_file`), sem consultas com `mx`
+
+    Parameters
+    ----------
+    db_file_path: str
+        base ISIS (sem extensão)
+    cache_dir: str
+        pasta dos arquivos de cache
+    get_id_function: callable
+        função que gera o ID do registro
+    """
+
+    def __init__(self, db_file_path, cache_dir, get_id_function):
+        self.db_file_path = db_file_path
+        self.cache_dir = cache_dir
+        self.get_id_function = get_id_function
+        self.index_file_path = _get_cache_file_path(
+            cache_dir, db_file_path, ".pids")
+        self._index = None
+        self._master_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = _read_json_file(self.index_file_path)
+        return self._index
+
+    def is_valid(self):
+        """
+        Indica se o índice corresponde à versão atual do `.mst`
+        """
+        return _is_valid(self.index, self.db_file_path)
+
+    def build(self):
+        """
+        Lê os registros da base ISIS e grava os MFNs de cada ID
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source = _get_source(self.db_file_path)
+        pids = {}
+        with master_file.MasterFile(self.db_file_path) as mst:
+            for mfn, record in mst.records():
+                ranges = pids.setdefault(self.get_id_function(record), [])
+                if ranges and ranges[-1][1] == mfn - 1:
+                    # registro consecutivo do mesmo ID
+                    ranges[-1][1] = mfn
+                else:
+                    ranges.append([mfn, mfn])
+        index = {"source": source, "pids": pids}
+        _write_json_file(index, self.index_file_path)
+        self._index = index
+        return self
+
+    def get_mfns(self, _id):
+        """
+        Retorna os MFNs dos registros de `_id`
+
+        Returns
+        -------
+        list of int
+        """
+        return [
+            mfn
+            for first, last in self.index.get("pids", {}).get(_id) or []
+            for mfn in range(first, last + 1)
+        ]
+
+    def get_records(self, _id):
+        """
+        Retorna os registros de `_id`
+
+        Returns
+        -------
+        list of dict
+        """
+        mfns = self.get_mfns(_id)
+        if not mfns:
+            return []
+        if self._master_file is None:
+            self._master_file = master_file.MasterFile(self.db_file_path)
+        records = []
+        for mfn in mfns:
+            record = self._master_file.get_record(mfn)
+            if record:
+                records.append(record)
+        return records
+
+    def close(self):
+        if self._master_file is not None:
+            self._master_file.close()
+            self._master_file = None
+
+
+def get_pid_index(db_file_path, cache_dir, get_id_function):
+    """
+    Retorna o índice dos PIDs da base ISIS `db_file_path`,
+    criando-o ou atualizando-o se a base ISIS foi alterada
+
+    Raises
+    ------
+        exceptions.IsisDBNotFoundError
+        exceptions.IsisDBFormatError
+    """
+    index = PidIndex(db_file_path, cache_dir, get_id_function)
+    if not index.is_valid():
+        # verifica se a base ISIS existe
+        master_file.MasterFile(db_file_path).close()
+        index.build()
+    return index
+
+
+class ParagraphsRecords:
+    """
+    Registros de parágrafos externos à base artigo, ou seja, os arquivos ID
+    `paragraphs_path/ISSN/ANO/ORDEM/NNNNN.id`
+
+    A árvore `paragraphs_path` é lida uma única vez e, com `cache_dir`,
+    os registros convertidos de cada PID são gravados em
+    `cache_dir/p/<PID>.json` e reutilizados enquanto o arquivo ID não é
+    alterado. Assim, os documentos sem registros de parágrafos externos não
+    são consultados no sistema de arquivos
+
+    Parameters
+    ----------
+    paragraphs_path: str
+        pasta `artigo/p`
+    cache_dir: str
+        pasta dos arquivos de cache
+    """
+
+    def __init__(self, paragraphs_path, cache_dir=None):
+        self.paragraphs_path = paragraphs_path
+        self.cache_dir = cache_dir
+        self._files = None
+
+    @property
+    def files(self):
+        """
+        Arquivo ID de cada PID
+
+        Returns
+        -------
+        dict
+            {"PID": {"path": "", "mtime": 0, "size": 0}}
+        """
+        if self._files is None:
+            self._files = dict(_scan_paragraphs_tree(self.paragraphs_path))
+        return self._files
+
+    def get_records(self, pid):
+        """
+        Retorna os registros de parágrafos de `pid`
+
+        Returns
+        -------
+        list of dict
+        """
+        source = self.files.get(pid)
+        if not source:
+            return []
+
+        cache_file_path = None
+        if self.cache_dir:
+            cache_file_path = os.path.join(self.cache_dir, "p", f"{pid}.json")
+            cached = _read_json_file(cache_file_path)
+            if cached.get("source") == source:
+                return cached["records"]
+
+        records = id2json.get_paragraphs_records(source["path"]) or []
+        if cache_file_path:
+            os.makedirs(os.path.dirname(cache_file_path), exist_ok=True)
+            _write_json_file(
+                {"source": source, "records": records}, cache_file_path)
+        return records
+
+
+def _scan_paragraphs_tree(paragraphs_path):
+    """
+    Retorna PID e dados dos arquivos ID
+    `paragraphs_path/ISSN/ANO/ORDEM/NNNNN.id`
+    """
+    for issn, year, order in _scan_folders(paragraphs_path, depth=3):
+        folder_path = os.path.join(paragraphs_path, issn, year, order)
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                if ext != ".id" or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                yield f"S{issn}{year}{order}{name}", {
+                    "path": entry.path,
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                }
+
+
+def _scan_folders(folder_path, depth):
+    """
+    Retorna os caminhos relativos (tuplas de nomes) das pastas de `folder_path`
+    no nível `depth`
+    """
+    try:
+        with os.scandir(folder_path) as entries:
+            names = [entry.name for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    for name in sorted(names):
+        if depth == 1:
+            yield (name, )
+            continue
+        for names in _scan_folders(os.path.join(folder_path, name), depth - 1):
+            yield (name, ) + names
+
+
+def _get_cache_file_path(cache_dir, db_file_path, ext):
+    path_hash = hashlib.sha1(
+        os.path.abspath(db_file_path).encode("utf-8")).hexdigest()
+    name = f"{os.path.basename(db_file_path)}-{path_hash[:16]}"
+    return os.path.join(cache_dir, f"{name}{ext}")
+
+
+def _get_source(db_file_path):
+    stat = os.stat(db_file_path + ".mst")
+    return {
+        "path": os.path.abspath(db_file_path),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def _is_valid(index, db_file_path):
+    try:
+        return index.get("source") == _get_source(db_file_path)
+    except FileNotFoundError:
+        return False
+
+
+def _read_json_file(file_path):
+    try:
+        with open(file_path, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_json_file(data, file_path):
+    temp_file_path = _create_temp_file(os.path.dirname(file_path))
+    try:
+        with open(temp_file_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        _remove(temp_file_path)
+        raise
+
+
+def _create_temp_file(dir_path):
+    fd, file_path = tempfile.mkstemp(dir=dir_path, suffix=".tmp")
+    os.close(fd)
+    return file_path
+
+
+def _remove(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -3,6 +3,7 @@ import logging
 import os
 import json
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from mimetypes import guess_type
 
 from minio import Minio
@@ -12,6 +13,10 @@ from dsm.utils import files
 
 logger = logging.getLogger(__name__)
 
+# tamanho das partes enviadas ao files storage de conteúdos cujo tamanho
+# não é conhecido previamente (`MinioStorage.register_stream`)
+STREAM_PART_SIZE = 10 * 1024 * 1024
+
 
 def get_mimetype(file_path):
     return guess_type(file_path)[0]
@@ -36,11 +41,47 @@ def sha1(path):
         raise FileNotFoundError("%s: %s" % (path, e))
 
 
+def digests(path):
+    """
+    Retorna SHA-1 e MD5 do conteúdo de `path`, lendo-o uma única vez
+    """
+    try:
+        with open(path, "rb") as file:
+            return fileobj_digests(file)
+    except (ValueError, FileNotFoundError) as e:
+        raise FileNotFoundError("%s: %s" % (path, e))
+
+
+def fileobj_digests(fileobj):
+    """
+    Retorna SHA-1 e MD5 do conteúdo de `fileobj`, lido a partir da
+    posição atual
+    """
+    _sha1 = hashlib.sha1()
+    _md5 = hashlib.md5()
+    while True:
+        chunk = fileobj.read(1024 * 1024)
+        if not chunk:
+            break
+        _sha1.update(chunk)
+        _md5.update(chunk)
+    return _sha1.hexdigest(), _md5.hexdigest()
+
+
 class MinioStorage:
+    """
+    Com `dedup=True`, `register` e `register_fileobj` não enviam o
+    conteúdo se o objeto já registrado tem o mesmo conteúdo, identificado
+    pelo SHA-1 gravado nos metadados do objeto ou pelo ETag (MD5) de
+    objetos sem este metadado
+    """
+    SHA1_METADATA = "sha1"
+
     def __init__(
         self, minio_host, minio_access_key, minio_secret_key,
         scielo_collection,
         minio_secure=True, minio_http_client=None,
+        dedup=False,
     ):
 
         self.bucket_name = "documentstore"
@@ -68,6 +109,8 @@ class MinioStorage:
         self.http_client = minio_http_client
         self._client_instance = None
         self.scielo_collection = scielo_collection
+        self.dedup = dedup
+        self._bucket_checked = False
 
     @property
     def _client(self):
@@ -127,12 +170,41 @@ class MinioStorage:
         url = self._client.presigned_get_object(self.bucket_name, media_path)
         return url.split("?")[0]
 
+    def _is_registered(self, object_name, sha1_digest, md5_digest):
+        """
+        Indica se `object_name` já está registrado com o mesmo conteúdo
+        """
+        try:
+            stat = self._client.stat_object(self.bucket_name, object_name)
+        except S3Error as err:
+            if err.code in ("NoSuchKey", "NoSuchBucket", "NoSuchObject"):
+                return False
+            raise
+        registered_sha1 = (stat.metadata or {}).get(
+            f"x-amz-meta-{self.SHA1_METADATA}")
+        if registered_sha1:
+            return registered_sha1 == sha1_digest
+        # objetos registrados sem o metadado sha1:
+        # o ETag de envios não multipart é o MD5 do conteúdo
+        return (stat.etag or "").strip('"') == md5_digest
+
     def register(self, file_path, prefix="", original_uri=None, preserve_name=False) -> str:
         object_name = self._generator_object_name(file_path, prefix, preserve_name)
         metadata = {"origin_name": os.path.basename(file_path)}
         if original_uri is not None:
             metadata.update({"origin_uri": original_uri})
 
+        object_metadata = None
+        if self.dedup:
+            sha1_digest, md5_digest = digests(file_path)
+            if self._is_registered(object_name, sha1_digest, md5_digest):
+                logger.debug(
+                    "Skipping %s: %s has the same content",
+                    file_path, object_name,
+                )
+                return self.get_urls(object_name)
+            object_metadata = {self.SHA1_METADATA: sha1_digest}
+
         logger.debug(
             "Registering %s in %s with metadata %s", file_path, object_name, metadata
         )
@@ -142,16 +214,140 @@ class MinioStorage:
                 object_name=object_name,
                 file_path=file_path,
                 content_type=get_mimetype(file_path),
+                metadata=object_metadata,
             )
 
         except S3Error as err:
             logger.error(err)
             if err.code == "NoSuchBucket":
                 self._create_bucket()
-                return self.register(file_path, prefix)
+                return self.register(
+                    file_path, prefix, original_uri, preserve_name)
+
+        return self.get_urls(object_name)
+
+    def register_stream(self, write_content, prefix, filename,
+                        content_type=None) -> str:
+        """
+        Registra `prefix/filename` com o conteúdo gravado por
+        `write_content(fileobj)`, o qual é enviado em partes
+        (multipart upload), à medida que é gravado, sem arquivo intermediário.
+        Se `write_content` falha, o envio é cancelado
+        """
+        object_name = f"{prefix}/{filename}"
+        self._check_bucket()
+
+        read_fd, write_fd = os.pipe()
+        reader = _StreamReader(os.fdopen(read_fd, "rb"))
+        writer = os.fdopen(write_fd, "wb")
 
+        logger.debug("Registering stream in %s", object_name)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            upload = executor.submit(
+                self._put_stream, reader, object_name,
+                content_type or get_mimetype(filename),
+            )
+            try:
+                write_content(writer)
+            except BaseException as e:
+                # o envio é cancelado ao final da leitura
+                reader.error = e
+                _close_writer(writer)
+                upload_error = upload.exception()
+                if isinstance(e, BrokenPipeError) and upload_error:
+                    # a falha no envio interrompeu a gravação
+                    raise upload_error from e
+                raise
+            _close_writer(writer)
+            upload.result()
         return self.get_urls(object_name)
 
+    def register_fileobj(self, fileobj, length, prefix, filename,
+                         content_type=None) -> str:
+        """
+        Registra `prefix/filename` com o conteúdo (`length` bytes) de
+        `fileobj`, por exemplo, um membro de arquivo zip, sem gravá-lo
+        em disco.
+        Com `dedup=True`, o conteúdo de `fileobj` (posicionável) é lido
+        para obter o SHA-1 antes do envio, o qual não é feito se o objeto
+        já registrado tem o mesmo conteúdo, assim como em `register`
+        """
+        object_name = f"{prefix}/{filename}"
+        self._check_bucket()
+
+        object_metadata = None
+        if self.dedup and fileobj.seekable():
+            start = fileobj.tell()
+            sha1_digest, md5_digest = fileobj_digests(fileobj)
+            if self._is_registered(object_name, sha1_digest, md5_digest):
+                logger.debug(
+                    "Skipping %s: it has the same content", object_name)
+                return self.get_urls(object_name)
+            fileobj.seek(start)
+            object_metadata = {self.SHA1_METADATA: sha1_digest}
+
+        logger.debug("Registering %s (%s bytes)", object_name, length)
+        self._client.put_object(
+            self.bucket_name, object_name, fileobj,
+            length=length,
+            content_type=(
+                content_type or get_mimetype(filename) or
+                "application/octet-stream"
+            ),
+            metadata=object_metadata,
+        )
+        return self.get_urls(object_name)
+
+    def _check_bucket(self):
+        """
+        Cria o bucket, se não existe; a consulta é feita uma única vez
+        """
+        if self._bucket_checked:
+            return
+        if not self._client.bucket_exists(self.bucket_name):
+            self._create_bucket()
+        self._bucket_checked = True
+
+    def _put_stream(self, reader, object_name, content_type):
+        try:
+            return self._client.put_object(
+                self.bucket_name, object_name, reader,
+                length=-1,
+                content_type=content_type or "application/octet-stream",
+                part_size=STREAM_PART_SIZE,
+            )
+        finally:
+            # interrompe a gravação, se o envio falhou
+            reader.close()
+
     def remove(self, object_name: str) -> None:
         # Remove an object.
         self._client.remove_object(self.bucket_name, object_name)
+
+
+class _StreamReader:
+    """
+    Lê o conteúdo enviado por `MinioStorage.register_stream`;
+    ao final da leitura, falha se a gravação do conteúdo falhou (`error`),
+    o que cancela o envio
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self.error = None
+
+    def read(self, size=-1):
+        data = self._fp.read(size)
+        if not data and self.error is not None:
+            raise IOError(f"Incomplete content: {self.error}")
+        return data
+
+    def close(self):
+        self._fp.close()
+
+
+def _close_writer(writer):
+    try:
+        writer.close()
+    except BrokenPipeError:
+        pass
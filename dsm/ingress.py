@@ -2,6 +2,8 @@
 API to ingress documents
 """
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
 from dsm.core.document import DocsManager
@@ -23,6 +25,9 @@ _docs_manager.db_connect()
 _journals_manager = JournalsManager(_db_url)
 _issues_manager = IssuesManager(_db_url)
 
+# DocsManager de cada thread de `upload_package`
+_worker = threading.local()
+
 
 def get_package_uri_by_pid(scielo_pid_v3):
     """
@@ -77,7 +82,7 @@ def change_document_to_package_version(scielo_pid_v3, package_version):
 
 
 def upload_package(source, receipt_id=None, pid_v2_items={}, old_filenames={},
-                   issue_id=None, is_new_document=False):
+                   issue_id=None, is_new_document=False, workers=None):
     """
     Receive the package which is a folder or zip file
 
@@ -95,6 +100,9 @@ def upload_package(source, receipt_id=None, pid_v2_items={}, old_filenames={},
         id do fascículo
     is_new_document: boolean
         é documento novo?
+    workers: int
+        quantidade de documentos do pacote registrados simultaneamente
+        (default: `configuration.INGRESS_WORKERS`)
 
     Returns
     -------
@@ -115,21 +123,36 @@ def upload_package(source, receipt_id=None, pid_v2_items={}, old_filenames={},
 
     # processa cada documento contido no pacote
     results = {'receipt_id': receipt_id, 'docs': [], 'errors': []}
-    for name, doc_pkg in doc_packages.items():
-        try:
-            docid = _docs_manager.register_document(
-                doc_pkg,
-                pid_v2_items.get(name),
-                old_filenames.get(name),
-                issue_id,
-            )
-            if docid:
-                # atualiza article_files relacionado ao documento
-                _docs_manager.update_document_package(docid)
-                results['docs'].append({"name": name, "id": docid})
-
-        except Exception as e:
-            results['errors'].append(str(e))
+
+    def _register(item):
+        name, doc_pkg = item
+        return _register_document_package(
+            doc_pkg,
+            pid_v2_items.get(name),
+            old_filenames.get(name),
+            issue_id,
+        )
+
+    workers = workers or configuration.INGRESS_WORKERS
+    try:
+        if workers > 1:
+            # os resultados são obtidos na ordem dos documentos do pacote
+            with ThreadPoolExecutor(
+                    max_workers=workers, initializer=_init_worker) as executor:
+                registered = list(
+                    executor.map(_register, doc_packages.items()))
+        else:
+            registered = [_register(item) for item in doc_packages.items()]
+    finally:
+        # fecha o arquivo zip, compartilhado pelos documentos do pacote
+        for doc_pkg in doc_packages.values():
+            doc_pkg.close()
+
+    for name, (docid, error) in zip(doc_packages.keys(), registered):
+        if error:
+            results['errors'].append(error)
+        elif docid:
+            results['docs'].append({"name": name, "id": docid})
 
     # registra o pacote recebido
     if len(results['errors']) == 0:
@@ -138,12 +161,52 @@ def upload_package(source, receipt_id=None, pid_v2_items={}, old_filenames={},
     return results
 
 
+def _init_worker():
+    """
+    Cria o DocsManager da thread, com as suas próprias instâncias do
+    files storage e do gerenciador de PID v3, as quais não são
+    compartilhadas entre as threads; a conexão com o banco de dados
+    (pymongo) é compartilhada
+    """
+    _worker.docs_manager = DocsManager(
+        configuration.get_files_storage(),
+        _db_url,
+        configuration.get_pid_manager(),
+    )
+
+
+def _register_document_package(doc_pkg, pid_v2, old_filename, issue_id):
+    """
+    Registra o documento `doc_pkg` e o seu article_files, com o
+    DocsManager da thread, se existe, ou com `_docs_manager`
+
+    Returns
+    -------
+    tuple
+        (docid, error)
+    """
+    docs_manager = getattr(_worker, "docs_manager", _docs_manager)
+    try:
+        # registra o documento e o seu article_files, criado com os
+        # arquivos do pacote
+        docid = docs_manager.register_document(
+            doc_pkg,
+            pid_v2,
+            old_filename,
+            issue_id,
+            build_package=True,
+        )
+        return docid, None
+    except Exception as e:
+        return None, str(e)
+
+
 def _download_package(v3):
     print(get_package_uri_by_pid(v3))
 
 
-def _upload_package(path):
-    print(upload_package(path))
+def _upload_package(path, workers=None):
+    print(upload_package(path, workers=workers))
 
 
 def _change_document_version(v3, version):
@@ -177,6 +240,11 @@ def main():
         "source_path",
         help="zip file path"
     )
+    upload_package_parser.add_argument(
+        "--workers",
+        help="Number of documents of the package registered in parallel",
+        type=int,
+    )
 
     change_document_version_parser = subparsers.add_parser(
         "change_document_version",
@@ -198,7 +266,7 @@ def main():
     if args.command == "download_package":
         _download_package(args.v3)
     elif args.command == "upload_package":
-        _upload_package(args.source_path)
+        _upload_package(args.source_path, args.workers)
     elif args.command == "change_document_version":
         _change_document_version(args.v3, args.version)
     else:
@@ -2,97 +2,139 @@
 API for the migration
 """
 import argparse
+import functools
+import logging
+import multiprocessing
 import os
+import time
+from itertools import islice
 from datetime import datetime
 
 from dsm.extdeps.isis_migration import (
     id2json,
+    master_file,
+    migration_journal,
     migration_manager,
+    records_cache,
 )
 from dsm.extdeps.isis_migration.migration_models import (
     get_list_documents_status_arg_help,
 )
-from dsm import configuration
+from dsm import configuration, exceptions
+from dsm.extdeps import db
 from dsm.utils.files import size
+from dsm.utils.parallel import bounded_imap
 from dsm.extdeps.isis_migration.isis_cmds import (
-    create_id_file,
-    get_id_file_path,
+    create_id_files,
     get_document_isis_db,
     get_document_pids_to_migrate,
 )
 
 
+# quantidade de itens enviados aos processos, por processo, que ainda não
+# tiveram seus resultados consumidos (mantém o uso de memória constante)
+_PENDING_ITEMS_PER_WORKER = 4
+
+# quantidade de pids registrados por `bulk_write` em
+# `identify_documents_to_migrate`
+_IDENTIFY_DOCUMENTS_BATCH_SIZE = 1000
+
+# operação registrada para os itens não alterados desde a última migração
+_SKIP_UNCHANGED = dict(
+    name="CHECK_ISIS_UPDATED_DATE",
+    result="SKIPPED_UNCHANGED",
+)
+
+
+def _get_migration_parameters(manager):
+    """
+    Obtém os parâmetros da migração de cada tipo de base ISIS
+    (title, issue, artigo), cujas ações são executadas por `manager`
+
+    Parameters
+    ----------
+    manager : migration_manager.MigrationManager
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "title": dict(
+            custom_id_function=id2json.journal_id,
+            is_up_to_date=manager.is_isis_journal_up_to_date,
+            operations_sequence=[
+                dict(
+                    name="REGISTER_ISIS",
+                    result="REGISTERED_ISIS_JOURNAL",
+                    action=manager.register_isis_journal,
+                ),
+                dict(
+                    name="PUBLISH",
+                    result="PUBLISHED_JOURNAL",
+                    action=manager.publish_journal_data,
+                )
+            ]
+        ),
+        "issue": dict(
+            custom_id_function=id2json.issue_id,
+            is_up_to_date=manager.is_isis_issue_up_to_date,
+            operations_sequence=[
+                dict(
+                    name="REGISTER_ISIS",
+                    result="REGISTERED_ISIS_ISSUE",
+                    action=manager.register_isis_issue,
+                ),
+                dict(
+                    name="PUBLISH",
+                    result="PUBLISHED_ISSUE",
+                    action=manager.publish_issue_data,
+                )
+            ]
+        ),
+        "artigo": dict(
+            custom_id_function=id2json.article_id,
+            is_up_to_date=manager.is_isis_document_up_to_date,
+            operations_sequence=[
+                dict(
+                    name="REGISTER_ISIS",
+                    result="REGISTERED_ISIS_DOCUMENT",
+                    action=manager.register_isis_document,
+                ),
+                dict(
+                    name="MIGRATE_DOCUMENT_FILES",
+                    result="MIGRATED_DOCUMENT_FILES",
+                    action=manager.migrate_document_files,
+                ),
+                dict(
+                    name="PUBLISH",
+                    result="PUBLISHED_DOCUMENT",
+                    action=manager.publish_document_metadata,
+                ),
+                dict(
+                    name="PUBLISH_PDFS",
+                    result="PUBLISHED_PDFS",
+                    action=manager.publish_document_pdfs,
+                ),
+                dict(
+                    name="PUBLISH_XMLS",
+                    result="PUBLISHED_XMLS",
+                    action=manager.publish_document_xmls,
+                ),
+                dict(
+                    name="PUBLISH_HTMLS",
+                    result="PUBLISHED_HTMLS",
+                    action=manager.publish_document_htmls,
+                ),
+            ]
+        )
+    }
+
+
 _migration_manager = migration_manager.MigrationManager()
 _migration_manager.db_connect()
 
-
-_MIGRATION_PARAMETERS = {
-    "title": dict(
-        custom_id_function=id2json.journal_id,
-        operations_sequence=[
-            dict(
-                name="REGISTER_ISIS",
-                result="REGISTERED_ISIS_JOURNAL",
-                action=_migration_manager.register_isis_journal,
-            ),
-            dict(
-                name="PUBLISH",
-                result="PUBLISHED_JOURNAL",
-                action=_migration_manager.publish_journal_data,
-            )
-        ]
-    ),
-    "issue": dict(
-        custom_id_function=id2json.issue_id,
-        operations_sequence=[
-            dict(
-                name="REGISTER_ISIS",
-                result="REGISTERED_ISIS_ISSUE",
-                action=_migration_manager.register_isis_issue,
-            ),
-            dict(
-                name="PUBLISH",
-                result="PUBLISHED_ISSUE",
-                action=_migration_manager.publish_issue_data,
-            )
-        ]
-    ),
-    "artigo": dict(
-        custom_id_function=id2json.article_id,
-        operations_sequence=[
-            dict(
-                name="REGISTER_ISIS",
-                result="REGISTERED_ISIS_DOCUMENT",
-                action=_migration_manager.register_isis_document,
-            ),
-            dict(
-                name="MIGRATE_DOCUMENT_FILES",
-                result="MIGRATED_DOCUMENT_FILES",
-                action=_migration_manager.migrate_document_files,
-            ),
-            dict(
-                name="PUBLISH",
-                result="PUBLISHED_DOCUMENT",
-                action=_migration_manager.publish_document_metadata,
-            ),
-            dict(
-                name="PUBLISH_PDFS",
-                result="PUBLISHED_PDFS",
-                action=_migration_manager.publish_document_pdfs,
-            ),
-            dict(
-                name="PUBLISH_XMLS",
-                result="PUBLISHED_XMLS",
-                action=_migration_manager.publish_document_xmls,
-            ),
-            dict(
-                name="PUBLISH_HTMLS",
-                result="PUBLISHED_HTMLS",
-                action=_migration_manager.publish_document_htmls,
-            ),
-        ]
-    )
-}
+_MIGRATION_PARAMETERS = _get_migration_parameters(_migration_manager)
 
 
 def list_documents_to_migrate(
@@ -125,11 +167,80 @@ def migrate_document(pid):
     generator
         results of the migration
     """
-    _document_isis_db_file_path = get_document_isis_db(pid)
-    return migrate_isis_db("artigo", _document_isis_db_file_path)
+    return migrate_documents([pid])
+
+
+def migrate_documents(pids, workers=None, incremental=False):
+    """
+    Migrate ISIS records of the documents `pids`.
+    The records are read from `artigo` ISIS database using the PID index
+    (`records_cache.PidIndex`), if `configuration.ISIS_RECORDS_CACHE_PATH`
+    is set; otherwise, or if `pid` is not indexed, they are obtained by `mx`
+
+    Parameters
+    ----------
+    pids: list of str
+        identifiers in ISIS database
+    workers: int
+        number of processes which migrate the items in parallel
+    incremental: bool
+        skip the items whose `isis_updated_date` is the same of
+        the migrated one
+
+    Returns
+    -------
+    generator
+        results of the migration
+    """
+    pid_index = _get_artigo_pid_index()
+    try:
+        yield from _migrate_isis_records(
+            _get_documents_records(pids, pid_index), "artigo",
+            workers=workers,
+            incremental=incremental,
+        )
+    finally:
+        if pid_index:
+            pid_index.close()
+
+
+def _get_artigo_pid_index():
+    """
+    Returns the PID index of `artigo` ISIS database or None
+    """
+    if not configuration.ISIS_RECORDS_CACHE_PATH:
+        return None
+    try:
+        return records_cache.get_pid_index(
+            configuration.get_bases_artigo_path(),
+            configuration.ISIS_RECORDS_CACHE_PATH,
+            _MIGRATION_PARAMETERS["artigo"]["custom_id_function"],
+        )
+    except exceptions.IsisDBNotFoundError:
+        return None
+
+
+def _get_documents_records(pids, pid_index=None):
+    for pid in pids:
+        records = pid_index and pid_index.get_records(pid)
+        if not records:
+            # consulta a base ISIS artigo com `mx`
+            records = master_file.MasterFileReader(get_document_isis_db(pid))
+        yield from records
+
+
+def _get_id_function(db_type):
+    try:
+        return _MIGRATION_PARAMETERS[db_type]["custom_id_function"]
+    except KeyError:
+        raise ValueError(
+            "Invalid value for `db_type`. "
+            "Expected values: title, issue, artigo"
+        )
 
 
-def migrate_isis_db(db_type, source_file_path=None, records_content=None):
+def migrate_isis_db(db_type, source_file_path=None, records_content=None,
+                    workers=None, resume=None, incremental=False):
     """
     Migrate ISIS database content from `source_file_path` or `records_content`
     which is ISIS database or ID file
@@ -142,20 +253,34 @@ def migrate_isis_db(db_type, source_file_path=None, records_content=None):
         ISIS database or ID file path
     records_content: str
         ID records
+    workers: int
+        number of processes which migrate the items in parallel
+    resume: str
+        id of an interrupted migration run to be resumed
+    incremental: bool
+        skip the items whose `isis_updated_date` is the same of
+        the migrated one
 
     Returns
     -------
     generator
         results of the migration
     """
-    if source_file_path:
-        # get id_file_path
-        id_file_path = get_id_file_path(source_file_path)
-
-        # get id file rows
-        rows = id2json.get_id_file_rows(id_file_path)
+    journal = None
+    if resume:
+        # retoma a migração a partir do último item concluído
+        journal = migration_journal.MigrationJournal.resume(
+            resume, db_type, workers, _get_id_function(db_type))
+        json_records = journal.json_records
+    elif source_file_path:
+        # get the records of the ID file or of the ISIS database
+        journal = migration_journal.MigrationJournal.start(
+            source_file_path, db_type, workers, _get_id_function(db_type))
+        json_records = journal.json_records
     elif records_content:
         rows = records_content.splitlines()
+        json_records = id2json.parse_id_records(
+            id2json.join_id_file_rows_and_return_records(rows))
     else:
         raise ValueError(
             "Unable to migrate ISIS DB. "
@@ -164,19 +289,31 @@ def migrate_isis_db(db_type, source_file_path=None, records_content=None):
 
     # migrate
     return _migrate_isis_records(
-        id2json.join_id_file_rows_and_return_records(rows), db_type)
+        json_records, db_type,
+        workers=workers,
+        journal=journal,
+        incremental=incremental,
+    )
 
 
-def _migrate_isis_records(id_file_records, db_type):
+def _migrate_isis_records(json_records, db_type, workers=None,
+                          journal=None, incremental=False):
     """
     Migrate data from `source_file_path` which is ISIS database or ID file
 
     Parameters
     ----------
-    id_file_records: generator or list of strings
-        list of ID records
+    json_records: generator or list of dict
+        list of JSON records (ID file or ISIS database records)
     db_type: str
         "title" or "issue" or "artigo"
+    workers: int
+        number of processes which migrate the items in parallel
+    journal: migration_journal.MigrationJournal
+        registers the progress of the migration
+    incremental: bool
+        skip the items whose `isis_updated_date` is the same of
+        the migrated one
 
     Returns
     -------
@@ -225,29 +362,131 @@ def _migrate_isis_records(id_file_records, db_type):
             "Expected values: title, issue, artigo"
         )
 
-    for pid, records in id2json.get_id_and_json_records(
-            id_file_records, migration_parameters["custom_id_function"]):
-        item_result = {"pid": pid}
-        try:
-            isis_data = records[0]
-            operations_sequence = migration_parameters["operations_sequence"]
-            if db_type == "artigo":
-                # base artigo
-                if len(records) == 1:
-                    # registro de issue na base artigo
-                    operations_sequence = (
-                        _MIGRATION_PARAMETERS["issue"]["operations_sequence"]
-                    )
-                else:
-                    # registros do artigo na base artigo
-                    isis_data = records
-            _result = _migrate_one_isis_item(
-                pid, isis_data, operations_sequence,
-            )
-            item_result.update(_result)
-        except Exception as e:
-            item_result["error"] = str(e)
+    # os dados mantidos em memória pelo `MigrationManager` valem somente
+    # para esta execução; os processos (`workers`) são criados a cada
+    # execução, sem dados em memória
+    _migration_manager.clear_caches()
+
+    items = id2json.group_json_records_by_id(
+        json_records, migration_parameters["custom_id_function"])
+    if journal:
+        items = journal.track(items)
+    if workers and workers > 1:
+        results = _migrate_items_in_parallel(
+            items, db_type, workers, incremental)
+    elif db_type in ("title", "issue"):
+        # grava os registros de title e issue em lotes
+        yield from migration_journal.write_in_bulk(
+            items,
+            functools.partial(
+                _migrate_item, db_type=db_type, incremental=incremental),
+            db.BulkWriter(),
+            journal,
+        )
+        return
+    else:
+        results = (
+            _migrate_item(pid, records, db_type, incremental)
+            for pid, records in items
+        )
+    for item_result in results:
+        if journal:
+            journal.register()
         yield item_result
+    if journal:
+        journal.finish()
+
+
+def _migrate_items_in_parallel(items, db_type, workers, incremental=False):
+    """
+    Migrate the items using `workers` processes.
+    Each process has its own MongoDB and MinIO connections.
+    The results are returned in the same order of `items`
+
+    Parameters
+    ----------
+    items: generator
+        (pid, records)
+    db_type: str
+        "title" or "issue" or "artigo"
+    workers: int
+        number of processes
+    incremental: bool
+        skip the items whose `isis_updated_date` is the same of
+        the migrated one
+
+    Returns
+    -------
+    generator
+        same results of `_migrate_item`
+    """
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        items_args = (
+            (pid, records, db_type, incremental)
+            for pid, records in items
+        )
+        for item_result in bounded_imap(
+                pool, _migrate_item, items_args,
+                workers * _PENDING_ITEMS_PER_WORKER):
+            yield item_result
+
+
+def _init_worker():
+    """
+    Cria `MigrationManager` do processo, com suas próprias conexões
+    com MongoDB e MinIO, em vez de usar as conexões herdadas
+    """
+    global _migration_manager
+    global _MIGRATION_PARAMETERS
+
+    _migration_manager = migration_manager.MigrationManager()
+    _migration_manager.db_connect(reconnect=True)
+    _MIGRATION_PARAMETERS = _get_migration_parameters(_migration_manager)
+
+
+def _migrate_item(pid, records, db_type, incremental=False):
+    """
+    Migrate the records of one item (title or issue or artigo)
+
+    Parameters
+    ----------
+    pid: str
+    records: list of dict
+    db_type: str
+        "title" or "issue" or "artigo"
+    incremental: bool
+        skip the item if its `isis_updated_date` is the same of
+        the migrated one
+
+    Returns
+    -------
+    dict
+        {"pid": "", "events": []} or {"pid": "", "error": ""}
+    """
+    item_result = {"pid": pid}
+    try:
+        isis_data = records[0]
+        migration_parameters = _MIGRATION_PARAMETERS[db_type]
+        if db_type == "artigo":
+            # base artigo
+            if len(records) == 1:
+                # registro de issue na base artigo
+                migration_parameters = _MIGRATION_PARAMETERS["issue"]
+            else:
+                # registros do artigo na base artigo
+                isis_data = records
+        if incremental and migration_parameters["is_up_to_date"](
+                pid, isis_data):
+            item_result["events"] = [_get_event(_SKIP_UNCHANGED, None)]
+            return item_result
+        operations_sequence = migration_parameters["operations_sequence"]
+        _result = _migrate_one_isis_item(
+            pid, isis_data, operations_sequence,
+        )
+        item_result.update(_result)
+    except Exception as e:
+        item_result["error"] = str(e)
+    return item_result
 
 
 def _migrate_one_isis_item(pid, isis_data, operations):
@@ -293,7 +532,7 @@ def _migrate_one_isis_item(pid, isis_data, operations):
 
 def _get_error(operation, error):
     return {
-        "op": operation,
+        "op": operation["name"],
         "error": str(error),
         "timestamp": datetime.utcnow().isoformat(),
     }
@@ -328,28 +567,142 @@ def _get_event(operation, saved, isis_created_date=None, isis_updated_date=None)
     return event
 
 
-def migrate_acron(acron, id_folder_path=None):
+def migrate_acron(acron, id_folder_path=None, workers=None, resume=None,
+                  incremental=False, title_and_issue=False):
+    """
+    Migrate the documents of `acron` ISIS database and, optionally, the
+    `title` and `issue` ISIS databases before them
+
+    Parameters
+    ----------
+    acron: str
+        journal acronym
+    id_folder_path: str
+        folder of the ID files, which are created concurrently
+    workers: int
+        number of processes which migrate the documents in parallel
+    resume: str
+        id of an interrupted migration run to be resumed
+    incremental: bool
+        skip the items whose `isis_updated_date` is the same of
+        the migrated one
+    title_and_issue: bool
+        migrate `title` and `issue` ISIS databases too
+
+    Returns
+    -------
+    generator
+        results of the migration
+    """
+    if resume:
+        return migrate_isis_db(
+            "artigo", workers=workers, resume=resume, incremental=incremental)
+
     configuration.check_migration_sources()
 
-    db_path = configuration.get_bases_acron(acron)
-    print("db:", db_path)
+    sources = []
+    if title_and_issue:
+        # periódicos e fascículos são migrados antes dos documentos
+        sources.append(("title", "title", configuration.get_bases_title_path()))
+        sources.append(("issue", "issue", configuration.get_bases_issue_path()))
+    sources.append(("artigo", acron, configuration.get_bases_acron(acron)))
+    for db_type, name, db_path in sources:
+        print("db:", db_path)
+
     if id_folder_path:
-        id_file_path = os.path.join(id_folder_path, f"{acron}.id")
-        id_file_path = create_id_file(db_path, id_file_path)
-        db_path = id_file_path
-        print(f"{id_file_path} - size: {size(id_file_path)} bytes")
-    return migrate_isis_db("artigo", db_path)
-
-
-def identify_documents_to_migrate(from_date=None, to_date=None):
-    for doc in get_document_pids_to_migrate(
-            from_date, to_date):
-        yield _migration_manager.create_mininum_record_in_isis_doc(
-            doc["pid"], doc["updated"]
+        # os arquivos ID das bases são criados simultaneamente
+        id_file_paths = create_id_files(
+            [
+                (db_path, os.path.join(id_folder_path, f"{name}.id"))
+                for db_type, name, db_path in sources
+            ],
+            max_workers=len(sources),
         )
+        sources = [
+            (db_type, name, id_file_path)
+            for (db_type, name, db_path), id_file_path in zip(
+                sources, id_file_paths)
+        ]
+        for id_file_path in id_file_paths:
+            print(f"{id_file_path} - size: {size(id_file_path)} bytes")
+
+    if len(sources) == 1:
+        return migrate_isis_db(
+            "artigo", sources[0][2], workers=workers, incremental=incremental)
+    return _migrate_isis_dbs(sources, workers, incremental)
+
+
+def _migrate_isis_dbs(sources, workers=None, incremental=False):
+    """
+    Migrate the ISIS databases or ID files `sources` one after another
+
+    Parameters
+    ----------
+    sources: list of tuples
+        (db_type, name, source_file_path)
+    """
+    for db_type, name, source_file_path in sources:
+        yield from migrate_isis_db(
+            db_type, source_file_path,
+            # somente os documentos são migrados em paralelo
+            workers=workers if db_type == "artigo" else None,
+            incremental=incremental,
+        )
+
+
+def _get_batches(items, batch_size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            break
+        yield batch
+
+
+def identify_documents_to_migrate(from_date=None, to_date=None,
+                                  batch_size=None):
+    """
+    Registra em `isis_doc`, com status "pending_migration", os documentos
+    atualizados no intervalo de datas, à medida que `ifkeys` os identifica,
+    em lotes de `batch_size` documentos
+
+    Returns
+    -------
+    generator
+        progresso após cada lote
+
+    ```
+        {
+            "identified": 3000,
+            "registered": 120,
+            "elapsed_seconds": 2.5,
+            "pids_per_second": 1200.0,
+        }
+    ```
+    """
+    batch_size = batch_size or _IDENTIFY_DOCUMENTS_BATCH_SIZE
+    started = time.monotonic()
+    identified = 0
+    registered = 0
+    docs = get_document_pids_to_migrate(from_date, to_date)
+    for batch in _get_batches(docs, batch_size):
+        registered += db.register_isis_documents_pending_migration(
+            {doc["pid"]: doc["updated"] for doc in batch}
+        )
+        identified += len(batch)
+        elapsed = time.monotonic() - started
+        yield {
+            "identified": identified,
+            "registered": registered,
+            "elapsed_seconds": round(elapsed, 2),
+            "pids_per_second": round(identified / (elapsed or 1), 1),
+        }
 
 
 def main():
+    # apresenta o id da execução da migração (`--resume`)
+    logging.basicConfig(level=logging.INFO)
+
     parser = argparse.ArgumentParser(
         description="ISIS database migration tool")
     subparsers = parser.add_subparsers(
@@ -369,6 +722,13 @@ def main():
             "/path/title/title.id (ID file path)"
         )
     )
+    migrate_title_parser.add_argument(
+        "--incremental",
+        help=(
+            "Skip the journals which were not updated since the last migration"
+        ),
+        action="store_true",
+    )
 
     migrate_issue_parser = subparsers.add_parser(
         "migrate_issue",
@@ -384,6 +744,13 @@ def main():
             "/path/issue/issue.id (ID file path)"
         )
     )
+    migrate_issue_parser.add_argument(
+        "--incremental",
+        help=(
+            "Skip the issues which were not updated since the last migration"
+        ),
+        action="store_true",
+    )
 
     migrate_artigo_parser = subparsers.add_parser(
         "migrate_artigo",
@@ -394,11 +761,30 @@ def main():
     )
     migrate_artigo_parser.add_argument(
         "source_file_path",
+        nargs="?",
         help=(
             "/path/artigo/artigo (ISIS database path) or "
-            "/path/artigo/artigo.id (ID file path)"
+            "/path/artigo/artigo.id (ID file path). "
+            "Not required with --resume"
         )
     )
+    migrate_artigo_parser.add_argument(
+        "--workers",
+        help="Number of processes to migrate the documents in parallel",
+        type=int,
+    )
+    migrate_artigo_parser.add_argument(
+        "--resume",
+        help="Resume the interrupted migration run identified by RUN_ID",
+        metavar="RUN_ID",
+    )
+    migrate_artigo_parser.add_argument(
+        "--incremental",
+        help=(
+            "Skip the documents which were not updated since the last migration"
+        ),
+        action="store_true",
+    )
 
     migrate_document_parser = subparsers.add_parser(
         "migrate_document",
@@ -414,6 +800,32 @@ def main():
         )
     )
 
+    migrate_documents_parser = subparsers.add_parser(
+        "migrate_documents",
+        help=(
+            "Migrate the records of the documents of `artigo` ISIS database "
+            "to MongoDB. "
+            "Migra los registros de los documentos de `artigo` de ISIS para "
+            "MongoDB. "
+        )
+    )
+    migrate_documents_parser.add_argument(
+        "pids_file_path",
+        help="File which contains one PID v2 per line"
+    )
+    migrate_documents_parser.add_argument(
+        "--workers",
+        help="Number of processes to migrate the documents in parallel",
+        type=int,
+    )
+    migrate_documents_parser.add_argument(
+        "--incremental",
+        help=(
+            "Skip the documents which were not updated since the last migration"
+        ),
+        action="store_true",
+    )
+
     migrate_acron_parser = subparsers.add_parser(
         "migrate_acron",
         help=(
@@ -429,6 +841,31 @@ def main():
         "--id_folder_path",
         help="Output folder"
     )
+    migrate_acron_parser.add_argument(
+        "--workers",
+        help="Number of processes to migrate the documents in parallel",
+        type=int,
+    )
+    migrate_acron_parser.add_argument(
+        "--resume",
+        help="Resume the interrupted migration run identified by RUN_ID",
+        metavar="RUN_ID",
+    )
+    migrate_acron_parser.add_argument(
+        "--incremental",
+        help=(
+            "Skip the documents which were not updated since the last migration"
+        ),
+        action="store_true",
+    )
+    migrate_acron_parser.add_argument(
+        "--title_and_issue",
+        help=(
+            "Migrate `title` and `issue` ISIS databases before the documents. "
+            "With --id_folder_path, the ID files are created concurrently"
+        ),
+        action="store_true",
+    )
 
     identify_documents_to_migrate_parser = subparsers.add_parser(
         "identify_documents_to_migrate",
@@ -445,6 +882,12 @@ def main():
         "--to_date",
         help="to date",
     )
+    identify_documents_to_migrate_parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=_IDENTIFY_DOCUMENTS_BATCH_SIZE,
+        help="number of pids registered at once",
+    )
 
     list_documents_to_migrate_parser = subparsers.add_parser(
         "list_documents_to_migrate",
@@ -496,24 +939,36 @@ def main():
     result = None
     if args.command == "migrate_title":
         result = migrate_isis_db(
-            "title", args.source_file_path
+            "title", args.source_file_path, incremental=args.incremental,
         )
     elif args.command == "migrate_issue":
         result = migrate_isis_db(
-            "issue", args.source_file_path
+            "issue", args.source_file_path, incremental=args.incremental,
         )
     elif args.command == "migrate_artigo":
         result = migrate_isis_db(
-            "artigo", args.source_file_path
+            "artigo", args.source_file_path, workers=args.workers,
+            resume=args.resume, incremental=args.incremental,
         )
     elif args.command == "migrate_document":
         result = migrate_document(
             args.pid
         )
+    elif args.command == "migrate_documents":
+        with open(args.pids_file_path, "r") as fp:
+            pids = [row.strip() for row in fp if row.strip()]
+        result = migrate_documents(
+            pids, workers=args.workers, incremental=args.incremental,
+        )
     elif args.command == "migrate_acron":
-        result = migrate_acron(args.acron, args.id_folder_path)
+        result = migrate_acron(
+            args.acron, args.id_folder_path, workers=args.workers,
+            resume=args.resume, incremental=args.incremental,
+            title_and_issue=args.title_and_issue,
+        )
     elif args.command == "identify_documents_to_migrate":
-        result = identify_documents_to_migrate(args.from_date, args.to_date)
+        result = identify_documents_to_migrate(
+            args.from_date, args.to_date, args.batch_size)
     elif args.command == "list_documents_to_migrate":
         result = list_documents_to_migrate(
             args.acron, args.issue_folder, args.pub_year,
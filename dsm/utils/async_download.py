@@ -1,60 +1,104 @@
 import os
+import hashlib
 import tempfile
 
 import logging
 import asyncio
 
 import aiohttp
-from tenacity import retry, wait_exponential
+from tenacity import (
+    retry,
+    retry_if_not_exception_type,
+    wait_exponential,
+    stop_after_attempt,
+)
 
 LOGGER_FORMAT = u"%(asctime)s %(levelname)-5.5s %(message)s"
 logging.basicConfig(format=LOGGER_FORMAT, level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# tamanho das partes do conteúdo gravadas em disco
+CHUNK_SIZE = 1024 * 1024
 
-@retry(wait=wait_exponential(multiplier=1, min=4, max=20))
-async def _get(session, uri):
+
+class DownloadStatusError(Exception):
+    ...
+
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=4, max=20),
+    stop=stop_after_attempt(3),
+    retry=retry_if_not_exception_type(DownloadStatusError),
+    reraise=True,
+)
+async def _get(session, uri, download_file_path):
     """
-    Obtém um recurso com acesso HTTP.
+    Obtém um recurso com acesso HTTP e grava o seu conteúdo, em partes,
+    em `download_file_path`, sem mantê-lo inteiro em memória.
 
     Retentativas: Aguarde 2 ^ x * 1 segundo entre cada nova tentativa,
                   começando com 4 segundos, depois até 10 segundos e 10
-                  segundos depois
+                  segundos depois; no máximo, 3 tentativas
 
     Args:
         session: http session object(aiohttp), sessão http
-        uri: Endereço para URL contento uma posição de interpolação.
+        uri: Endereço do recurso
+        download_file_path: arquivo de destino
     Retornos:
-        Retorno o corpo da resposta HTTP.
+        tupla (quantidade de bytes, SHA-1 do conteúdo)
     Exceções:
-        Trata a exceções de conexão com o endpoint HTTP.
+        DownloadStatusError: status HTTP diferente de 200 (sem retentativas)
+        Exceções de conexão com o endpoint HTTP (com retentativas)
     """
     logger.info("Obtendo recurso com a uri: %s" % uri)
 
-    try:
-        async with session.get(uri) as response:
-            if response.status != 200:
-                logger.error(
-                    "Recurso não encontrado '%s'" %
-                    uri,
-                )
-                return None
+    async with session.get(uri) as response:
+        if response.status != 200:
+            raise DownloadStatusError(response.status)
 
-            return await response.content.read()
-    except Exception as e:
-        logger.error(
-            "Erro ao obter o recurso: %s, retentando...., erro: %s" %
-            (uri, e))
+        size = 0
+        _sha1 = hashlib.sha1()
+        with open(download_file_path, "wb") as fp:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                fp.write(chunk)
+                _sha1.update(chunk)
+                size += len(chunk)
+        return size, _sha1.hexdigest()
 
 
 async def _download_file(session, uri, download_filename, download_folder):
     """
+    Grava o conteúdo de `uri` em `download_folder/download_filename`
+
+    Retornos:
+        {"path": "", "status": 200, "size": 0, "sha1": "", "error": None}
     """
-    content = await _get(session, uri)
-    if content:
-        download_file_path = os.path.join(download_folder, download_filename)
-        with open(download_file_path, "wb") as fp:
-            fp.write(content)
+    download_file_path = os.path.join(download_folder, download_filename)
+    result = {
+        "path": None, "status": None, "size": None, "sha1": None,
+        "error": None,
+    }
+    try:
+        size, _sha1 = await _get(session, uri, download_file_path)
+    except DownloadStatusError as e:
+        logger.error("Recurso não encontrado '%s'" % uri)
+        result["status"] = e.args[0]
+        result["error"] = f"HTTP status {e.args[0]}"
+    except Exception as e:
+        logger.error(
+            "Erro ao obter o recurso: %s, erro: %s" % (uri, e))
+        result["error"] = str(e) or e.__class__.__name__
+    else:
+        result.update(
+            path=download_file_path, status=200, size=size, sha1=_sha1)
+        return result
+
+    # remove o conteúdo incompleto
+    try:
+        os.remove(download_file_path)
+    except FileNotFoundError:
+        pass
+    return result
 
 
 async def _bound_download_file(sem, session, uri, download_filename, download_folder):
@@ -68,7 +112,8 @@ async def _bound_download_file(sem, session, uri, download_filename, download_fo
     """
 
     async with sem:
-        await _download_file(session, uri, download_filename, download_folder)
+        return await _download_file(
+            session, uri, download_filename, download_folder)
 
 
 async def _download_files(
@@ -78,35 +123,32 @@ async def _download_files(
     semaphore_value=20,
 ):
     """
+    Retornos:
+        lista dos resultados de `_download_file`, na ordem de `uris_and_names`
     """
 
     tasks = []
     sem = asyncio.Semaphore(semaphore_value)
 
-    try:
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=False)
-        ) as session:
-
-            for uri_and_name in uris_and_names:
-                tasks.append(
-                    _bound_download_file(
-                        sem,
-                        session,
-                        uri_and_name["uri"],
-                        uri_and_name["name"],
-                        downloads_path,
-                    )
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(ssl=False)
+    ) as session:
+
+        for uri_and_name in uris_and_names:
+            tasks.append(
+                _bound_download_file(
+                    sem,
+                    session,
+                    uri_and_name["uri"],
+                    uri_and_name["name"],
+                    downloads_path,
                 )
+            )
 
-            if tasks:
-                logger.info("Qty tasks: %s", len(tasks))
-                responses = asyncio.gather(*tasks)
-                await responses
-
-    except Exception as e:
-        logger.error("Erro: %s.", e)
-        logger.exception(e)
+        if not tasks:
+            return []
+        logger.info("Qty tasks: %s", len(tasks))
+        return await asyncio.gather(*tasks)
 
 
 def _get_or_create_eventloop():
@@ -124,9 +166,38 @@ def _get_or_create_eventloop():
 
 
 def download_files(uris_and_names, downloads_path=None):
+    """
+    Obtém os arquivos `uris_and_names` e os grava em `downloads_path`
+
+    Returns
+    -------
+    dict
+        resultado do download de cada `name`
+
+    ```
+        {
+            "a01.pdf": {
+                "path": "/tmp/xxx/a01.pdf",
+                "status": 200,
+                "size": 1024,
+                "sha1": "0a4d55a8d778e5022fab701977c5d840bbc486d0",
+                "error": None,
+            },
+            "a01f1.jpg": {
+                "path": None,
+                "status": 404,
+                "size": None,
+                "sha1": None,
+                "error": "HTTP status 404",
+            },
+        }
+    ```
+    """
     downloads_path = downloads_path or tempfile.mkdtemp()
     loop = _get_or_create_eventloop()
-    loop.run_until_complete(
+    results = loop.run_until_complete(
         _download_files(uris_and_names, downloads_path))
-    return [os.path.join(downloads_path, f)
-            for f in os.listdir(downloads_path)]
+    return {
+        uri_and_name["name"]: result
+        for uri_and_name, result in zip(uris_and_names, results)
+    }
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache limitado a `max_size` itens, que descarta o item menos
+    recentemente usado quando está cheio
+
+    Parameters
+    ----------
+    max_size : int
+        quantidade máxima de itens
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max(max_size or 1, 1)
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        try:
+            self._items.move_to_end(key)
+        except KeyError:
+            return default
+        return self._items[key]
+
+    def set(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def get_or_set(self, key, get_value):
+        """
+        Retorna o valor de `key` ou o obtém com `get_value()`,
+        armazenando-o somente se não é None
+        """
+        value = self.get(key)
+        if value is None:
+            value = get_value()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
@@ -99,6 +99,19 @@ def create_zip_file(files, zip_name, zip_folder=None):
     return zip_path
 
 
+def write_zip_file(fileobj, contents):
+    """
+    Grava em `fileobj`, que pode ser não posicionável (ex.: pipe), o zip
+    com `contents`, pares (nome do arquivo, partes do conteúdo), à medida
+    que as partes são obtidas
+    """
+    with ZipFile(fileobj, 'w') as myzip:
+        for name, chunks in contents:
+            with myzip.open(name, 'w', force_zip64=True) as fp:
+                for chunk in chunks:
+                    fp.write(chunk)
+
+
 def delete_folder(path):
     try:
         shutil.rmtree(path)
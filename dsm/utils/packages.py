@@ -1,24 +1,71 @@
 import os
+import threading
 from zipfile import ZipFile
 from dsm.utils.files import (
     xml_files_list,
     files_list,
-    xml_files_list_from_zipfile,
-    files_list_from_zipfile,
     is_folder,
     is_zipfile,
 )
 
 
+class ZipPackageFile:
+    """
+    Arquivo zip de pacotes, aberto uma única vez e compartilhado pelos
+    pacotes (`Package`) nele contidos
+
+    Parameters
+    ----------
+    zip_file_path : str
+        zip file path
+    """
+
+    def __init__(self, zip_file_path):
+        self.zip_file_path = zip_file_path
+        self._zip_file = None
+        self._lock = threading.Lock()
+
+    @property
+    def _zf(self):
+        with self._lock:
+            if self._zip_file is None:
+                self._zip_file = ZipFile(self.zip_file_path)
+            return self._zip_file
+
+    def namelist(self):
+        return self._zf.namelist()
+
+    def getinfo(self, name):
+        return self._zf.getinfo(name)
+
+    def read(self, name):
+        return self._zf.read(name)
+
+    def open(self, name):
+        """
+        Retorna o conteúdo de `name` como arquivo aberto para leitura
+        """
+        return self._zf.open(name)
+
+    def close(self):
+        with self._lock:
+            if self._zip_file is not None:
+                self._zip_file.close()
+                self._zip_file = None
+
+
 class Package:
 
-    def __init__(self, source, name):
+    def __init__(self, source, name, zip_file=None):
         self._source = source
         self._xml = None
         self._assets = {}
         self._renditions = {}
         self._name = name
         self.zip_file_path = is_zipfile(source) and source
+        self.zip_file = zip_file
+        if self.zip_file_path and zip_file is None:
+            self.zip_file = ZipPackageFile(source)
 
     @property
     def name(self):
@@ -81,8 +128,15 @@ class Package:
         if is_folder(self._source):
             with open(self.xml, "rb") as fp:
                 return fp.read()
-        with ZipFile(self._source) as zf:
-            return zf.read(self.xml)
+        return self.zip_file.read(self.xml)
+
+    def close(self):
+        """
+        Fecha o arquivo zip do pacote, compartilhado com os demais pacotes
+        do mesmo zip
+        """
+        if self.zip_file:
+            self.zip_file.close()
 
 
 def select_filenames_by_prefix(prefix, files):
@@ -181,16 +235,22 @@ def _explore_zipfile(zip_path):
     dict
     """
     if is_zipfile(zip_path):
-        with ZipFile(zip_path, 'r'):
-            data = _group_files_by_xml_filename(
-                zip_path,
-                xml_files_list_from_zipfile(zip_path),
-                files_list_from_zipfile(zip_path),
-            )
-            return data
+        zip_file = ZipPackageFile(zip_path)
+        files = zip_file.namelist()
+        data = _group_files_by_xml_filename(
+            zip_path,
+            [
+                xml_filename
+                for xml_filename in files
+                if os.path.splitext(xml_filename)[-1] == ".xml"
+            ],
+            files,
+            zip_file,
+        )
+        return data
 
 
-def _group_files_by_xml_filename(source, xmls, files):
+def _group_files_by_xml_filename(source, xmls, files, zip_file=None):
     """
     Group files by their XML basename
 
@@ -202,6 +262,8 @@ def _group_files_by_xml_filename(source, xmls, files):
         XML filenames
     files : list
         list of files in the folder or zipfile
+    zip_file : ZipPackageFile
+        zip file shared by the packages
 
     Returns
     -------
@@ -214,30 +276,68 @@ def _group_files_by_xml_filename(source, xmls, files):
         basename = os.path.basename(xml)
         prefix, ext = os.path.splitext(basename)
 
-        docs.setdefault(prefix, Package(source, prefix))
+        docs.setdefault(prefix, Package(source, prefix, zip_file))
 
         # XML
         docs[prefix].xml = xml
 
-        for file in select_filenames_by_prefix(prefix, files):
-            # avalia arquivo do pacote, se é asset ou rendition
-            component = _eval_file(prefix, file)
-            if not component:
-                continue
-
-            # resultado do avaliação do pacote
-            ftype = component.get("ftype")
-            file_path = component["file_path"]
-            comp_id = component["component_id"]
-
-            if ftype:
-                docs[prefix].add_asset(comp_id, file_path)
-            else:
-                docs[prefix].add_rendition(comp_id, file_path)
-            files.remove(file)
+    # posição de cada prefixo na ordem dos XML
+    prefixes = {prefix: i for i, prefix in enumerate(docs)}
+
+    for file in files:
+        if file.endswith(".xml"):
+            # ignore XML files
+            continue
+        prefix = _get_package_prefix(os.path.basename(file), prefixes)
+        if prefix is None:
+            continue
+
+        # avalia arquivo do pacote, se é asset ou rendition
+        component = _eval_file(prefix, file)
+        if not component:
+            continue
+
+        # resultado do avaliação do pacote
+        ftype = component.get("ftype")
+        file_path = component["file_path"]
+        comp_id = component["component_id"]
+
+        if ftype:
+            docs[prefix].add_asset(comp_id, file_path)
+        else:
+            docs[prefix].add_rendition(comp_id, file_path)
     return docs
 
 
+def _get_package_prefix(basename, prefixes):
+    """
+    Retorna o prefixo do pacote ao qual pertence o arquivo `basename`,
+    ou seja, dentre os prefixos de `prefixes` seguidos de `-` ou `.` em
+    `basename`, o do primeiro XML
+
+    Parameters
+    ----------
+    basename : str
+        nome do arquivo
+    prefixes : dict
+        key: prefixo (nome do arquivo XML sem extensão)
+        value: posição do XML
+
+    Returns
+    -------
+    str
+    """
+    found = None
+    for i, c in enumerate(basename):
+        if c not in "-.":
+            continue
+        prefix = basename[:i]
+        if prefix in prefixes and (
+                found is None or prefixes[prefix] < prefixes[found]):
+            found = prefix
+    return found
+
+
 def _eval_file(prefix, file_path):
     """
     Identifica o tipo de arquivo do pacote: `asset` ou `rendition`.
@@ -0,0 +1,36 @@
+from collections import deque
+
+
+def bounded_imap(pool, func, items_args, max_pending):
+    """
+    Executa `func` para cada item de `items_args` em `pool`, mantendo no
+    máximo `max_pending` tarefas pendentes, e retorna os resultados na mesma
+    ordem de `items_args`
+
+    Diferente de `multiprocessing.Pool.imap`, `items_args` só é consumido à
+    medida que os resultados são consumidos, o que mantém o uso de memória
+    constante mesmo para geradores muito grandes
+
+    Parameters
+    ----------
+    pool : multiprocessing.pool.Pool
+    func : callable
+        função executada nos processos de `pool`
+    items_args : iterable of tuples
+        argumentos de cada chamada de `func`
+    max_pending : int
+        quantidade máxima de tarefas enviadas e ainda não consumidas
+
+    Returns
+    -------
+    generator
+        resultados de `func`
+    """
+    max_pending = max(max_pending or 1, 1)
+    pending = deque()
+    for args in items_args:
+        pending.append(pool.apply_async(func, args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
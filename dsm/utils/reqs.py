@@ -13,3 +13,11 @@ def requests_get_content(uri, timeout=10):
 def requests_get(uri, timeout=10):
     response = requests.get(uri, timeout=timeout)
     return response.content
+
+
+def requests_get_stream(uri, timeout=10):
+    """
+    Obtém `uri` sem carregar o conteúdo em memória;
+    o conteúdo é lido em partes com `response.iter_content`
+    """
+    return requests.get(uri, timeout=timeout, stream=True)
@@ -0,0 +1,104 @@
+"""
+Implementações anteriores (legacy) de funções que foram otimizadas e
+`LegacyEquivalenceTestCase`, que verifica que as novas implementações
+retornam o mesmo que as anteriores
+
+O tempo de cada implementação é registrado (logging, nível INFO), sem
+asserção, pois depende da carga da máquina. Para vê-lo:
+
+```
+python -m pytest tests/test_id2json.py tests/test_packages.py \
+    -o log_cli=true --log-cli-level=INFO -k legacy
+```
+"""
+import logging
+import os
+import time
+from unittest import TestCase
+
+from dsm.extdeps.isis_migration import id2json
+from dsm.utils import packages
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_record(content):
+    # algoritmo anterior de `id2json._parse_record`:
+    # linhas, `_parse_field` e `_build_record`
+    fields = []
+    for row in content.splitlines():
+        if row:
+            pos = row[1:].find("!") + 1
+            fields.append((
+                row[1:pos],
+                id2json._parse_field_content_with_escapes(row[pos+1:]),
+            ))
+    return id2json._build_record(fields)
+
+
+def group_files_by_xml_filename(source, xmls, files):
+    # algoritmo anterior de `packages._group_files_by_xml_filename`:
+    # O(xmls x files)
+    docs = {}
+    for xml in xmls:
+        basename = os.path.basename(xml)
+        prefix, ext = os.path.splitext(basename)
+        docs.setdefault(prefix, packages.Package(source, prefix))
+        docs[prefix].xml = xml
+        for file in packages.select_filenames_by_prefix(prefix, files):
+            component = packages._eval_file(prefix, file)
+            if not component:
+                continue
+            if component.get("ftype"):
+                docs[prefix].add_asset(
+                    component["component_id"], component["file_path"])
+            else:
+                docs[prefix].add_rendition(
+                    component["component_id"], component["file_path"])
+            files.remove(file)
+    return docs
+
+
+def _call(function, args_list):
+    """
+    Retorna os resultados de `function(*args)` para cada `args` de
+    `args_list` e o tempo (segundos) gasto
+    """
+    start = time.perf_counter()
+    results = [function(*args) for args in args_list]
+    return results, time.perf_counter() - start
+
+
+class LegacyEquivalenceTestCase(TestCase):
+
+    def assertSameAsLegacy(self, legacy_function, function, get_args,
+                           comparable=None):
+        """
+        Verifica que `function(*args)` retorna o mesmo que
+        `legacy_function(*args)` para cada `args` retornado por `get_args`
+
+        Parameters
+        ----------
+        legacy_function: callable
+            implementação anterior
+        function: callable
+            nova implementação
+        get_args: callable
+            retorna a lista de argumentos (tuple) das chamadas; é chamada
+            uma vez para cada implementação, pois elas podem alterar
+            os argumentos
+        comparable: callable
+            converte os resultados em valores comparáveis
+        """
+        comparable = comparable or (lambda result: result)
+        expected, legacy_elapsed = _call(legacy_function, list(get_args()))
+        results, elapsed = _call(function, list(get_args()))
+        logger.info(
+            "%s: %.4fs, legacy: %.4fs (%.1fx)",
+            function.__qualname__, elapsed, legacy_elapsed,
+            legacy_elapsed / (elapsed or 1e-9),
+        )
+        self.assertEqual(len(expected), len(results))
+        for item, result in zip(expected, results):
+            self.assertEqual(comparable(item), comparable(result))
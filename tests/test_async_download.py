@@ -0,0 +1,67 @@
+import hashlib
+import os
+import tempfile
+import threading
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from unittest import TestCase
+
+from dsm.utils import async_download
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDownloadFiles(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.site = os.path.join(self.tmpdir.name, "site")
+        self.downloads = os.path.join(self.tmpdir.name, "downloads")
+        os.makedirs(self.site)
+        os.makedirs(self.downloads)
+        self.content = os.urandom(3 * 1024 * 1024 + 7)
+        with open(os.path.join(self.site, "a01.pdf"), "wb") as fp:
+            fp.write(self.content)
+
+        self.server = HTTPServer(
+            ("127.0.0.1", 0), partial(_QuietHandler, directory=self.site))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%s" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_download_files_returns_result_of_each_name(self):
+        result = async_download.download_files(
+            [
+                {"uri": self.url + "/a01.pdf", "name": "a01.pdf"},
+                {"uri": self.url + "/a01f1.jpg", "name": "a01f1.jpg"},
+            ],
+            self.downloads,
+        )
+        expected = {
+            "a01.pdf": {
+                "path": os.path.join(self.downloads, "a01.pdf"),
+                "status": 200,
+                "size": len(self.content),
+                "sha1": hashlib.sha1(self.content).hexdigest(),
+                "error": None,
+            },
+            "a01f1.jpg": {
+                "path": None,
+                "status": 404,
+                "size": None,
+                "sha1": None,
+                "error": "HTTP status 404",
+            },
+        }
+        self.assertEqual(expected, result)
+        with open(result["a01.pdf"]["path"], "rb") as fp:
+            self.assertEqual(self.content, fp.read())
+        self.assertEqual(["a01.pdf"], os.listdir(self.downloads))
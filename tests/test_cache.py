@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from dsm.utils.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+
+    def test_set_discards_least_recently_used_item(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+
+    def test_get_or_set_calls_get_value_once(self):
+        cache = LRUCache(2)
+        calls = []
+
+        def get_value():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual("value", cache.get_or_set("a", get_value))
+        self.assertEqual("value", cache.get_or_set("a", get_value))
+        self.assertEqual(1, len(calls))
+
+    def test_get_or_set_does_not_store_none(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get_or_set("a", lambda: None))
+        self.assertNotIn("a", cache)
+
+    def test_invalidate_removes_item(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.invalidate("a")
+        cache.invalidate("x")
+        self.assertEqual(0, len(cache))
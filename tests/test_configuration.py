@@ -0,0 +1,126 @@
+import glob
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from dsm import configuration
+
+
+class TestDocumentFilesAtOldWebsite(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = {}
+        names = {
+            "BASES_PDF_PATH": ["a01.pdf", "en_a01.pdf", "a02.pdf", ".a01.pdf"],
+            "BASES_TRANSLATION_PATH": [
+                "en_a01.htm", "en_ba01.html", "es_a01.html", "en_a02.htm"],
+            "BASES_XML_PATH": ["a01.xml", "a02.xml"],
+            "HTDOCS_IMG_REVISTAS_PATH": [
+                "a01f1.jpg", "a01f2.gif", "a02f1.jpg", "ea01f1.tif"],
+        }
+        for name, file_names in names.items():
+            path = os.path.join(self.tmpdir.name, name)
+            folder_path = os.path.join(path, "acron", "v1n1")
+            os.makedirs(folder_path)
+            for file_name in file_names:
+                with open(os.path.join(folder_path, file_name), "w") as fp:
+                    fp.write("")
+            self.paths[name] = path
+        self.patches = [
+            mock.patch.object(configuration, name, path)
+            for name, path in self.paths.items()
+        ]
+        for patch in self.patches:
+            patch.start()
+        configuration._folder_listings.clear()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        configuration._folder_listings.clear()
+        self.tmpdir.cleanup()
+
+    def _glob(self, name, pattern):
+        return sorted(
+            glob.glob(os.path.join(self.paths[name], "acron", "v1n1", pattern)))
+
+    def test_files_paths_are_the_same_as_glob(self):
+        doc = configuration.DocumentFilesAtOldWebsite(
+            os.path.join("acron", "v1n1"), "a01", "pt")
+        self.assertEqual(
+            {
+                "pt": self._glob("BASES_PDF_PATH", "a01.pdf")[0],
+                "en": self._glob("BASES_PDF_PATH", "en_a01.pdf")[0],
+            },
+            doc.bases_pdf_files_paths,
+        )
+        self.assertEqual(
+            {
+                "en": {
+                    "front": self._glob(
+                        "BASES_TRANSLATION_PATH", "en_a01.htm")[0],
+                    "back": self._glob(
+                        "BASES_TRANSLATION_PATH", "en_ba01.html")[0],
+                },
+                "es": {
+                    "front": self._glob(
+                        "BASES_TRANSLATION_PATH", "es_a01.html")[0],
+                },
+            },
+            doc.bases_translation_files_paths,
+        )
+        self.assertEqual(
+            self._glob("HTDOCS_IMG_REVISTAS_PATH", "*a01*.*"),
+            sorted(doc.htdocs_img_revistas_files_paths),
+        )
+        self.assertEqual(
+            self._glob("BASES_XML_PATH", "a01.xml")[0],
+            doc.bases_xml_file_path,
+        )
+
+    def test_each_folder_is_listed_once(self):
+        with mock.patch.object(
+                configuration.os, "listdir", wraps=os.listdir) as listdir:
+            for file_name in ("a01", "a02"):
+                doc = configuration.DocumentFilesAtOldWebsite(
+                    os.path.join("acron", "v1n1"), file_name, "pt")
+                doc.bases_pdf_files_paths
+                doc.bases_translation_files_paths
+                doc.htdocs_img_revistas_files_paths
+                doc.bases_xml_file_path
+        self.assertEqual(4, listdir.call_count)
+
+    def test_bases_xml_file_path_is_none_if_folder_does_not_exist(self):
+        doc = configuration.DocumentFilesAtOldWebsite(
+            os.path.join("acron", "v9n9"), "a01", "pt")
+        self.assertIsNone(doc.bases_xml_file_path)
+        self.assertEqual({}, doc.bases_pdf_files_paths)
+
+    def test_folder_is_listed_again_if_it_changed(self):
+        doc = configuration.DocumentFilesAtOldWebsite(
+            os.path.join("acron", "v1n1"), "a03", "pt")
+        self.assertEqual({}, doc.bases_pdf_files_paths)
+
+        folder_path = os.path.join(
+            self.paths["BASES_PDF_PATH"], "acron", "v1n1")
+        file_path = os.path.join(folder_path, "a03.pdf")
+        with open(file_path, "w") as fp:
+            fp.write("")
+        # garante data de modificação diferente da leitura anterior
+        stat = os.stat(folder_path)
+        os.utime(
+            folder_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        doc = configuration.DocumentFilesAtOldWebsite(
+            os.path.join("acron", "v1n1"), "a03", "pt")
+        self.assertEqual({"pt": file_path}, doc.bases_pdf_files_paths)
+
+    def test_folder_is_listed_if_it_is_created(self):
+        folder_path = os.path.join(
+            self.paths["BASES_PDF_PATH"], "acron", "v9n9")
+        self.assertEqual([], configuration.list_folder(folder_path))
+        os.makedirs(folder_path)
+        with open(os.path.join(folder_path, "a01.pdf"), "w") as fp:
+            fp.write("")
+        self.assertEqual(["a01.pdf"], configuration.list_folder(folder_path))
@@ -0,0 +1,344 @@
+from types import SimpleNamespace
+from unittest import TestCase, mock, skipUnless
+
+from mongoengine import DateTimeField, Document, StringField, signals
+from pymongo import UpdateOne
+
+from dsm.extdeps import db
+
+
+class TestRegisterISISDocumentsPendingMigration(TestCase):
+
+    def setUp(self):
+        registered = [
+            {"_id": "S0044-59672019000300242", "isis_updated_date": "20190807"},
+            {"_id": "S0044-59672019000300167", "isis_updated_date": "20190801"},
+        ]
+        self.objects = mock.patch.object(db.ISISDocument, "objects").start()
+        self.objects.return_value.only.return_value.as_pymongo.return_value = (
+            registered)
+        self.collection = mock.patch.object(
+            db.ISISDocument, "_get_collection").start().return_value
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def _get_operation(self, pid, isis_updated_date):
+        return UpdateOne(
+            {"_id": pid},
+            {
+                "$set": {
+                    "isis_updated_date": isis_updated_date,
+                    "status": "pending_migration",
+                    "updated": mock.ANY,
+                },
+                "$setOnInsert": {"created": mock.ANY},
+            },
+            upsert=True,
+        )
+
+    def test_registers_new_and_changed_documents_in_one_bulk_write(self):
+        result = db.register_isis_documents_pending_migration({
+            # inalterado
+            "S0044-59672019000300242": "20190807",
+            # alterado
+            "S0044-59672019000300167": "20190901",
+            # novo
+            "S0044-59672019000300256": "20190901",
+        })
+        self.assertEqual(2, result)
+        self.objects.assert_called_once_with(
+            _id__in=[
+                "S0044-59672019000300242",
+                "S0044-59672019000300167",
+                "S0044-59672019000300256",
+            ])
+        self.collection.bulk_write.assert_called_once_with(
+            [
+                self._get_operation("S0044-59672019000300167", "20190901"),
+                self._get_operation("S0044-59672019000300256", "20190901"),
+            ],
+            ordered=False,
+        )
+
+    def test_does_not_write_if_all_documents_are_unchanged(self):
+        result = db.register_isis_documents_pending_migration({
+            "S0044-59672019000300242": "20190807",
+            "S0044-59672019000300167": "20190801",
+        })
+        self.assertEqual(0, result)
+        self.collection.bulk_write.assert_not_called()
+
+
+def _get_article(pk, pid=None, aop_pid=None, other_pids=None, doi=None):
+    return SimpleNamespace(
+        pk=pk, pid=pid, aop_pid=aop_pid,
+        scielo_pids={"v3": pk, "other": other_pids or []}, doi=doi,
+    )
+
+
+class TestFetchDocumentsByIds(TestCase):
+
+    def setUp(self):
+        self.articles = [
+            _get_article(
+                "ywDM7t6mxHzCRWp7kGF9rXQ", pid="S0044-59672019000300242",
+                doi="10.1590/1809-4392201804512"),
+            _get_article(
+                "k7Q8kGx8j4kb7KvP6mF4fWc", pid="S0044-59672019000300167",
+                aop_pid="S0044-59672019005000001",
+                other_pids=["S0044-59672019000300242"]),
+            _get_article(
+                "Zr5Kq7Hk5xjH3Fb8bY6pQYS", pid="S0044-59672019000300256",
+                doi="S0044-59672019005000001"),
+        ]
+        self.objects = mock.patch.object(
+            db.models.Article, "objects", return_value=self.articles).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_fetches_documents_of_different_fields_with_one_query(self):
+        result = db.fetch_documents_by_ids([
+            "ywDM7t6mxHzCRWp7kGF9rXQ",
+            "S0044-59672019000300167",
+            "10.1590/1809-4392201804512",
+            "S0000-00000000000000000",
+        ])
+        self.objects.assert_called_once()
+        self.assertEqual(
+            {
+                "ywDM7t6mxHzCRWp7kGF9rXQ": self.articles[0],
+                "S0044-59672019000300167": self.articles[1],
+                "10.1590/1809-4392201804512": self.articles[0],
+            },
+            result
+        )
+
+    def test_query_has_one_condition_of_each_field(self):
+        db.fetch_documents_by_ids(["S0044-59672019000300167"])
+        query = self.objects.call_args[0][0].to_query(db.models.Article)
+        self.assertEqual(
+            [
+                {"_id": {"$in": ["S0044-59672019000300167"]}},
+                {"pid": {"$in": ["S0044-59672019000300167"]}},
+                {"aop_pid": {"$in": ["S0044-59672019000300167"]}},
+                {"scielo_pids.other": {"$in": ["S0044-59672019000300167"]}},
+                {"doi": {"$in": ["S0044-59672019000300167"]}},
+            ],
+            query["$or"]
+        )
+
+    def test_pid_has_priority_over_other_pids(self):
+        # pid de `articles[0]` e outro pid de `articles[1]`, retornado antes
+        self.objects.return_value = self.articles[::-1]
+        result = db.fetch_documents_by_ids(["S0044-59672019000300242"])
+        self.assertIs(self.articles[0], result["S0044-59672019000300242"])
+
+    def test_aop_pid_has_priority_over_doi(self):
+        # aop pid de `articles[1]` e doi de `articles[2]`, retornado antes
+        self.objects.return_value = self.articles[::-1]
+        result = db.fetch_documents_by_ids(["S0044-59672019005000001"])
+        self.assertIs(self.articles[1], result["S0044-59672019005000001"])
+
+    def test_fetch_document_returns_none_if_not_found(self):
+        self.objects.return_value = []
+        self.assertIsNone(db.fetch_document("S0000-00000000000000000"))
+
+    def test_no_query_if_there_are_no_ids(self):
+        self.assertEqual({}, db.fetch_documents_by_ids([None, ""]))
+        self.objects.assert_not_called()
+
+
+def _get_isis_journal(_id):
+    journal = db.ISISJournal()
+    journal._id = _id
+    journal.isis_updated_date = "20151103"
+    return journal
+
+
+class TestBulkWriter(TestCase):
+
+    def setUp(self):
+        self.collection = mock.patch.object(
+            db.ISISJournal, "_get_collection").start().return_value
+        self.collection.name = "isis_journal"
+        self.writer = db.BulkWriter(models=(db.ISISJournal, ))
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_save_data_is_buffered_and_fetched_by_id_while_active(self):
+        journal = _get_isis_journal("0044-5967")
+        with self.writer.activate("0044-5967"):
+            db.save_data(journal)
+            self.assertIs(journal, db.fetch_isis_journal("0044-5967"))
+            self.assertIs(
+                journal, db.fetch_isis_journal_migration_status("0044-5967"))
+        self.assertEqual(1, self.writer.size)
+        self.collection.bulk_write.assert_not_called()
+
+    def test_save_data_is_not_buffered_if_writer_is_not_active(self):
+        journal = _get_isis_journal("0044-5967")
+        with mock.patch.object(journal, "save") as save:
+            db.save_data(journal)
+        save.assert_called_once_with()
+        self.assertEqual(0, self.writer.size)
+
+    def test_flush_writes_records_with_one_bulk_write(self):
+        for _id in ("0044-5967", "0102-6720"):
+            with self.writer.activate(_id):
+                db.save_data(_get_isis_journal(_id))
+        self.assertEqual([], self.writer.flush())
+        operations = self.collection.bulk_write.call_args[0][0]
+        self.assertEqual(
+            ["0044-5967", "0102-6720"],
+            [operation._filter["_id"] for operation in operations])
+        self.assertEqual(0, self.writer.size)
+
+    def test_flush_returns_errors_of_each_item(self):
+        for _id in ("0044-5967", "0102-6720"):
+            with self.writer.activate(f"item-{_id}"):
+                db.save_data(_get_isis_journal(_id))
+        self.collection.bulk_write.side_effect = db.BulkWriteError({
+            "writeErrors": [{"index": 1, "errmsg": "duplicate key"}],
+        })
+        self.assertEqual(
+            [{
+                "pid": "item-0102-6720",
+                "error": "isis_journal 0102-6720: duplicate key",
+            }],
+            self.writer.flush()
+        )
+
+    def test_flush_returns_errors_of_all_items_if_write_fails(self):
+        for _id in ("0044-5967", "0102-6720"):
+            with self.writer.activate(_id):
+                db.save_data(_get_isis_journal(_id))
+        self.collection.bulk_write.side_effect = db.exceptions.DBConnectError(
+            "AutoReconnect")
+        self.assertEqual(
+            ["0044-5967", "0102-6720"],
+            [error["pid"] for error in self.writer.flush()])
+
+
+class CustomSaveRecord(Document):
+    _id = StringField(primary_key=True)
+    name = StringField()
+    created = DateTimeField()
+    updated = DateTimeField()
+
+    meta = {"collection": "custom_save_record"}
+
+    def save(self, *args, **kwargs):
+        self.name = self.name.upper()
+        return super().save(*args, **kwargs)
+
+
+class TestBulkWriterSaveHooks(TestCase):
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def _saved_by_document_save(self, data):
+        saved = []
+
+        def save(document, *args, **kwargs):
+            saved.append(document.to_mongo().to_dict())
+
+        with mock.patch.object(Document, "save", save):
+            data.save()
+        return saved[0]
+
+    def _saved_by_bulk_writer(self, data):
+        writer = db.BulkWriter()
+        with writer.activate("item"):
+            db.save_data(data)
+        return writer._pending[type(data)][data.pk][1].to_dict()
+
+    def _without_dates(self, saved):
+        return {
+            k: v for k, v in saved.items() if k not in ("created", "updated")
+        }
+
+    def test_isis_models_save_is_the_same_as_bulk_writer_save(self):
+        items = (
+            lambda: db.ISISJournal(_id="0044-5967", record={"v100": "x"}),
+            lambda: db.ISISIssue(_id="0044-596720190003", record={}),
+            lambda: db.ISISDocument(
+                _id="S0044-59672019000300242", file_type="html",
+                records=[{"v706": [{"_": "h"}]}]),
+        )
+        for create in items:
+            with self.subTest(create().__class__.__name__):
+                self.assertEqual(
+                    self._without_dates(self._saved_by_document_save(create())),
+                    self._without_dates(self._saved_by_bulk_writer(create())),
+                )
+
+    def test_bulk_writer_models_have_no_other_save_hooks(self):
+        for model in db._BULK_WRITER_MODELS:
+            with self.subTest(model.__name__):
+                self.assertFalse(db._has_save_hooks(model))
+        self.assertEqual(
+            db._BULK_WRITER_MODELS, db.BulkWriter().models)
+
+    def test_models_with_save_hooks_are_saved_immediately(self):
+        writer = db.BulkWriter(models=(db.ISISJournal, CustomSaveRecord))
+        self.assertEqual((db.ISISJournal, ), writer.models)
+
+        record = CustomSaveRecord(_id="1", name="abc")
+        with mock.patch.object(Document, "save") as document_save:
+            with writer.activate("item"):
+                db.save_data(record)
+        document_save.assert_called_once_with()
+        self.assertEqual("ABC", record.name)
+        self.assertEqual(0, writer.size)
+
+    @skipUnless(signals.signals_available, "blinker is not installed")
+    def test_save_signals_are_sent(self):
+        collection = mock.patch.object(
+            db.ISISJournal, "_get_collection").start().return_value
+        collection.name = "isis_journal"
+        collection.bulk_write.side_effect = db.BulkWriteError({
+            "writeErrors": [{"index": 1, "errmsg": "duplicate key"}],
+        })
+        received = []
+
+        def receiver(signal):
+            def _receive(sender, document, **kwargs):
+                received.append(
+                    (signal, sender, document._id, kwargs.get("created")))
+            return _receive
+
+        receivers = {
+            name: receiver(name)
+            for name in ("pre_save", "pre_save_post_validation", "post_save")
+        }
+        for name, _receive in receivers.items():
+            getattr(signals, name).connect(_receive, sender=db.ISISJournal)
+        try:
+            writer = db.BulkWriter()
+            with writer.activate("0044-5967"):
+                # `_id` alterado: registro existente, como em `save()`
+                db.save_data(_get_isis_journal("0044-5967"))
+            with writer.activate("0102-6720"):
+                db.save_data(db.ISISJournal(_id="0102-6720", record={}))
+            writer.flush()
+        finally:
+            for name, _receive in receivers.items():
+                getattr(signals, name).disconnect(
+                    _receive, sender=db.ISISJournal)
+        self.assertEqual(
+            [
+                ("pre_save", db.ISISJournal, "0044-5967", None),
+                ("pre_save_post_validation", db.ISISJournal, "0044-5967",
+                 False),
+                ("pre_save", db.ISISJournal, "0102-6720", None),
+                ("pre_save_post_validation", db.ISISJournal, "0102-6720",
+                 True),
+                # somente o registro gravado
+                ("post_save", db.ISISJournal, "0044-5967", False),
+            ],
+            received
+        )
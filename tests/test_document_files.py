@@ -130,7 +130,7 @@ class Test_register_file(TestCase):
             files_storage=mock_files_storage,
             files_storage_folder='folder',
             file_path='./testes/fixtures/document.xml',
-            zip_file_path=None,
+            zip_file=None,
         )
         mock_files_storage.register.assert_called_with(
             './testes/fixtures/document.xml',
@@ -138,13 +138,13 @@ class Test_register_file(TestCase):
             'document.xml',
         )
 
-    @patch("dsm.core.document_files.ZipFile")
-    def test__register_file_from_zipfile(self, mock_zipfile):
+    def test__register_file_from_zipfile(self):
         mock_files_storage = MagicMock()
-        mock_files_storage.register = MagicMock()
-        mock_files_storage.register.return_value = (
+        mock_files_storage.register_fileobj.return_value = (
             'https://files_storage/folder/bla.xml'
         )
+        mock_zip_file = MagicMock()
+        mock_zip_file.getinfo.return_value.file_size = 10
         expected = dict(
             uri='https://files_storage/folder/bla.xml',
             name='document.xml',
@@ -153,12 +153,13 @@ class Test_register_file(TestCase):
             files_storage=mock_files_storage,
             files_storage_folder='folder',
             file_path='./testes/fixtures/document.xml',
-            zip_file_path='./testes/fixtures/package.zip',
+            zip_file=mock_zip_file,
         )
 
-        mock_zipfile.assert_called_with("./testes/fixtures/package.zip")
-        mock_files_storage.register.assert_called_with(
+        mock_zip_file.open.assert_called_with("./testes/fixtures/document.xml")
+        mock_files_storage.register_fileobj.assert_called_with(
             ANY,
+            10,
             "folder",
             'document.xml',
         )
@@ -271,3 +272,252 @@ class Test_register_assets(TestCase):
             with self.subTest(i):
                 self.assertEqual(expected[i]['uri'], asset.uri)
                 self.assertEqual(expected[i]['filename'], asset.filename)
+
+
+class Test_build_zip_package_from_doc_package(TestCase):
+
+    @patch("dsm.core.document_files.configuration."
+           "get_files_storage_folder_for_document_packages")
+    def test_build_zip_package_from_doc_package(self, mock_folder):
+        import io
+        from zipfile import ZipFile
+
+        written = io.BytesIO()
+
+        def register_stream(write_content, prefix, filename, content_type):
+            write_content(written)
+            return f"https://files_storage/{prefix}/{filename}"
+
+        mock_folder.return_value = "folder"
+        mock_files_storage = MagicMock()
+        mock_files_storage.register_stream.side_effect = register_stream
+        doc_pkg = packages._explore_folder(
+            "./tests/fixtures/package_folder"
+        )['2318-0889-tinf-33-e200068']
+        xml_sps = sps_package.SPS_Package(doc_pkg.xml)
+        registered_renditions = [
+            {
+                "filename": '2318-0889-tinf-33-e200068-es.pdf',
+                "lang": "es",
+                "url": 'https://files_storage/folder/a1-es.pdf',
+            },
+            {
+                "filename": '2318-0889-tinf-33-e200068.pdf',
+                "lang": "original",
+                "url": 'https://files_storage/folder/a1.pdf',
+            },
+        ]
+        result = document_files.build_zip_package_from_doc_package(
+            mock_files_storage, doc_pkg, xml_sps,
+            {"uri": "https://files_storage/folder/a1.xml"},
+            registered_renditions,
+        )
+        package_name = xml_sps.package_name
+        self.assertEqual(
+            {"uri": "https://files_storage/folder/a1.xml",
+             "name": f"{package_name}.xml"},
+            result["xml"])
+        self.assertEqual(
+            {"uri": f"https://files_storage/folder/{package_name}.zip",
+             "name": f"{package_name}.zip"},
+            result["file"])
+        with ZipFile(written) as zf:
+            self.assertEqual(
+                [
+                    f"{package_name}.xml",
+                    '2318-0889-tinf-33-e200068-es.pdf',
+                    '2318-0889-tinf-33-e200068.pdf',
+                ],
+                zf.namelist())
+            with open(doc_pkg.get_rendition("es"), "rb") as fp:
+                self.assertEqual(
+                    fp.read(), zf.read('2318-0889-tinf-33-e200068-es.pdf'))
+
+    @patch("dsm.core.document_files.configuration."
+           "get_files_storage_folder_for_document_packages")
+    def test_build_zip_package_from_doc_package_with_assets(self, mock_folder):
+        import io
+        import os
+        import shutil
+        import tempfile
+        from zipfile import ZipFile
+
+        written = io.BytesIO()
+
+        def register_stream(write_content, prefix, filename, content_type):
+            write_content(written)
+            return f"https://files_storage/{prefix}/{filename}"
+
+        def register(file_path, prefix, filename, preserve_name):
+            return f"https://files_storage/{prefix}/{filename}"
+
+        mock_folder.return_value = "folder"
+        mock_files_storage = MagicMock()
+        mock_files_storage.register_stream.side_effect = register_stream
+        mock_files_storage.register.side_effect = register
+
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ("2318-0889-tinf-33-e200068.xml",
+                         "2318-0889-tinf-33-e200068.pdf"):
+                shutil.copy(
+                    os.path.join("./tests/fixtures/package_folder", name),
+                    folder)
+            with open(os.path.join(
+                    folder, "2318-0889-tinf-33-e200068-gf01.tif"), "wb") as fp:
+                fp.write(b"gf01")
+            doc_pkg = packages._explore_folder(
+                folder)['2318-0889-tinf-33-e200068']
+            xml_sps = sps_package.SPS_Package(doc_pkg.xml)
+            document_files.register_assets(
+                mock_files_storage, "folder", doc_pkg, xml_sps.assets.items)
+            registered_xml_content = xml_sps.xml_content
+            registered_renditions = [
+                {
+                    "filename": '2318-0889-tinf-33-e200068.pdf',
+                    "lang": "original",
+                    "url": 'https://files_storage/folder/a1.pdf',
+                },
+            ]
+            result = document_files.build_zip_package_from_doc_package(
+                mock_files_storage, doc_pkg, xml_sps,
+                {"uri": "https://files_storage/folder/a1.xml"},
+                registered_renditions,
+            )
+
+        package_name = xml_sps.package_name
+        asset = xml_sps.assets.items[0]
+        asset_name = asset.get_name(package_name)
+        self.assertEqual(
+            [{"uri": "https://files_storage/folder/"
+                     "2318-0889-tinf-33-e200068-gf01.tif",
+              "name": asset_name}],
+            result["assets"])
+        # o XML registrado continua com as URIs dos ativos
+        self.assertEqual(registered_xml_content, xml_sps.xml_content)
+        self.assertEqual(
+            "https://files_storage/folder/2318-0889-tinf-33-e200068-gf01.tif",
+            asset.xlink_href)
+        with ZipFile(written) as zf:
+            self.assertEqual(
+                [
+                    f"{package_name}.xml",
+                    asset_name,
+                    '2318-0889-tinf-33-e200068.pdf',
+                ],
+                zf.namelist())
+            self.assertEqual(b"gf01", zf.read(asset_name))
+            zipped_xml_sps = sps_package.SPS_Package(
+                zf.read(f"{package_name}.xml"))
+        # o XML do zip referencia os ativos pelos seus nomes no zip
+        self.assertEqual(
+            asset_name, zipped_xml_sps.assets.items[0].xlink_href)
+        self.assertNotIn(
+            "https://files_storage", zipped_xml_sps.xml_content)
+
+
+class FakeStreamResponse:
+
+    def __init__(self, uri, status_code=200, error=None):
+        self.uri = uri
+        self.status_code = status_code
+        self.error = error
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+    def iter_content(self, chunk_size):
+        yield self.uri.encode("utf-8")
+        if self.error:
+            raise self.error
+
+
+class Test_register_zip_files(TestCase):
+
+    def setUp(self):
+        import io
+
+        self.written = io.BytesIO()
+        self.responses = {}
+        self.mock_files_storage = MagicMock()
+        self.mock_files_storage.register_stream.side_effect = (
+            self._register_stream)
+
+    def _register_stream(self, write_content, prefix, filename,
+                         content_type):
+        write_content(self.written)
+        return f"https://files_storage/{prefix}/{filename}"
+
+    def _requests_get_stream(self, uri):
+        if uri == "https://minio/a01f4.jpg":
+            raise ConnectionError("connection refused")
+        self.responses[uri] = FakeStreamResponse(
+            uri,
+            status_code=404 if uri == "https://minio/a01f2.jpg" else 200,
+            error=(
+                ConnectionError("connection reset")
+                if uri == "https://minio/broken.pdf" else None
+            ),
+        )
+        return self.responses[uri]
+
+    @patch("dsm.core.document_files.reqs.requests_get_stream")
+    def test__register_zip_files(self, mock_get_stream):
+        from zipfile import ZipFile
+
+        mock_get_stream.side_effect = self._requests_get_stream
+        uris_and_names = [
+            {"uri": "https://minio/a01.xml", "name": "a01.xml"},
+            {"uri": "https://minio/a01f1.jpg", "name": "a01f1.jpg"},
+            {"uri": "https://minio/a01f2.jpg", "name": "a01f2.jpg"},
+            {"uri": "a01f3.jpg", "name": "a01f3.jpg"},
+            {"uri": "https://minio/a01f4.jpg", "name": "a01f4.jpg"},
+            {"uri": "https://minio/other/a01f1.jpg", "name": "a01f1.jpg"},
+            {"uri": "https://minio/a01.pdf", "name": "a01.pdf"},
+        ]
+        with self.assertLogs("dsm.core.document_files", "ERROR") as logs:
+            result, failures = document_files._register_zip_files(
+                self.mock_files_storage, "folder", "a01.zip", uris_and_names)
+
+        self.assertEqual(
+            {"uri": "https://files_storage/folder/a01.zip", "name": "a01.zip"},
+            result)
+        self.assertEqual(
+            [
+                {"uri": "https://minio/a01f2.jpg", "name": "a01f2.jpg",
+                 "error": "HTTP status 404"},
+                {"uri": "https://minio/a01f4.jpg", "name": "a01f4.jpg",
+                 "error": "connection refused"},
+            ],
+            failures)
+        self.assertIn("https://minio/a01f2.jpg", logs.output[0])
+        self.assertIn("https://minio/a01f4.jpg", logs.output[1])
+        # os arquivos são obtidos um a um, somente os que vão para o zip
+        self.assertEqual(
+            [
+                "https://minio/a01.xml", "https://minio/a01f1.jpg",
+                "https://minio/a01f2.jpg", "https://minio/a01f4.jpg",
+                "https://minio/a01.pdf",
+            ],
+            [item.args[0] for item in mock_get_stream.call_args_list])
+        self.assertTrue(
+            all(response.closed for response in self.responses.values()))
+        with ZipFile(self.written) as zf:
+            self.assertEqual(
+                ["a01.xml", "a01f1.jpg", "a01.pdf"], zf.namelist())
+            self.assertEqual(b"https://minio/a01f1.jpg", zf.read("a01f1.jpg"))
+
+    @patch("dsm.core.document_files.reqs.requests_get_stream")
+    def test__register_zip_files_raises_error_if_content_is_incomplete(
+            self, mock_get_stream):
+        mock_get_stream.side_effect = self._requests_get_stream
+        uris_and_names = [
+            {"uri": "https://minio/a01.xml", "name": "a01.xml"},
+            {"uri": "https://minio/broken.pdf", "name": "a01.pdf"},
+        ]
+        with self.assertRaises(ConnectionError):
+            document_files._register_zip_files(
+                self.mock_files_storage, "folder", "a01.zip", uris_and_names)
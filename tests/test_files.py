@@ -117,3 +117,31 @@ class TestDownloadFilesAndCreateZipfile(TestCase):
             ],
             result
         )
+
+
+class TestWriteZipFile(TestCase):
+
+    def test_write_zip_file_writes_contents_in_unseekable_stream(self):
+        import io
+        import os
+        import threading
+
+        read_fd, write_fd = os.pipe()
+        result = []
+        reader = threading.Thread(
+            target=lambda: result.append(os.fdopen(read_fd, "rb").read()))
+        reader.start()
+        with os.fdopen(write_fd, "wb") as fp:
+            files.write_zip_file(
+                fp,
+                [
+                    ("a01.xml", [b"<article>", b"</article>"]),
+                    ("a01f1.jpg", iter([b"image"] * 3)),
+                ]
+            )
+        reader.join()
+
+        with ZipFile(io.BytesIO(result[0])) as zf:
+            self.assertEqual(["a01.xml", "a01f1.jpg"], zf.namelist())
+            self.assertEqual(b"<article></article>", zf.read("a01.xml"))
+            self.assertEqual(b"imageimageimage", zf.read("a01f1.jpg"))
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from dsm.extdeps.isis_migration import friendly_isis
+
+
+class TestFriendlyISISIssue(TestCase):
+
+    def test_isis_dates_are_v091_and_v093(self):
+        issue = friendly_isis.FriendlyISISIssue(
+            "0044-596720190003",
+            {"v091": [{"_": "20190801"}], "v093": [{"_": "20200115 1030"}]},
+        )
+        self.assertEqual("20190801", issue.isis_created_date)
+        self.assertEqual("20200115", issue.isis_updated_date)
+
+    def test_isis_dates_are_v091_if_v093_is_absent(self):
+        issue = friendly_isis.FriendlyISISIssue(
+            "0044-596720190003", {"v091": [{"_": "20190801"}]})
+        self.assertEqual("20190801", issue.isis_created_date)
+        self.assertEqual("20190801", issue.isis_updated_date)
+
+    def test_isis_dates_are_none_if_v091_and_v093_are_absent(self):
+        issue = friendly_isis.FriendlyISISIssue("0044-596720190003", {})
+        self.assertIsNone(issue.isis_created_date)
+        self.assertIsNone(issue.isis_updated_date)
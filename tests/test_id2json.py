@@ -1,5 +1,6 @@
 from unittest import TestCase
 from dsm.extdeps.isis_migration import id2json
+from tests import legacy
 
 
 class TestIsisIdToJson(TestCase):
@@ -37,3 +38,134 @@ class TestIsisIdToJson(TestCase):
         result = id2json._parse_field(data)
         self.assertEqual(expected[0], result[0])
         self.assertDictEqual(expected[1], result[1])
+
+
+class TestIdFileReader(TestCase):
+
+    def test_id_file_reader_returns_same_records_as_id_file_rows(self):
+        file_path = "./tests/fixtures/artigo.id"
+        expected = list(
+            id2json.join_id_file_rows_and_return_records(
+                id2json.get_id_file_rows(file_path))
+        )
+        result = list(id2json.IdFileReader(file_path))
+        self.assertEqual(expected, result)
+
+    def test_id_file_reader_offset_is_file_size_at_the_end(self):
+        file_path = "./tests/fixtures/artigo.id"
+        reader = id2json.IdFileReader(file_path)
+        list(reader)
+        with open(file_path, "rb") as fp:
+            self.assertEqual(len(fp.read()), reader.offset)
+
+    def test_id_file_reader_resumes_from_offset(self):
+        file_path = "./tests/fixtures/artigo.id"
+        reader = id2json.IdFileReader(file_path)
+        items = id2json.get_id_and_json_records(reader, id2json.article_id)
+        first_pid, first_records = next(items)
+        offset = reader.offset
+        expected = list(items)
+
+        resumed = id2json.IdFileReader(file_path, offset)
+        items = id2json.get_id_and_json_records(resumed, id2json.article_id)
+        self.assertEqual(expected, list(items))
+        self.assertNotEqual(first_pid, expected[0][0])
+
+
+class TestParseFieldContent(legacy.LegacyEquivalenceTestCase):
+
+    def test_parse_field_content_is_the_same_as_with_escapes(self):
+        items = (
+            "bla",
+            "bla^ssurname^nname^oxxx",
+            "^cAA970^lpt^tBiodiversidade e Conservação",
+            "^a^bvalue^a",
+            "^afirst^asecond",
+            "^a1^_x",
+            "^^a^",
+            "x^Xinvalid^avalue",
+            "^Xinvalid^avalue",
+            "^avalue^X^Y",
+            "a\\^b^cd",
+            "^0zero",
+            "",
+        )
+        self.assertSameAsLegacy(
+            id2json._parse_field_content_with_escapes,
+            id2json._parse_field_content,
+            lambda: [(item, ) for item in items],
+        )
+
+    def test_parse_record_is_the_same_as_legacy_parser(self):
+        self.assertSameAsLegacy(
+            legacy.parse_record,
+            id2json._parse_record,
+            lambda: [
+                (record, )
+                for record in id2json.IdFileReader(
+                    "./tests/fixtures/artigo.id")
+            ],
+        )
+
+    def test_parse_record_is_the_same_as_legacy_parser_for_odd_rows(self):
+        record = "\n".join([
+            "!v010!^sSilva\x85^nJoão",
+            "!v011",
+            "!!empty tag",
+            "!v012!title!with!exclamation^len",
+            "!v013!",
+        ])
+        self.assertSameAsLegacy(
+            legacy.parse_record,
+            id2json._parse_record,
+            lambda: [(record, )],
+        )
+
+
+class TestChunkedIdFileReader(TestCase):
+
+    def test_chunked_reader_returns_same_records_as_id_file_reader(self):
+        file_path = "./tests/fixtures/artigo.id"
+        expected = list(
+            id2json.parse_id_records(id2json.IdFileReader(file_path)))
+        reader = id2json.ChunkedIdFileReader(
+            file_path, workers=2, chunk_size=4096)
+        self.assertEqual(expected, list(reader))
+        with open(file_path, "rb") as fp:
+            self.assertEqual(len(fp.read()), reader.offset)
+
+    def test_chunked_reader_resumes_from_offset(self):
+        file_path = "./tests/fixtures/artigo.id"
+        reader = id2json.IdFileReader(file_path)
+        items = id2json.get_id_and_json_records(reader, id2json.article_id)
+        next(items)
+        next(items)
+        offset = reader.offset
+        expected = list(items)
+
+        resumed = id2json.ChunkedIdFileReader(
+            file_path, offset, workers=2, chunk_size=4096)
+        items = id2json.group_json_records_by_id(resumed, id2json.article_id)
+        self.assertEqual(expected, list(items))
+
+
+class TestGetJsonRecords(TestCase):
+
+    def setUp(self):
+        self.file_path = "./tests/fixtures/artigo.id"
+        self.expected = dict(
+            id2json.get_json_records(self.file_path, id2json.article_id))
+
+    def test_get_json_records_grouped_returns_same_records(self):
+        result = list(id2json.get_json_records(
+            self.file_path, id2json.article_id, grouped=True))
+        self.assertEqual(list(self.expected.items()), result)
+
+    def test_get_json_records_spilled_to_disk_returns_same_records(self):
+        result = list(id2json.get_json_records(
+            self.file_path, id2json.article_id, memory_budget=1024))
+        self.assertEqual(self.expected, dict(result))
+        self.assertEqual(len(self.expected), len(result))
+        ids = [_id for _id, records in result]
+        self.assertEqual(
+            ids, sorted(ids, key=lambda _id: (_id is not None, _id or "")))
@@ -0,0 +1,106 @@
+import threading
+from unittest import TestCase, mock
+
+from dsm import configuration
+from dsm.core.document import DocsManager
+
+# `dsm.ingress` cria DocsManager, conectado com MongoDB e MinIO,
+# ao ser importado
+with mock.patch.object(configuration, "get_files_storage"), \
+        mock.patch.object(configuration, "get_db_url"), \
+        mock.patch.object(configuration, "get_pid_manager"), \
+        mock.patch.object(DocsManager, "db_connect"):
+    from dsm import ingress
+
+
+class FakeDocsManager:
+
+    def __init__(self, files_storage, db_url, v3_manager):
+        self.files_storage = files_storage
+        self.v3_manager = v3_manager
+        self.registered = []
+
+    def register_document(self, doc_pkg, pid_v2, old_filename, issue_id,
+                          build_package=False):
+        self.registered.append((threading.get_ident(), doc_pkg.name))
+        if doc_pkg.name == "a02":
+            raise ValueError("invalid XML")
+        return f"id-{doc_pkg.name}"
+
+
+class TestUploadPackage(TestCase):
+
+    def setUp(self):
+        self.doc_packages = {}
+        for name in ("a01", "a02", "a03", "a04"):
+            self.doc_packages[name] = mock.Mock()
+            self.doc_packages[name].name = name
+        self.docs_manager = mock.patch.object(ingress, "_docs_manager").start()
+        self.docs_manager.get_doc_packages.return_value = self.doc_packages
+        self.managers = []
+        mock.patch.object(
+            ingress, "DocsManager", side_effect=self._create_manager).start()
+        mock.patch.object(
+            configuration, "get_files_storage",
+            side_effect=lambda: mock.Mock()).start()
+        mock.patch.object(
+            configuration, "get_pid_manager",
+            side_effect=lambda: mock.Mock()).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def _create_manager(self, *args):
+        manager = FakeDocsManager(*args)
+        self.managers.append(manager)
+        return manager
+
+    def _assert_results(self, results):
+        self.assertEqual(
+            [
+                {"name": "a01", "id": "id-a01"},
+                {"name": "a03", "id": "id-a03"},
+                {"name": "a04", "id": "id-a04"},
+            ],
+            results["docs"]
+        )
+        self.assertEqual(["invalid XML"], results["errors"])
+        for doc_pkg in self.doc_packages.values():
+            doc_pkg.close.assert_called_once_with()
+
+    def test_each_worker_registers_documents_with_its_own_manager(self):
+        results = ingress.upload_package("pkg.zip", workers=3)
+        self._assert_results(results)
+        self.docs_manager.register_document.assert_not_called()
+        self.assertIn(len(self.managers), (1, 2, 3))
+        self.assertEqual(
+            ["a01", "a02", "a03", "a04"],
+            sorted(
+                name
+                for manager in self.managers
+                for thread_id, name in manager.registered
+            )
+        )
+        for manager in self.managers:
+            # cada manager é usado somente pela thread que o criou
+            self.assertLessEqual(
+                len({thread_id for thread_id, name in manager.registered}),
+                1)
+        self.assertEqual(
+            len(self.managers),
+            len({id(manager.files_storage) for manager in self.managers}))
+        self.assertEqual(
+            len(self.managers),
+            len({id(manager.v3_manager) for manager in self.managers}))
+
+    def test_documents_are_registered_with_module_manager_without_workers(
+            self):
+        manager = FakeDocsManager(None, None, None)
+        self.docs_manager.register_document.side_effect = (
+            manager.register_document)
+        results = ingress.upload_package("pkg.zip", workers=1)
+        self._assert_results(results)
+        self.assertEqual([], self.managers)
+        self.assertEqual(
+            ["a01", "a02", "a03", "a04"],
+            [name for thread_id, name in manager.registered])
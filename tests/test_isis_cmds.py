@@ -0,0 +1,127 @@
+import os
+import sys
+import tempfile
+import time
+from unittest import TestCase, mock
+
+from dsm.extdeps.isis_migration import isis_cmds
+from dsm import exceptions
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+class TestRunCisisCommand(TestCase):
+
+    def test_run_cisis_command_returns_stdout(self):
+        result = isis_cmds.run_cisis_command(_python("print('ok')"))
+        self.assertEqual(b"ok", result.strip())
+
+    def test_run_cisis_command_raises_error_if_exit_code_is_not_zero(self):
+        with self.assertRaises(exceptions.CisisCommandError) as exc:
+            isis_cmds.run_cisis_command(
+                _python("import sys; sys.stderr.write('bad'); sys.exit(3)"))
+        self.assertIn("returned 3: bad", str(exc.exception))
+
+    def test_run_cisis_command_raises_error_if_timeout_expires(self):
+        with self.assertRaises(exceptions.CisisCommandError) as exc:
+            isis_cmds.run_cisis_command(
+                _python("import time; time.sleep(10)"), timeout=0.5)
+        self.assertIn("Timeout", str(exc.exception))
+
+
+class TestStreamCisisCommand(TestCase):
+
+    def test_stream_cisis_command_returns_rows(self):
+        result = list(isis_cmds.stream_cisis_command(
+            _python("for i in range(3): print(i)")))
+        self.assertEqual(["0\n", "1\n", "2\n"], result)
+
+    def test_stream_cisis_command_raises_error_after_rows(self):
+        rows = isis_cmds.stream_cisis_command(
+            _python("print('a'); raise SystemExit(2)"))
+        self.assertEqual("a\n", next(rows))
+        with self.assertRaises(exceptions.CisisCommandError):
+            next(rows)
+
+    def test_stream_cisis_command_raises_error_if_timeout_expires(self):
+        rows = isis_cmds.stream_cisis_command(
+            _python("import time; print('a', flush=True); time.sleep(10)"),
+            timeout=0.5)
+        with self.assertRaises(exceptions.CisisCommandError) as exc:
+            list(rows)
+        self.assertIn("Timeout", str(exc.exception))
+
+    def test_stream_cisis_command_does_not_count_time_spent_by_consumer(self):
+        rows = isis_cmds.stream_cisis_command(
+            _python("for i in range(3): print(i)"), timeout=2)
+        result = []
+        for row in rows:
+            # o processamento das linhas é mais demorado que `timeout`
+            time.sleep(1)
+            result.append(row)
+        self.assertEqual(["0\n", "1\n", "2\n"], result)
+
+
+# `i2id` que termina somente quando todas as `total` execuções foram
+# iniciadas, ou seja, se são simultâneas
+_I2ID = """#!{python}
+import os, sys, time
+db_file_path = sys.argv[1]
+open(db_file_path + ".started", "w").close()
+started = time.monotonic()
+while len([n for n in os.listdir(os.path.dirname(db_file_path))
+           if n.endswith(".started")]) < {total}:
+    if time.monotonic() - started > 10:
+        sys.exit("not concurrent")
+    time.sleep(0.05)
+print("!ID 0000001")
+print("!v001!" + os.path.basename(db_file_path))
+"""
+
+
+class TestCreateIdFiles(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cisis_path = os.path.join(self.tmpdir.name, "cisis")
+        self.bases_path = os.path.join(self.tmpdir.name, "bases")
+        os.makedirs(self.cisis_path)
+        os.makedirs(self.bases_path)
+        self.names = ("title", "issue", "acron")
+        for name in self.names:
+            open(os.path.join(self.bases_path, f"{name}.mst"), "w").close()
+        i2id = os.path.join(self.cisis_path, "i2id")
+        with open(i2id, "w") as fp:
+            fp.write(_I2ID.format(python=sys.executable, total=len(self.names)))
+        os.chmod(i2id, 0o755)
+        self.patch = mock.patch.object(
+            isis_cmds.configuration, "CISIS_PATH", self.cisis_path)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmpdir.cleanup()
+
+    def test_create_id_files_runs_i2id_concurrently(self):
+        id_folder = os.path.join(self.tmpdir.name, "id")
+        result = isis_cmds.create_id_files(
+            [
+                (os.path.join(self.bases_path, name),
+                 os.path.join(id_folder, f"{name}.id"))
+                for name in self.names
+            ],
+            max_workers=len(self.names),
+        )
+        self.assertEqual(
+            [os.path.join(id_folder, f"{name}.id") for name in self.names],
+            result)
+        for name, id_file_path in zip(self.names, result):
+            with open(id_file_path) as fp:
+                self.assertEqual(f"!ID 0000001\n!v001!{name}\n", fp.read())
+
+    def test_create_id_files_raises_error_if_a_database_does_not_exist(self):
+        with self.assertRaises(exceptions.IsisDBNotFoundError):
+            isis_cmds.create_id_files(
+                [(os.path.join(self.bases_path, "missing"), None)])
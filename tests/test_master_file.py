@@ -0,0 +1,161 @@
+import os
+import struct
+import tempfile
+from unittest import TestCase
+
+from dsm.extdeps.isis_migration import id2json, master_file
+from dsm import exceptions
+
+
+ID_FILE_PATH = "./tests/fixtures/artigo.id"
+
+
+def _read_id_file_fields(id_file_path):
+    records = []
+    for record_content in id2json.IdFileReader(id_file_path):
+        fields = []
+        for row in record_content.splitlines():
+            tag, content = row[1:].split("!", 1)
+            fields.append((int(tag[1:]), content))
+        records.append(fields)
+    return records
+
+
+def _write_isis_db(db_file_path, records, leader, deleted=()):
+    """
+    Cria `.mst` e `.xrf` com `records` (lista de [(tag, content)])
+    """
+    mst = bytearray(64)
+    pointers = []
+    for mfn, fields in enumerate(records, 1):
+        position = len(mst)
+        directory = b""
+        data = b""
+        for tag, content in fields:
+            value = content.encode("iso-8859-1")
+            directory += struct.pack("<HHH", tag, len(data), len(value))
+            data += value
+        base = leader.size + len(directory)
+        status = 1 if mfn in deleted else 0
+        mst += leader.pack(
+            mfn, base + len(data), 0, 0, base, len(fields), status)
+        mst += directory + data
+        block, offset = divmod(position, 512)
+        pointers.append((block + 1) * 2048 + offset)
+    struct.pack_into("<iiiHH", mst, 0, 0, len(records) + 1, 0, 0, 0)
+
+    xrf = b""
+    for i in range(0, len(pointers), 127):
+        block = pointers[i:i + 127]
+        block += [0] * (127 - len(block))
+        xrf += struct.pack("<i127i", i // 127 + 1, *block)
+    with open(db_file_path + ".mst", "wb") as fp:
+        fp.write(mst)
+    with open(db_file_path + ".xrf", "wb") as fp:
+        fp.write(xrf)
+
+
+class TestMasterFile(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_file_path = os.path.join(self.tmpdir.name, "artigo")
+        self.expected = list(
+            id2json.parse_id_records(id2json.IdFileReader(ID_FILE_PATH)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, leader=master_file._LEADERS[0], deleted=()):
+        _write_isis_db(
+            self.db_file_path, _read_id_file_fields(ID_FILE_PATH),
+            leader, deleted)
+
+    def test_records_are_the_same_as_id_file_records(self):
+        self._write()
+        result = list(master_file.MasterFileReader(self.db_file_path))
+        self.assertEqual(self.expected, result)
+
+    def test_records_of_packed_leader_are_the_same_as_id_file_records(self):
+        self._write(leader=master_file._LEADERS[1])
+        result = list(master_file.MasterFileReader(self.db_file_path))
+        self.assertEqual(self.expected, result)
+
+    def test_get_record_returns_record_of_mfn(self):
+        self._write()
+        with master_file.MasterFile(self.db_file_path) as mf:
+            self.assertEqual(self.expected[2], mf.get_record(3))
+            self.assertEqual(self.expected[0], mf.get_record(1))
+            self.assertIsNone(mf.get_record(mf.next_mfn))
+
+    def test_deleted_records_are_skipped(self):
+        self._write(deleted=(2, ))
+        with master_file.MasterFile(self.db_file_path) as mf:
+            self.assertIsNone(mf.get_record(2))
+            result = list(mf.records())
+        self.assertEqual(
+            [1] + list(range(3, len(self.expected) + 1)),
+            [mfn for mfn, record in result])
+
+    def test_reader_resumes_from_offset(self):
+        self._write()
+        reader = master_file.MasterFileReader(self.db_file_path)
+        items = id2json.group_json_records_by_id(reader, id2json.article_id)
+        first_pid, first_records = next(items)
+        offset = reader.offset
+        expected = list(items)
+        self.assertEqual(len(self.expected) + 1, reader.offset)
+
+        resumed = master_file.MasterFileReader(self.db_file_path, offset)
+        items = id2json.group_json_records_by_id(resumed, id2json.article_id)
+        self.assertEqual(expected, list(items))
+
+    def test_master_file_raises_error_if_db_does_not_exist(self):
+        with self.assertRaises(exceptions.IsisDBNotFoundError):
+            master_file.MasterFile(self.db_file_path)
+
+
+class TestMasterFileFixture(TestCase):
+    """
+    `tests/fixtures/isis/artigo` contém os 12 primeiros registros de
+    `artigo.id`, montados byte a byte segundo o formato CISIS, e não com as
+    estruturas de `master_file`:
+
+    - líder alinhado (20 bytes), que nunca é dividido entre blocos
+      (MFN 5 inicia no bloco 17) e registros de tamanho par
+    - ponteiros do `.xrf` com as flags de registro novo (512) e
+      alterado (1024) e número do último bloco negativo
+    - MFN 2 alterado: o `.xrf` aponta para a versão atual, cujo líder
+      aponta (mfbwb, mfbwp) para a versão anterior, com 2 campos
+    - MFN 4 apagado: ponteiro negativo e status 1
+    """
+
+    DB_FILE_PATH = "./tests/fixtures/isis/artigo"
+
+    def setUp(self):
+        self.expected = list(
+            id2json.parse_id_records(id2json.IdFileReader(ID_FILE_PATH)))[:12]
+
+    def test_records_are_the_same_as_id_file_records(self):
+        expected = self.expected[:3] + self.expected[4:]
+        result = list(master_file.MasterFileReader(self.DB_FILE_PATH))
+        self.assertEqual(expected, result)
+
+    def test_next_mfn_is_read_from_control_record(self):
+        with master_file.MasterFile(self.DB_FILE_PATH) as mf:
+            self.assertEqual(13, mf.next_mfn)
+
+    def test_position_is_read_from_xrf_pointer_with_flags(self):
+        with master_file.MasterFile(self.DB_FILE_PATH) as mf:
+            # ponteiro 35328 = bloco 17 * 2048 + flag 512 + deslocamento 0
+            self.assertEqual(16 * 512, mf._get_position(5))
+            # ponteiro 7168 = bloco 3 * 2048 + flag 1024 + deslocamento 0
+            self.assertEqual(2 * 512, mf._get_position(2))
+
+    def test_get_record_returns_current_version_of_updated_record(self):
+        with master_file.MasterFile(self.DB_FILE_PATH) as mf:
+            self.assertEqual(self.expected[1], mf.get_record(2))
+
+    def test_get_record_returns_none_for_deleted_record(self):
+        with master_file.MasterFile(self.DB_FILE_PATH) as mf:
+            self.assertIsNone(mf.get_record(4))
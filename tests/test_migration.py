@@ -0,0 +1,209 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from dsm.extdeps.isis_migration import migration_manager
+
+# `dsm.migration` cria `MigrationManager`, conectado com MongoDB e MinIO,
+# ao ser importado
+with mock.patch.object(migration_manager, "MigrationManager"):
+    from dsm import migration
+
+
+def _get_saved(_id, isis_updated_date):
+    record_data = SimpleNamespace(
+        _id=_id,
+        created=datetime(2021, 1, 1),
+        updated=datetime(2021, 1, 1),
+        isis_created_date="20190801",
+        isis_updated_date=isis_updated_date,
+    )
+    return record_data, None
+
+
+class TestMigrateItem(TestCase):
+
+    def setUp(self):
+        self.is_up_to_date = mock.Mock()
+        self.register = mock.Mock(
+            side_effect=lambda pid, isis_data: _get_saved(pid, "20190807"))
+        self.publish = mock.Mock(return_value=None)
+        parameters = dict(
+            custom_id_function=None,
+            is_up_to_date=self.is_up_to_date,
+            operations_sequence=[
+                dict(name="REGISTER_ISIS", result="REGISTERED_ISIS_DOCUMENT",
+                     action=self.register),
+                dict(name="PUBLISH", result="PUBLISHED_DOCUMENT",
+                     action=self.publish),
+            ]
+        )
+        self.patch = mock.patch.dict(
+            migration._MIGRATION_PARAMETERS, {"artigo": parameters})
+        self.patch.start()
+        self.records = [{"v706": [{"_": "o"}]}, {"v706": [{"_": "h"}]}]
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_unchanged_item_is_skipped(self):
+        self.is_up_to_date.return_value = True
+        result = migration._migrate_item(
+            "S0044-59672019000300242", self.records, "artigo",
+            incremental=True)
+        self.assertEqual(
+            {
+                "pid": "S0044-59672019000300242",
+                "events": [{
+                    "event_name": "CHECK_ISIS_UPDATED_DATE",
+                    "event_result": "SKIPPED_UNCHANGED",
+                }],
+            },
+            result
+        )
+        self.is_up_to_date.assert_called_once_with(
+            "S0044-59672019000300242", self.records)
+        self.register.assert_not_called()
+        self.publish.assert_not_called()
+
+    def test_changed_or_pending_migration_item_is_migrated(self):
+        # `is_isis_document_up_to_date` retorna False para os documentos
+        # alterados e para os documentos "pending_migration"
+        self.is_up_to_date.return_value = False
+        result = migration._migrate_item(
+            "S0044-59672019000300242", self.records, "artigo",
+            incremental=True)
+        self.assertEqual(
+            ["REGISTERED_ISIS_DOCUMENT", "PUBLISHED_DOCUMENT"],
+            [event["event_result"] for event in result["events"]]
+        )
+        self.assertEqual("20190807", result["events"][0]["isis_updated"])
+        self.register.assert_called_once_with(
+            "S0044-59672019000300242", self.records)
+        self.publish.assert_called_once_with("S0044-59672019000300242")
+
+    def test_item_is_migrated_without_check_if_not_incremental(self):
+        result = migration._migrate_item(
+            "S0044-59672019000300242", self.records, "artigo")
+        self.assertEqual(2, len(result["events"]))
+        self.is_up_to_date.assert_not_called()
+        self.register.assert_called_once()
+
+
+class TestMigrateIsisRecordsCaches(TestCase):
+
+    @mock.patch.object(migration, "_migrate_item")
+    @mock.patch.object(migration, "_migration_manager")
+    def test_caches_are_cleared_before_each_run(
+            self, mock_manager, mock_migrate_item):
+        calls = []
+        mock_manager.clear_caches.side_effect = (
+            lambda: calls.append("clear_caches"))
+        mock_migrate_item.side_effect = (
+            lambda pid, records, db_type, incremental: calls.append(
+                "migrate_item"))
+        records = [{"v880": [{"_": "S0044-59672019000300001"}]}]
+        for i in range(2):
+            list(migration._migrate_isis_records(records, "artigo"))
+        self.assertEqual(
+            [
+                "clear_caches", "migrate_item",
+                "clear_caches", "migrate_item",
+            ],
+            calls
+        )
+
+
+class TestIdentifyDocumentsToMigrate(TestCase):
+
+    @mock.patch.object(migration.db, "register_isis_documents_pending_migration")
+    @mock.patch.object(migration, "get_document_pids_to_migrate")
+    def test_registers_documents_in_batches(self, mock_get_pids, mock_register):
+        docs = [
+            {"pid": f"S0044-596720190003{i:05}", "updated": "20190807"}
+            for i in range(5)
+        ]
+        mock_get_pids.return_value = iter(docs)
+        # somente parte dos documentos de cada lote foi alterada
+        mock_register.side_effect = [1, 2, 0]
+
+        result = list(migration.identify_documents_to_migrate(
+            "20190801", "20190831", batch_size=2))
+
+        mock_get_pids.assert_called_once_with("20190801", "20190831")
+        self.assertEqual(
+            [
+                mock.call({d["pid"]: d["updated"] for d in docs[0:2]}),
+                mock.call({d["pid"]: d["updated"] for d in docs[2:4]}),
+                mock.call({d["pid"]: d["updated"] for d in docs[4:5]}),
+            ],
+            mock_register.call_args_list
+        )
+        self.assertEqual(
+            [(2, 1), (4, 3), (5, 3)],
+            [(item["identified"], item["registered"]) for item in result]
+        )
+
+
+class TestMigrateAcron(TestCase):
+
+    def setUp(self):
+        for name, value in (
+                ("check_migration_sources", None),
+                ("get_bases_title_path", "/bases/title/title"),
+                ("get_bases_issue_path", "/bases/issue/issue"),
+                ("get_bases_acron", "/bases-work/abc/abc")):
+            mock.patch.object(
+                migration.configuration, name, return_value=value).start()
+        self.create_id_files = mock.patch.object(
+            migration, "create_id_files",
+            side_effect=lambda paths, max_workers: [
+                id_file_path for db_path, id_file_path in paths]).start()
+        mock.patch.object(migration, "size", return_value=0).start()
+        self.migrate_isis_db = mock.patch.object(
+            migration, "migrate_isis_db",
+            side_effect=lambda db_type, source_file_path, **kwargs: iter(
+                [{"pid": db_type}])).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_id_files_of_title_issue_and_acron_are_created_concurrently(self):
+        result = list(migration.migrate_acron(
+            "abc", "/id", workers=2, incremental=True, title_and_issue=True))
+        self.create_id_files.assert_called_once_with(
+            [
+                ("/bases/title/title", "/id/title.id"),
+                ("/bases/issue/issue", "/id/issue.id"),
+                ("/bases-work/abc/abc", "/id/abc.id"),
+            ],
+            max_workers=3,
+        )
+        self.assertEqual(
+            [
+                mock.call("title", "/id/title.id",
+                          workers=None, incremental=True),
+                mock.call("issue", "/id/issue.id",
+                          workers=None, incremental=True),
+                mock.call("artigo", "/id/abc.id",
+                          workers=2, incremental=True),
+            ],
+            self.migrate_isis_db.call_args_list
+        )
+        self.assertEqual(
+            ["title", "issue", "artigo"], [item["pid"] for item in result])
+
+    def test_only_acron_is_migrated_by_default(self):
+        result = list(migration.migrate_acron("abc", "/id", workers=2))
+        self.create_id_files.assert_called_once_with(
+            [("/bases-work/abc/abc", "/id/abc.id")], max_workers=1)
+        self.migrate_isis_db.assert_called_once_with(
+            "artigo", "/id/abc.id", workers=2, incremental=False)
+        self.assertEqual(["artigo"], [item["pid"] for item in result])
+
+    def test_isis_databases_are_migrated_without_id_folder(self):
+        list(migration.migrate_acron("abc", title_and_issue=True))
+        self.create_id_files.assert_not_called()
+        self.assertEqual(
+            ["/bases/title/title", "/bases/issue/issue", "/bases-work/abc/abc"],
+            [call[0][1] for call in self.migrate_isis_db.call_args_list])
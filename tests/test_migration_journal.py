@@ -0,0 +1,258 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from dsm.extdeps import db
+from dsm.extdeps.isis_migration import id2json, master_file, migration_journal
+from tests.test_master_file import (
+    ID_FILE_PATH,
+    _read_id_file_fields,
+    _write_isis_db,
+)
+
+
+def _get_pids(json_records):
+    return [
+        pid
+        for pid, records in id2json.group_json_records_by_id(
+            json_records, id2json.article_id)
+    ]
+
+
+class TestMigrationJournal(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_file_path = os.path.join(self.tmpdir.name, "artigo")
+        _write_isis_db(
+            self.db_file_path, _read_id_file_fields(ID_FILE_PATH),
+            master_file._LEADERS[0])
+        self.expected = _get_pids(
+            id2json.parse_id_records(id2json.IdFileReader(ID_FILE_PATH)))
+
+        self.runs = {}
+        self.patches = [
+            mock.patch.object(
+                db, "create_isis_migration_run",
+                side_effect=lambda: SimpleNamespace(last_pid=None)),
+            mock.patch.object(db, "save_data", side_effect=self._save),
+            mock.patch.object(
+                db, "fetch_isis_migration_run", side_effect=self.runs.get),
+            mock.patch.object(
+                migration_journal.configuration,
+                "ISIS_RECORDS_CACHE_PATH", None),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmpdir.cleanup()
+
+    def _save(self, run):
+        self.runs[run._id] = SimpleNamespace(**vars(run))
+        return run
+
+    def _migrate(self, journal, count=None):
+        """
+        Migra `count` itens ou todos, registrando a conclusão de cada um
+        """
+        pids = []
+        items = journal.track(
+            id2json.group_json_records_by_id(
+                journal.json_records, id2json.article_id))
+        for pid, records in items:
+            pids.append(pid)
+            journal.register()
+            if len(pids) == count:
+                break
+        else:
+            journal.finish()
+        return pids
+
+    def _assert_resumes(self, source_file_path, workers=None,
+                        get_id_function=None):
+        journal = migration_journal.MigrationJournal.start(
+            source_file_path, "artigo", workers, get_id_function)
+        migrated = self._migrate(journal, 5)
+        self.assertEqual("running", self.runs[journal.run_id].status)
+        self.assertEqual(migrated[-1], self.runs[journal.run_id].last_pid)
+
+        journal = migration_journal.MigrationJournal.resume(
+            journal.run_id, "artigo", workers, get_id_function)
+        migrated += self._migrate(journal)
+        self.assertEqual(self.expected, migrated)
+        self.assertEqual("finished", self.runs[journal.run_id].status)
+
+    def test_resumes_id_file_at_offset(self):
+        self._assert_resumes(ID_FILE_PATH)
+
+    @mock.patch.object(migration_journal.os, "cpu_count", return_value=2)
+    def test_resumes_id_file_parsed_in_chunks_at_offset(self, mock_cpu_count):
+        self._assert_resumes(ID_FILE_PATH, workers=2)
+
+    def test_resumes_isis_db_at_offset(self):
+        self._assert_resumes(self.db_file_path)
+
+    def test_resumes_records_cache_at_offset(self):
+        with mock.patch.object(
+                migration_journal.configuration, "ISIS_RECORDS_CACHE_PATH",
+                os.path.join(self.tmpdir.name, "cache")):
+            self._assert_resumes(
+                self.db_file_path, get_id_function=id2json.article_id)
+
+    def test_resume_skips_last_pid(self):
+        journal = migration_journal.MigrationJournal.start(
+            ID_FILE_PATH, "artigo")
+        run = self.runs[journal.run_id]
+        run.last_pid = self.expected[0]
+
+        journal = migration_journal.MigrationJournal.resume(
+            journal.run_id, "artigo")
+        self.assertEqual(self.expected[1:], self._migrate(journal))
+
+    def test_start_logs_run_id(self):
+        with self.assertLogs(migration_journal.logger, "INFO") as logs:
+            journal = migration_journal.MigrationJournal.start(
+                ID_FILE_PATH, "artigo")
+        self.assertIn(journal.run_id, logs.output[0])
+
+    def test_resume_raises_value_error_if_run_does_not_exist(self):
+        with self.assertRaises(ValueError):
+            migration_journal.MigrationJournal.resume("xxx", "artigo")
+
+    def test_resume_raises_value_error_if_db_type_is_different(self):
+        journal = migration_journal.MigrationJournal.start(
+            ID_FILE_PATH, "artigo")
+        with self.assertRaises(ValueError):
+            migration_journal.MigrationJournal.resume(journal.run_id, "title")
+
+
+class TestGetSourceReader(TestCase):
+
+    @mock.patch.object(migration_journal.os, "cpu_count", return_value=4)
+    def test_id_file_is_parsed_in_chunks_by_workers(self, mock_cpu_count):
+        reader, json_records = migration_journal.get_source_reader(
+            ID_FILE_PATH, workers=2)
+        self.assertIsInstance(reader, id2json.ChunkedIdFileReader)
+
+    @mock.patch.object(migration_journal.os, "cpu_count", return_value=1)
+    def test_id_file_is_read_serially_if_there_is_one_cpu(
+            self, mock_cpu_count):
+        reader, json_records = migration_journal.get_source_reader(
+            ID_FILE_PATH, workers=2)
+        self.assertIsInstance(reader, id2json.IdFileReader)
+
+    def test_id_file_is_read_serially_without_workers(self):
+        reader, json_records = migration_journal.get_source_reader(
+            ID_FILE_PATH)
+        self.assertIsInstance(reader, id2json.IdFileReader)
+
+
+class FakeBulkWriter:
+
+    def __init__(self, size=2, errors=None):
+        self.size = size
+        self.errors = errors or {}
+        self.active = None
+        self.pending = []
+        self.written = []
+
+    def activate(self, item=None):
+        writer = self
+
+        class _Active:
+            def __enter__(self):
+                writer.active = item
+
+            def __exit__(self, *args):
+                writer.active = None
+        return _Active()
+
+    def should_flush(self):
+        return len(self.pending) >= self.size
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        self.written.append(pending)
+        return [
+            {"pid": pid, "error": self.errors[pid]}
+            for pid in pending
+            if pid in self.errors
+        ]
+
+
+class TestWriteInBulk(TestCase):
+
+    def setUp(self):
+        self.journal = mock.Mock()
+        self.items = [(f"pid{i}", []) for i in range(5)]
+
+    def _migrate_item(self, writer):
+        def migrate_item(pid, records):
+            # registros gravados somente com `writer` ativo
+            assert writer.active == pid
+            writer.pending.append(pid)
+            return {"pid": pid, "events": []}
+        return migrate_item
+
+    def test_results_are_returned_after_their_batch_is_written(self):
+        writer = FakeBulkWriter()
+        results = migration_journal.write_in_bulk(
+            iter(self.items), self._migrate_item(writer), writer,
+            self.journal)
+        self.assertEqual("pid0", next(results)["pid"])
+        self.assertEqual([["pid0", "pid1"]], writer.written)
+        self.assertEqual(
+            ["pid1", "pid2", "pid3", "pid4"],
+            [item["pid"] for item in results])
+        self.assertEqual(
+            [["pid0", "pid1"], ["pid2", "pid3"], ["pid4"]], writer.written)
+        self.assertEqual(
+            [mock.call(2), mock.call(2), mock.call(1)],
+            self.journal.register.call_args_list)
+        self.journal.finish.assert_called_once_with()
+
+    def test_write_errors_are_added_to_item_result(self):
+        writer = FakeBulkWriter(errors={"pid3": "isis_issue pid3: dup"})
+        results = list(migration_journal.write_in_bulk(
+            iter(self.items), self._migrate_item(writer), writer))
+        self.assertEqual(
+            [[], [], [], ["isis_issue pid3: dup"], []],
+            [
+                [event["error"] for event in item["events"]]
+                for item in results
+            ]
+        )
+        self.assertEqual("WRITE", results[3]["events"][0]["op"])
+
+    def test_journal_is_not_advanced_after_first_failed_item(self):
+        writer = FakeBulkWriter(errors={"pid3": "isis_issue pid3: dup"})
+        results = list(migration_journal.write_in_bulk(
+            iter(self.items), self._migrate_item(writer), writer,
+            self.journal))
+        self.assertEqual(5, len(results))
+        # pid0 e pid1; pid2, anterior a pid3
+        self.assertEqual(
+            [mock.call(2), mock.call(1)],
+            self.journal.register.call_args_list)
+        self.journal.finish.assert_not_called()
+
+    def test_migrated_items_are_written_if_migration_fails(self):
+        writer = FakeBulkWriter(size=3)
+        migrate_item = self._migrate_item(writer)
+
+        def failing_migrate_item(pid, records):
+            if pid == "pid1":
+                raise ValueError("unexpected")
+            return migrate_item(pid, records)
+
+        results = migration_journal.write_in_bulk(
+            iter(self.items), failing_migrate_item, writer, self.journal)
+        with self.assertRaises(ValueError):
+            next(results)
+        self.assertEqual([["pid0"]], writer.written)
+        self.journal.register.assert_called_once_with(1)
+        self.assertIsNone(writer.active)
@@ -0,0 +1,428 @@
+import threading
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from dsm.extdeps import db
+from dsm.extdeps.isis_migration import migration_manager
+
+
+def _get_manager():
+    # sem conexões com MongoDB e MinIO
+    return migration_manager.MigrationManager.__new__(
+        migration_manager.MigrationManager)
+
+
+class TestIsISISDocumentUpToDate(TestCase):
+
+    def setUp(self):
+        self.records = [
+            {"v091": [{"_": "20190801"}], "v093": [{"_": "20190807"}]},
+            {"v706": [{"_": "h"}]},
+        ]
+
+    def _is_up_to_date(self, registered):
+        with mock.patch.object(
+                db, "fetch_isis_document_migration_status",
+                return_value=registered) as fetch:
+            result = _get_manager().is_isis_document_up_to_date(
+                "S0044-59672019000300242", self.records)
+        return result, fetch
+
+    def test_published_document_with_same_date_is_up_to_date(self):
+        for status in ("published_complete", "published_incomplete"):
+            with self.subTest(status):
+                result, fetch = self._is_up_to_date(
+                    SimpleNamespace(
+                        isis_updated_date="20190807", status=status))
+                self.assertTrue(result)
+                fetch.assert_called_once_with("S0044-59672019000300242")
+
+    def test_document_with_another_date_is_not_up_to_date(self):
+        result, fetch = self._is_up_to_date(
+            SimpleNamespace(
+                isis_updated_date="20190801", status="published_complete"))
+        self.assertFalse(result)
+
+    def test_pending_migration_document_is_not_up_to_date(self):
+        result, fetch = self._is_up_to_date(
+            SimpleNamespace(
+                isis_updated_date="20190807", status="pending_migration"))
+        self.assertFalse(result)
+
+    def test_not_registered_document_is_not_up_to_date(self):
+        result, fetch = self._is_up_to_date(None)
+        self.assertFalse(result)
+
+    def test_document_without_dates_is_not_up_to_date(self):
+        self.records[0] = {}
+        result, fetch = self._is_up_to_date(None)
+        self.assertFalse(result)
+        fetch.assert_not_called()
+
+
+class TestIsISISJournalAndIssueUpToDate(TestCase):
+
+    def _assert_up_to_date(self, fetch_name, is_up_to_date, _id, record):
+        for registered_date, status, expected in (
+                ("20151103", "published_complete", True),
+                ("20040817", "published_complete", False),
+                (None, "published_complete", False),
+                # registrado, mas a publicação falhou
+                ("20151103", "isis_metadata_migrated", False),
+                # registrado antes do registro de `status`
+                ("20151103", None, False)):
+            with self.subTest(registered_date=registered_date, status=status):
+                with mock.patch.object(
+                        db, fetch_name,
+                        return_value=SimpleNamespace(
+                            isis_updated_date=registered_date,
+                            status=status)):
+                    self.assertEqual(
+                        expected,
+                        is_up_to_date(_get_manager(), _id, record)
+                    )
+
+    def test_journal_is_up_to_date_if_it_is_published_with_same_date(self):
+        self._assert_up_to_date(
+            "fetch_isis_journal_migration_status",
+            migration_manager.MigrationManager.is_isis_journal_up_to_date,
+            "0044-5967",
+            {"v940": [{"_": "20040817"}], "v941": [{"_": "20151103"}]},
+        )
+
+    def test_issue_is_up_to_date_if_it_is_published_with_same_date(self):
+        self._assert_up_to_date(
+            "fetch_isis_issue_migration_status",
+            migration_manager.MigrationManager.is_isis_issue_up_to_date,
+            "0044-596720190003",
+            {"v091": [{"_": "20040817"}], "v093": [{"_": "20151103"}]},
+        )
+
+    def test_not_registered_journal_is_not_up_to_date(self):
+        with mock.patch.object(
+                db, "fetch_isis_journal_migration_status",
+                return_value=None):
+            self.assertFalse(
+                _get_manager().is_isis_journal_up_to_date(
+                    "0044-5967",
+                    {"v940": [{"_": "20040817"}], "v941": [{"_": "20151103"}]},
+                )
+            )
+
+
+class TestRegisterAndPublishJournalAndIssueStatus(TestCase):
+    """
+    Periódicos e fascículos registrados (REGISTER_ISIS) e não publicados
+    (PUBLISH) não são considerados atualizados na migração incremental
+    """
+
+    def setUp(self):
+        self.saved = []
+        mock.patch.object(
+            db, "save_data",
+            side_effect=lambda data: self.saved.append(
+                (data, getattr(data, "status", None)))).start()
+        self.manager = _get_manager()
+        self.manager._isis_journal_acronyms = mock.Mock()
+        self.manager._isis_issues = mock.Mock()
+        self.manager._issues = mock.Mock()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_registered_journal_has_isis_metadata_migrated_status(self):
+        mock.patch.object(db, "fetch_isis_journal", return_value=None).start()
+        isis_journal, tracker = self.manager.register_isis_journal(
+            "0044-5967",
+            {"v940": [{"_": "20040817"}], "v941": [{"_": "20151103"}]})
+        self.assertEqual("isis_metadata_migrated", isis_journal.status)
+
+    def test_registered_issue_has_isis_metadata_migrated_status(self):
+        mock.patch.object(db, "fetch_isis_issue", return_value=None).start()
+        isis_issue, tracker = self.manager.register_isis_issue(
+            "0044-596720190003",
+            {"v035": [{"_": "0044-5967"}], "v036": [{"_": "20193"}],
+             "v091": [{"_": "20190801"}], "v093": [{"_": "20190807"}]})
+        self.assertEqual("isis_metadata_migrated", isis_issue.status)
+
+    def test_published_journal_has_published_complete_status(self):
+        i_journal = db.ISISJournal(
+            _id="0044-5967", record={}, status="isis_metadata_migrated")
+        journal = mock.Mock()
+        mock.patch.object(
+            db, "fetch_isis_journal", return_value=i_journal).start()
+        mock.patch.object(db, "fetch_journal", return_value=journal).start()
+        mock.patch.object(
+            migration_manager, "_update_journal_with_isis_data").start()
+        self.manager.publish_journal_data("0044-5967")
+        # o status é alterado somente após a publicação
+        self.assertEqual(
+            [(journal, journal.status), (i_journal, "published_complete")],
+            self.saved)
+
+    def test_published_issue_has_published_complete_status(self):
+        i_issue = db.ISISIssue(
+            _id="0044-596720190003", record={},
+            status="isis_metadata_migrated")
+        issue = mock.Mock()
+        mock.patch.object(db, "fetch_isis_issue", return_value=i_issue).start()
+        mock.patch.object(db, "fetch_issue", return_value=issue).start()
+        mock.patch.object(
+            migration_manager, "_update_issue_with_isis_data").start()
+        self.manager.publish_issue_data("0044-596720190003")
+        self.assertEqual(
+            [(issue, issue.status), (i_issue, "published_complete")],
+            self.saved)
+
+    def test_journal_is_not_published_if_publication_fails(self):
+        i_journal = db.ISISJournal(
+            _id="0044-5967", record={}, status="isis_metadata_migrated")
+        mock.patch.object(
+            db, "fetch_isis_journal", return_value=i_journal).start()
+        mock.patch.object(db, "fetch_journal", return_value=None).start()
+        mock.patch.object(
+            db, "create_journal", side_effect=ValueError("error")).start()
+        with self.assertRaises(ValueError):
+            self.manager.publish_journal_data("0044-5967")
+        self.assertEqual("isis_metadata_migrated", i_journal.status)
+        self.assertEqual([], self.saved)
+
+
+class TestMigratedDocumentMigrateDocumentFiles(TestCase):
+
+    def setUp(self):
+        self.migrated_document = migration_manager.MigratedDocument.__new__(
+            migration_manager.MigratedDocument)
+        self.migrated_document._upload_workers = 3
+        self.migrated_document._files_storage_folder = "folder"
+        self.migrated_document.tracker = migration_manager.Tracker(
+            "migrate_document_files")
+        self.migrated_document.files_to_zip = []
+        self.files = [
+            ("/bases/pdf/a01.pdf", "a01.pdf", None),
+            ("/img/a01f1.jpg", "a01f1.jpg", None),
+            ("/img/a01f2.jpg", "a01f2.jpg", "annotation"),
+        ]
+        self.completed = []
+        self.lock = threading.Lock()
+        self.others_completed = threading.Event()
+
+    def _register(self, file_path, folder, basename, preserve_name):
+        if basename == "a01.pdf":
+            # o primeiro arquivo termina depois dos demais
+            self.others_completed.wait(5)
+        try:
+            if basename == "a01f1.jpg":
+                raise IOError("unable to upload")
+            return f"https://minio/{folder}/{basename}"
+        finally:
+            with self.lock:
+                self.completed.append(basename)
+                if len(self.completed) == 2:
+                    self.others_completed.set()
+
+    def test_results_and_events_are_in_files_order(self):
+        files_storage = mock.Mock()
+        files_storage.register.side_effect = self._register
+        with mock.patch.object(
+                db, "create_remote_and_local_file",
+                side_effect=lambda *args: args):
+            result = self.migrated_document._migrate_document_files(
+                files_storage, self.files)
+
+        self.assertEqual("a01.pdf", self.completed[-1])
+        self.assertEqual(
+            [
+                ("https://minio/folder/a01.pdf", "a01.pdf", None),
+                None,
+                ("https://minio/folder/a01f2.jpg", "a01f2.jpg", "annotation"),
+            ],
+            result
+        )
+        self.assertEqual(
+            ["/bases/pdf/a01.pdf", "/img/a01f1.jpg", "/img/a01f2.jpg"],
+            self.migrated_document.files_to_zip
+        )
+        self.assertEqual(
+            [
+                ("info", "migrate /bases/pdf/a01.pdf"),
+                ("info", "migrated https://minio/folder/a01.pdf"),
+                ("info", "migrate /img/a01f1.jpg"),
+                ("error", "Unable to register /img/a01f1.jpg in files "
+                          "storage: unable to upload"),
+                ("info", "migrate /img/a01f2.jpg"),
+                ("info", "migrated https://minio/folder/a01f2.jpg"),
+            ],
+            [
+                ("error", event["error"]) if "error" in event
+                else ("info", event["info"])
+                for event in self.migrated_document.tracker.detail
+            ]
+        )
+        self.assertEqual(1, self.migrated_document.tracker.total_errors)
+
+
+class TestMigrationManagerMigratedDocument(TestCase):
+    """
+    `MigratedDocument` é compartilhado pelas etapas de migração de um
+    documento e é descartado por `register_isis_document` e pelas etapas
+    que falham
+    """
+
+    def setUp(self):
+        self.manager = _get_manager()
+        self.manager._migrated_document = None
+        self.manager._isis_issues = mock.Mock()
+        self.manager._files_storage = mock.Mock()
+        self.created = []
+        mock.patch.object(
+            migration_manager, "MigratedDocument",
+            side_effect=self._create_migrated_document).start()
+        self.document = mock.Mock()
+        mock.patch.object(
+            db, "fetch_document", return_value=self.document).start()
+        mock.patch.object(db, "save_data").start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def _create_migrated_document(self, _id, isis_issue=None):
+        migrated_document = mock.Mock(_id=_id)
+        self.created.append(migrated_document)
+        return migrated_document
+
+    def test_migrated_document_is_shared_by_the_stages(self):
+        self.manager.migrate_document_files("S0044-59672019000300242")
+        self.manager.publish_document_pdfs("S0044-59672019000300242")
+        self.assertEqual(1, len(self.created))
+        self.assertEqual(
+            self.created[0].migrated_pdfs, self.document.pdfs)
+
+    def test_migrated_document_of_another_document_is_created(self):
+        self.manager.publish_document_pdfs("S0044-59672019000300242")
+        self.manager.publish_document_pdfs("S0044-59672019000300167")
+        self.assertEqual(
+            ["S0044-59672019000300242", "S0044-59672019000300167"],
+            [item._id for item in self.created])
+
+    def test_migrated_document_is_discarded_if_a_stage_fails(self):
+        def migrate_text_files(files_storage):
+            # falha após alterar parcialmente os dados do documento
+            self.created[0].isis_doc.pdfs = ["a01.pdf"]
+            raise IOError("unable to read translation")
+
+        self.manager.publish_document_pdfs("S0044-59672019000300242")
+        self.created[0].migrate_text_files.side_effect = migrate_text_files
+        with self.assertRaises(IOError):
+            self.manager.migrate_document_files("S0044-59672019000300242")
+        self.assertIsNone(self.manager._migrated_document)
+
+        self.manager.publish_document_pdfs("S0044-59672019000300242")
+        self.assertEqual(2, len(self.created))
+        self.assertEqual(self.created[1].migrated_pdfs, self.document.pdfs)
+
+    def test_migrated_document_is_discarded_by_register_isis_document(self):
+        self.manager.publish_document_pdfs("S0044-59672019000300242")
+        self.manager._paragraphs_records = mock.Mock()
+        self.manager._paragraphs_records.get_records.return_value = []
+        mock.patch.object(
+            migration_manager.friendly_isis, "FriendlyISISDocument").start()
+        mock.patch.object(db, "fetch_isis_document").start()
+        mock.patch.object(
+            self.manager, "_get_isis_journal_acronym",
+            return_value="aa").start()
+
+        self.manager.register_isis_document(
+            "S0044-59672019000300242", [{"v706": [{"_": "h"}]}])
+        self.assertIsNone(self.manager._migrated_document)
+
+        self.manager.publish_document_pdfs("S0044-59672019000300242")
+        self.assertEqual(2, len(self.created))
+
+
+class TestMigrationManagerLookupCaches(TestCase):
+
+    def setUp(self):
+        self.manager = _get_manager()
+        self.manager._migrated_document = None
+        self.manager._isis_journal_acronyms = migration_manager.LRUCache(2)
+        self.manager._isis_issues = migration_manager.LRUCache(2)
+        self.manager._issues = migration_manager.LRUCache(2)
+        self.journal_record = {
+            "v068": [{"_": "ABC"}],
+            "v940": [{"_": "20040817"}], "v941": [{"_": "20151103"}],
+        }
+        self.issue_record = {
+            "v035": [{"_": "0044-5967"}], "v036": [{"_": "20193"}],
+            "v091": [{"_": "20190801"}], "v093": [{"_": "20190807"}],
+        }
+        mock.patch.object(db, "save_data").start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_journal_acronym_is_fetched_again_after_register_isis_journal(
+            self):
+        fetch = mock.patch.object(
+            db, "fetch_isis_journal",
+            return_value=SimpleNamespace(
+                _id="0044-5967", record=self.journal_record)).start()
+        self.assertEqual(
+            "abc", self.manager._get_isis_journal_acronym("0044-5967"))
+        self.assertEqual(
+            "abc", self.manager._get_isis_journal_acronym("0044-5967"))
+        self.assertEqual(1, fetch.call_count)
+
+        fetch.return_value = db.ISISJournal(_id="0044-5967", record={})
+        self.manager.register_isis_journal("0044-5967", self.journal_record)
+        fetch.return_value = SimpleNamespace(
+            _id="0044-5967", record={"v068": [{"_": "XYZ"}]})
+        self.assertEqual(
+            "xyz", self.manager._get_isis_journal_acronym("0044-5967"))
+
+    def test_isis_issue_is_fetched_again_after_register_isis_issue(self):
+        cached = SimpleNamespace(_id="0044-596720190003")
+        fetch = mock.patch.object(
+            db, "fetch_isis_issue", return_value=cached).start()
+        self.assertIs(cached, self.manager._get_isis_issue("0044-596720190003"))
+        self.assertIs(cached, self.manager._get_isis_issue("0044-596720190003"))
+        self.assertEqual(1, fetch.call_count)
+
+        fetch.return_value = None
+        isis_issue, tracker = self.manager.register_isis_issue(
+            "0044-596720190003", self.issue_record)
+        fetch.return_value = isis_issue
+        self.assertIs(
+            isis_issue, self.manager._get_isis_issue("0044-596720190003"))
+
+    def test_issues_are_fetched_again_after_publish_issue_data(self):
+        cached = SimpleNamespace(_id="issue")
+        fetch = mock.patch.object(
+            db, "fetch_issue", return_value=cached).start()
+        self.assertIs(cached, self.manager._get_issue("0044-5967-2019-v1-n3"))
+        self.assertIs(cached, self.manager._get_issue("0044-5967-2019-v1-n3"))
+        self.assertEqual(1, fetch.call_count)
+
+        mock.patch.object(
+            db, "fetch_isis_issue",
+            return_value=db.ISISIssue(
+                _id="0044-596720190003", record=self.issue_record)).start()
+        mock.patch.object(
+            migration_manager, "_update_issue_with_isis_data").start()
+        self.manager.publish_issue_data("0044-596720190003")
+
+        published = SimpleNamespace(_id="issue")
+        fetch.return_value = published
+        self.assertIs(
+            published, self.manager._get_issue("0044-5967-2019-v1-n3"))
+
+    def test_clear_caches_discards_all_cached_data(self):
+        self.manager._isis_journal_acronyms.set("0044-5967", "abc")
+        self.manager._isis_issues.set("0044-596720190003", object())
+        self.manager._issues.set("0044-5967-2019-v1-n3", object())
+        self.manager._migrated_document = object()
+        self.manager.clear_caches()
+        self.assertEqual(0, len(self.manager._isis_journal_acronyms))
+        self.assertEqual(0, len(self.manager._isis_issues))
+        self.assertEqual(0, len(self.manager._issues))
+        self.assertIsNone(self.manager._migrated_document)
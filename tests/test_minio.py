@@ -0,0 +1,203 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from minio.datatypes import Object
+from minio.error import S3Error
+
+from dsm.extdeps import minio
+
+
+class FakeMinioClient:
+
+    def __init__(self):
+        self.objects = {}
+        self.contents = {}
+        self.uploads = []
+
+    def stat_object(self, bucket_name, object_name):
+        try:
+            return self.objects[object_name]
+        except KeyError:
+            raise S3Error(
+                code="NoSuchKey", message="", resource=None,
+                request_id=None, host_id=None, response=None,
+            )
+
+    def fput_object(self, bucket_name, object_name, file_path,
+                    content_type=None, metadata=None):
+        self.uploads.append(object_name)
+        self.objects[object_name] = Object(
+            bucket_name, object_name,
+            metadata={
+                f"x-amz-meta-{k}": v for k, v in (metadata or {}).items()
+            },
+        )
+
+    def bucket_exists(self, bucket_name):
+        return True
+
+    def put_object(self, bucket_name, object_name, data, length,
+                   content_type=None, metadata=None, part_size=0):
+        content = b""
+        while True:
+            chunk = data.read(part_size or -1)
+            if not chunk:
+                break
+            content += chunk
+        self.uploads.append(object_name)
+        self.contents[object_name] = content
+        self.objects[object_name] = Object(
+            bucket_name, object_name,
+            metadata={
+                f"x-amz-meta-{k}": v for k, v in (metadata or {}).items()
+            },
+        )
+
+    def presigned_get_object(self, bucket_name, object_name):
+        return f"https://minio/{bucket_name}/{object_name}?X-Amz=1"
+
+
+class TestMinioStorageDedup(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmpdir.name, "a01f1.jpg")
+        with open(self.file_path, "wb") as fp:
+            fp.write(b"content")
+        self.client = FakeMinioClient()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _get_storage(self, dedup):
+        storage = minio.MinioStorage(
+            "host", "key", "secret", "scl", dedup=dedup)
+        storage._client_instance = self.client
+        return storage
+
+    def test_register_skips_upload_of_same_content(self):
+        storage = self._get_storage(dedup=True)
+        first = storage.register(self.file_path, "acron", preserve_name=True)
+        second = storage.register(self.file_path, "acron", preserve_name=True)
+        self.assertEqual(["acron/a01f1.jpg"], self.client.uploads)
+        self.assertEqual(first, second)
+        self.assertEqual("https://minio/documentstore/acron/a01f1.jpg", second)
+
+    def test_register_uploads_changed_content(self):
+        storage = self._get_storage(dedup=True)
+        storage.register(self.file_path, "acron", preserve_name=True)
+        with open(self.file_path, "wb") as fp:
+            fp.write(b"new content")
+        storage.register(self.file_path, "acron", preserve_name=True)
+        self.assertEqual(2, len(self.client.uploads))
+
+    def test_register_skips_upload_if_etag_is_md5_of_content(self):
+        self.client.objects["acron/a01f1.jpg"] = Object(
+            "documentstore", "acron/a01f1.jpg",
+            etag='"9a0364b9e99bb480dd25e1f0284c8555"',
+        )
+        storage = self._get_storage(dedup=True)
+        storage.register(self.file_path, "acron", preserve_name=True)
+        self.assertEqual([], self.client.uploads)
+
+    def test_register_always_uploads_without_dedup(self):
+        storage = self._get_storage(dedup=False)
+        storage.register(self.file_path, "acron", preserve_name=True)
+        storage.register(self.file_path, "acron", preserve_name=True)
+        self.assertEqual(2, len(self.client.uploads))
+
+
+class TestMinioStorageRegisterStream(TestCase):
+
+    def setUp(self):
+        self.client = FakeMinioClient()
+        self.storage = minio.MinioStorage("host", "key", "secret", "scl")
+        self.storage._client_instance = self.client
+
+    def test_register_stream_uploads_written_content(self):
+        def write_content(fp):
+            for i in range(100):
+                fp.write(b"x" * 1024)
+
+        uri = self.storage.register_stream(write_content, "acron", "a01.zip")
+        self.assertEqual("https://minio/documentstore/acron/a01.zip", uri)
+        self.assertEqual(b"x" * 102400, self.client.contents["acron/a01.zip"])
+
+    def test_register_stream_cancels_upload_if_writing_fails(self):
+        def write_content(fp):
+            fp.write(b"x" * 1024)
+            raise ValueError("download failed")
+
+        with self.assertRaises(ValueError):
+            self.storage.register_stream(write_content, "acron", "a01.zip")
+        self.assertEqual([], self.client.uploads)
+
+    def test_register_stream_raises_upload_error(self):
+        def put_object(*args, **kwargs):
+            raise IOError("upload failed")
+
+        def write_content(fp):
+            for i in range(1000):
+                fp.write(b"x" * 1024)
+
+        self.client.put_object = put_object
+        with self.assertRaises(IOError) as exc:
+            self.storage.register_stream(write_content, "acron", "a01.zip")
+        self.assertEqual("upload failed", str(exc.exception))
+
+
+class TestMinioStorageRegisterFileobj(TestCase):
+
+    def test_register_fileobj_uploads_content(self):
+        import io
+
+        client = FakeMinioClient()
+        storage = minio.MinioStorage("host", "key", "secret", "scl")
+        storage._client_instance = client
+        uri = storage.register_fileobj(
+            io.BytesIO(b"content"), 7, "acron", "a01f1.jpg")
+        self.assertEqual("https://minio/documentstore/acron/a01f1.jpg", uri)
+        self.assertEqual(b"content", client.contents["acron/a01f1.jpg"])
+
+    def test_register_fileobj_skips_upload_of_same_content(self):
+        import io
+
+        client = FakeMinioClient()
+        storage = minio.MinioStorage(
+            "host", "key", "secret", "scl", dedup=True)
+        storage._client_instance = client
+        first = storage.register_fileobj(
+            io.BytesIO(b"content"), 7, "acron", "a01f1.jpg")
+        second = storage.register_fileobj(
+            io.BytesIO(b"content"), 7, "acron", "a01f1.jpg")
+        self.assertEqual(["acron/a01f1.jpg"], client.uploads)
+        self.assertEqual(first, second)
+        self.assertEqual(b"content", client.contents["acron/a01f1.jpg"])
+
+        storage.register_fileobj(
+            io.BytesIO(b"new content"), 11, "acron", "a01f1.jpg")
+        self.assertEqual(2, len(client.uploads))
+        self.assertEqual(b"new content", client.contents["acron/a01f1.jpg"])
+
+    def test_register_fileobj_skips_zip_member_registered_by_register(self):
+        import io
+        import zipfile
+
+        client = FakeMinioClient()
+        storage = minio.MinioStorage(
+            "host", "key", "secret", "scl", dedup=True)
+        storage._client_instance = client
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = os.path.join(tmpdir, "a01f1.jpg")
+            with open(file_path, "wb") as fp:
+                fp.write(b"content")
+            storage.register(file_path, "acron", preserve_name=True)
+
+        zip_content = io.BytesIO()
+        with zipfile.ZipFile(zip_content, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("a01f1.jpg", b"content")
+        with zipfile.ZipFile(zip_content) as zf:
+            with zf.open("a01f1.jpg") as fp:
+                storage.register_fileobj(fp, 7, "acron", "a01f1.jpg")
+        self.assertEqual(["acron/a01f1.jpg"], client.uploads)
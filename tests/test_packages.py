@@ -1,6 +1,8 @@
 from unittest import TestCase
+from zipfile import ZipFile
 
 from dsm.utils import packages
+from tests import legacy
 
 
 class Test_get_component(TestCase):
@@ -270,6 +272,38 @@ class TestZipFile(TestCase):
             result["2318-0889-tinf-33-e200025"]._renditions)
 
 
+class TestZipPackageFile(TestCase):
+
+    def test_packages_of_zipfile_share_zip_file(self):
+        result = packages._explore_zipfile(
+            "./tests/fixtures/package_with_subdir.zip")
+        zip_files = {id(pkg.zip_file) for pkg in result.values()}
+        self.assertEqual(1, len(zip_files))
+
+    def test_xml_content_is_read_from_shared_zip_file(self):
+        result = packages._explore_zipfile(
+            "./tests/fixtures/package_with_subdir.zip")
+        pkg = result["2318-0889-tinf-33-e200025"]
+        with ZipFile("./tests/fixtures/package_with_subdir.zip") as zf:
+            expected = zf.read(pkg.xml)
+        self.assertEqual(expected, pkg.xml_content)
+
+        pkg.close()
+        self.assertIsNone(pkg.zip_file._zip_file)
+        # reabre o arquivo zip, se necessário
+        self.assertEqual(expected, pkg.xml_content)
+        pkg.close()
+
+    def test_open_returns_member_content(self):
+        zip_file = packages.ZipPackageFile(
+            "./tests/fixtures/package_with_subdir.zip")
+        name = "2318-0889-tinf-33-0121/2318-0889-tinf-33-e200025-gf01.tif"
+        with zip_file.open(name) as fp:
+            content = fp.read()
+        self.assertEqual(zip_file.getinfo(name).file_size, len(content))
+        zip_file.close()
+
+
 class TestFolder(TestCase):
 
     def test__explore_folder_returns_zip_data(self):
@@ -330,3 +364,46 @@ class TestFolder(TestCase):
             pkg2._renditions,
             result["2318-0889-tinf-33-e200068"]._renditions
         )
+
+
+def _get_package_files(total_xmls, files_per_xml):
+    xmls = []
+    files = []
+    for i in range(total_xmls):
+        prefix = f"pkg/1234-5678-acron-{i % 7}-{i:05d}"
+        xmls.append(f"{prefix}.xml")
+        files.extend([f"{prefix}.xml", f"{prefix}.pdf", f"{prefix}-en.pdf"])
+        files.extend(
+            f"{prefix}-gf{j:02d}.tif" for j in range(files_per_xml - 3))
+    # prefixos que contêm outros prefixos
+    xmls.append("pkg/1234-5678-acron-0-00000-erratum.xml")
+    files.append("pkg/1234-5678-acron-0-00000-erratum.pdf")
+    return xmls, files
+
+
+def _as_comparable(docs):
+    return [
+        (prefix, pkg.xml, pkg._assets, pkg._renditions)
+        for prefix, pkg in docs.items()
+    ]
+
+
+class TestGroupFilesByXmlFilenameIndex(legacy.LegacyEquivalenceTestCase):
+
+    def _assert_same_as_legacy_grouping(self, xmls, files):
+        self.assertSameAsLegacy(
+            legacy.group_files_by_xml_filename,
+            packages._group_files_by_xml_filename,
+            lambda: [("pkg.zip", xmls, list(files))],
+            _as_comparable,
+        )
+
+    def test_group_files_is_the_same_as_legacy_grouping(self):
+        xmls, files = _get_package_files(50, 10)
+        self._assert_same_as_legacy_grouping(xmls, files)
+
+    def test_group_files_of_10k_members_is_the_same_as_legacy_grouping(
+            self):
+        xmls, files = _get_package_files(500, 20)
+        self.assertGreater(len(files), 10000)
+        self._assert_same_as_legacy_grouping(xmls, files)
@@ -0,0 +1,34 @@
+from unittest import TestCase
+from multiprocessing.pool import ThreadPool
+
+from dsm.utils import parallel
+
+
+def _double(x):
+    return x * 2
+
+
+class TestBoundedImap(TestCase):
+
+    def test_bounded_imap_returns_results_in_items_order(self):
+        with ThreadPool(4) as pool:
+            result = list(
+                parallel.bounded_imap(
+                    pool, _double, ((i, ) for i in range(20)), 3)
+            )
+        self.assertEqual([i * 2 for i in range(20)], result)
+
+    def test_bounded_imap_consumes_items_as_results_are_consumed(self):
+        consumed = []
+
+        def items():
+            for i in range(10):
+                consumed.append(i)
+                yield (i, )
+
+        with ThreadPool(2) as pool:
+            results = parallel.bounded_imap(pool, _double, items(), 2)
+            self.assertEqual(0, next(results))
+            self.assertEqual([0, 1], consumed)
+            self.assertEqual(2, next(results))
+            self.assertEqual([0, 1, 2], consumed)
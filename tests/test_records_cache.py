@@ -0,0 +1,169 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from dsm.extdeps.isis_migration import id2json, master_file, records_cache
+from tests.test_master_file import (
+    ID_FILE_PATH,
+    _read_id_file_fields,
+    _write_isis_db,
+)
+
+
+class TestRecordsCache(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_file_path = os.path.join(self.tmpdir.name, "artigo")
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        _write_isis_db(
+            self.db_file_path, _read_id_file_fields(ID_FILE_PATH),
+            master_file._LEADERS[0], deleted=(3, ))
+        self.expected = list(master_file.MasterFileReader(self.db_file_path))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _get_cache(self):
+        return records_cache.get_records_cache(
+            self.db_file_path, self.cache_dir, id2json.article_id)
+
+    def test_reader_returns_same_records_as_master_file_reader(self):
+        cache = self._get_cache()
+        reader = cache.reader()
+        self.assertEqual(self.expected, list(reader))
+        self.assertEqual(
+            master_file.MasterFile(self.db_file_path).next_mfn, reader.offset)
+
+    def test_reader_resumes_from_offset_as_master_file_reader(self):
+        reader = master_file.MasterFileReader(self.db_file_path)
+        items = id2json.group_json_records_by_id(reader, id2json.article_id)
+        next(items)
+        next(items)
+        offset = reader.offset
+        expected = list(items)
+
+        cache = self._get_cache()
+        items = id2json.group_json_records_by_id(
+            cache.reader(offset), id2json.article_id)
+        self.assertEqual(expected, list(items))
+
+    def test_get_records_returns_records_of_pid(self):
+        cache = self._get_cache()
+        expected = dict(
+            id2json.group_json_records_by_id(
+                self.expected, id2json.article_id)
+        )
+        pid = "S0034-89102011000500002"
+        self.assertEqual(expected[pid], cache.get_records(pid))
+        self.assertEqual([], cache.get_records("S0000-00000000000000000"))
+
+    def test_cache_is_reused_while_master_file_is_unchanged(self):
+        self._get_cache()
+        mtime = os.stat(self._get_cache().records_file_path).st_mtime_ns
+        self.assertTrue(self._get_cache().is_valid())
+        self.assertEqual(
+            mtime, os.stat(self._get_cache().records_file_path).st_mtime_ns)
+
+    def test_cache_is_rebuilt_if_master_file_changes(self):
+        cache = self._get_cache()
+        _write_isis_db(
+            self.db_file_path, _read_id_file_fields(ID_FILE_PATH)[:5],
+            master_file._LEADERS[0])
+        self.assertFalse(cache.is_valid())
+        result = list(self._get_cache().reader())
+        self.assertEqual(
+            list(master_file.MasterFileReader(self.db_file_path)), result)
+
+
+class TestPidIndex(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_file_path = os.path.join(self.tmpdir.name, "artigo")
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        _write_isis_db(
+            self.db_file_path, _read_id_file_fields(ID_FILE_PATH),
+            master_file._LEADERS[0], deleted=(3, ))
+        self.expected = dict(
+            id2json.group_json_records_by_id(
+                master_file.MasterFileReader(self.db_file_path),
+                id2json.article_id,
+            )
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_records_returns_records_of_each_pid(self):
+        with records_cache.get_pid_index(
+                self.db_file_path, self.cache_dir,
+                id2json.article_id) as pid_index:
+            for pid, records in self.expected.items():
+                with self.subTest(pid):
+                    self.assertEqual(records, pid_index.get_records(pid))
+
+    def test_get_records_returns_empty_list_if_pid_is_not_indexed(self):
+        with records_cache.get_pid_index(
+                self.db_file_path, self.cache_dir,
+                id2json.article_id) as pid_index:
+            self.assertEqual(
+                [], pid_index.get_records("S0000-00000000000000000"))
+
+    def test_index_is_read_from_disk(self):
+        built = records_cache.get_pid_index(
+            self.db_file_path, self.cache_dir, id2json.article_id)
+        pid_index = records_cache.PidIndex(
+            self.db_file_path, self.cache_dir, id2json.article_id)
+        self.assertTrue(pid_index.is_valid())
+        self.assertEqual(built.index, pid_index.index)
+        self.assertEqual(
+            len(self.expected["S0034-89102011000500001"]),
+            len(pid_index.get_mfns("S0034-89102011000500001")))
+
+
+class TestParagraphsRecords(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paragraphs_path = os.path.join(self.tmpdir.name, "p")
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        self.pid = "S0034-89102011000500002"
+        folder_path = os.path.join(
+            self.paragraphs_path, "0034-8910", "2011", "0005")
+        os.makedirs(folder_path)
+        self.id_file_path = os.path.join(folder_path, "00002.id")
+        with open(ID_FILE_PATH, "rb") as fp:
+            content = fp.read()
+        with open(self.id_file_path, "wb") as fp:
+            fp.write(content)
+        self.expected = id2json.get_paragraphs_records(self.id_file_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_files_are_indexed_by_pid(self):
+        paragraphs = records_cache.ParagraphsRecords(self.paragraphs_path)
+        self.assertEqual([self.pid], list(paragraphs.files))
+        self.assertEqual(
+            self.id_file_path, paragraphs.files[self.pid]["path"])
+
+    def test_get_records_returns_records_of_id_file(self):
+        paragraphs = records_cache.ParagraphsRecords(
+            self.paragraphs_path, self.cache_dir)
+        self.assertEqual(self.expected, paragraphs.get_records(self.pid))
+        self.assertEqual([], paragraphs.get_records("S0034-89102011000500001"))
+
+    def test_get_records_returns_cached_records(self):
+        records_cache.ParagraphsRecords(
+            self.paragraphs_path, self.cache_dir).get_records(self.pid)
+        paragraphs = records_cache.ParagraphsRecords(
+            self.paragraphs_path, self.cache_dir)
+        with mock.patch.object(id2json, "get_paragraphs_records") as parse:
+            self.assertEqual(self.expected, paragraphs.get_records(self.pid))
+        parse.assert_not_called()
+
+    def test_get_records_returns_empty_list_if_tree_does_not_exist(self):
+        paragraphs = records_cache.ParagraphsRecords(
+            os.path.join(self.tmpdir.name, "missing"))
+        self.assertEqual([], paragraphs.get_records(self.pid))